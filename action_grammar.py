@@ -0,0 +1,161 @@
+# action_grammar.py
+"""
+Automate de la grammaire des actions du modèle, précompilé sur le vocabulaire.
+
+Le texte généré (espaces retirés) doit rester un préfixe de
+    [xfc] | [abr] chiffres? (. chiffres*)?
+et n'est terminable qu'en
+    [xfc] | [abr] chiffres+ (. chiffres+)?
+(mêmes langages que PokerModel.re_prefix / re_final, y compris le « \n » final
+toléré par `$`). Les états de l'automate sont les classes de ces préfixes ; pour
+chaque état on précalcule les tokens autorisés et l'état atteint, d'où un simple
+indexage masqué du vecteur de probabilités au lieu d'un decode + regex par candidat.
+
+L'automate est construit au chargement du modèle puis sérialisé (JSON) à côté
+du tokenizer, avec une empreinte du vocabulaire : les démarrages suivants le relisent.
+"""
+import os, json, hashlib
+
+import torch
+
+from config import CACHE_DIR
+
+GRAMMAR_VERSION = 1
+
+# États : 0 vide, 1 [xfc], 2 [abr], 3 [abr]\d+, 4 [abr]\.\d*, 5 [abr]\d+\., 6 [abr]\d+\.\d+,
+#         7 / 8 : « \n » final après un état non terminable / terminable
+START = 0
+N_STATES = 9
+FINAL = (False, True, False, True, False, False, True, False, True)
+# Représentants de chaque état (contrôle contre les regex à la construction)
+_REPR = ("", "x", "b", "b1", "b.", "b1.", "b1.5", "\n", "x\n")
+
+def _char_step(state: int, ch: str) -> int:
+    """Transition sur un caractère ; -1 : hors grammaire."""
+    if ch == "\n":
+        return (8 if FINAL[state] else 7) if state < 7 else -1
+    digit = ch.isdecimal()   # \d de re (str) = chiffres Unicode
+    if state == 0:
+        return 1 if ch in "xfc" else 2 if ch in "abr" else -1
+    if state == 2:
+        return 3 if digit else 4 if ch == "." else -1
+    if state == 3:
+        return 3 if digit else 5 if ch == "." else -1
+    if state in (4, 6):
+        return state if digit else -1
+    if state == 5:
+        return 6 if digit else -1
+    return -1
+
+def _run(state: int, text: str) -> int:
+    for ch in text:
+        state = _char_step(state, ch)
+        if state < 0:
+            break
+    return state
+
+class ActionGrammar:
+    """
+    trans[s] : {token_id: état suivant} des tokens autorisés depuis l'état s ;
+    text[token_id] : texte du token sans espaces ; must_ids / allowed_mask : tenseurs
+    par état (sur `device`) pour filtrer les candidats sans boucle Python.
+    """
+    def __init__(self, trans, text, must, vocab_size, device="cpu"):
+        self.trans = trans
+        self.text = text
+        self.vocab_size = vocab_size
+        self.allowed_mask = torch.zeros((N_STATES, vocab_size), dtype=torch.bool)
+        self.must_ids = []
+        for s, nxt in enumerate(trans):
+            if nxt:
+                self.allowed_mask[s, list(nxt)] = True
+            self.must_ids.append(torch.tensor(sorted(t for t in must if t in nxt), dtype=torch.long))
+        self.to(device)
+
+    def to(self, device):
+        self.allowed_mask = self.allowed_mask.to(device)
+        self.must_ids = [t.to(device) for t in self.must_ids]
+        return self
+
+    def candidates(self, state: int, probs, topk: int):
+        """
+        Ids candidats depuis `state` : tokens obligatoires (tête, chiffres, point)
+        et top-k de `probs`, restreints aux tokens autorisés par la grammaire.
+        """
+        top = torch.topk(probs, k=min(topk, probs.numel()))[1]
+        top = top[self.allowed_mask[state, top]]
+        return torch.unique(torch.cat([self.must_ids[state], top]))
+
+    # ---------- construction / sérialisation ----------
+    @classmethod
+    def build(cls, tokenizer, must, exclude, device="cpu", re_prefix=None, re_final=None):
+        """Parcourt le vocabulaire ; re_prefix / re_final (facultatifs) valident l'automate."""
+        vocab_size = len(tokenizer)
+        texts = tokenizer.batch_decode([[i] for i in range(vocab_size)])
+        trans = [{} for _ in range(N_STATES)]
+        text = {}
+        for tid, raw in enumerate(texts):
+            if tid in exclude:
+                continue
+            t = raw.replace(" ", "")
+            for s in range(N_STATES):
+                nxt = _run(s, t)
+                if nxt >= 0:
+                    trans[s][tid] = nxt
+                    text[tid] = t
+                if re_prefix is not None:
+                    rep = _REPR[s] + t
+                    ok = bool(re_prefix.match(rep))
+                    if ok != (nxt >= 0) or (ok and bool(re_final.match(rep)) != FINAL[nxt]):
+                        raise ValueError(f"Automate incohérent avec la regex : état {s}, token {raw!r}")
+        return cls(trans, text, must, vocab_size, device)
+
+    def to_json(self, key: str) -> dict:
+        return {
+            "version": GRAMMAR_VERSION, "key": key, "vocab_size": self.vocab_size,
+            "trans": [{str(t): n for t, n in nxt.items()} for nxt in self.trans],
+            "text": {str(t): s for t, s in self.text.items()},
+        }
+
+    @classmethod
+    def from_json(cls, d, must, device="cpu"):
+        trans = [{int(t): n for t, n in nxt.items()} for nxt in d["trans"]]
+        text = {int(t): s for t, s in d["text"].items()}
+        return cls(trans, text, must, d["vocab_size"], device)
+
+def grammar_key(tokenizer, exclude) -> str:
+    """Empreinte du vocabulaire (et des ids exclus) : invalide l'automate si le tokenizer change."""
+    h = hashlib.sha256(f"v{GRAMMAR_VERSION}|{sorted(exclude)}|{len(tokenizer)}".encode())
+    for tok, i in sorted(tokenizer.get_vocab().items(), key=lambda kv: kv[1]):
+        h.update(f"{i}\x00{tok}\x01".encode())
+    return h.hexdigest()
+
+def grammar_path(model_path: str, key: str) -> str:
+    """À côté du tokenizer si le modèle est un dossier local, sinon dans CACHE_DIR."""
+    if os.path.isdir(model_path) and os.access(model_path, os.W_OK):
+        return os.path.join(model_path, "action_grammar.json")
+    return os.path.join(CACHE_DIR, f"action_grammar_{key[:16]}.json")
+
+def load_action_grammar(tokenizer, model_path, must, exclude, device="cpu", re_prefix=None, re_final=None):
+    """Relit l'automate sérialisé s'il correspond au tokenizer, sinon le construit et l'enregistre."""
+    exclude = {t for t in exclude if isinstance(t, int)}
+    must = {t for t in must if t is not None}
+    key = grammar_key(tokenizer, exclude)
+    path = grammar_path(model_path, key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        if d.get("version") == GRAMMAR_VERSION and d.get("key") == key:
+            return ActionGrammar.from_json(d, must, device)
+    except (OSError, ValueError, KeyError):
+        pass
+    g = ActionGrammar.build(tokenizer, must, exclude, device, re_prefix, re_final)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(g.to_json(key), f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        pass  # dossier en lecture seule : reconstruit au prochain démarrage
+    return g
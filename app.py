@@ -638,7 +638,6 @@ if page == "board":
 
     import os, json
     import pandas as pd
-    from config import LOG_FILE
     client = sb()
 
     # Base RPC existant (peu importe son contenu exact, on va écraser hands_played et ajouter W–L)
@@ -668,49 +667,10 @@ if page == "board":
             counts[name] = 0
     df["hands_played"] = df["display_name"].map(counts).fillna(0).astype(int)
 
-    # --- 2) Calcule W–L directement depuis hands_log.jsonl (ignore "Anonyme/Anonymous") ---
-    @st.cache_data(show_spinner=False)
-    def compute_wl_from_log(log_path: str, mtime: float) -> dict[str, tuple[int, int]]:
-        wl = {}
-        try:
-            with open(log_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        rec = json.loads(line)
-                    except Exception:
-                        continue
-
-                    name = (rec.get("pp") or "").strip()
-                    if not name or name.lower().startswith(("anonyme", "anonymous")):
-                        continue
-
-                    w = rec.get("w"); ai = rec.get("ai")
-                    if not isinstance(w, list) or len(w) < 2 or not isinstance(ai, list) or len(ai) < 2:
-                        continue
-
-                    winner, profit = w[0], int(w[1])
-                    ai_start = int(ai[1])  # stack IA au début de la main
-
-                    # variation IA sur la main
-                    ai_profit = profit if winner == "ai" else -profit if winner == "player" else 0
-                    ai_end = ai_start + ai_profit  # stack IA à la fin de la main
-
-                    # Fin de HU: IA à 0 -> win humain ; IA à 5000 -> loss humain
-                    if ai_end <= 0:
-                        w0, l0 = wl.get(name, (0, 0))
-                        wl[name] = (w0 + 1, l0)
-                    elif ai_end >= 2500 * 2:  # 5000 jetons = 25BB
-                        w0, l0 = wl.get(name, (0, 0))
-                        wl[name] = (w0, l0 + 1)
-        except FileNotFoundError:
-            pass
-        return wl
-
-    mtime = os.path.getmtime(LOG_FILE) if os.path.exists(LOG_FILE) else 0.0
-    wl_map = compute_wl_from_log(LOG_FILE, mtime)
+    # --- 2) W–L depuis l'index du log des mains (ignore "Anonyme/Anonymous") : seules les
+    #        mains ajoutées depuis le dernier appel sont lues ---
+    from hands_wl import get_wl_aggregator
+    wl_map = get_wl_aggregator().refresh()
     df["wins"] = df["display_name"].map(lambda n: wl_map.get(n, (0, 0))[0]).fillna(0).astype(int)
     df["losses"] = df["display_name"].map(lambda n: wl_map.get(n, (0, 0))[1]).fillna(0).astype(int)
     df["W–L"] = df["wins"].astype(str) + "–" + df["losses"].astype(str)
@@ -868,7 +828,7 @@ if not UI_ONLY_MODE and "poker_model" not in st.session_state:
 
 poker_model = st.session_state.get("poker_model")
 
-if "player_stack" not in st.session_state:
+if "match" not in st.session_state:
     initialize_game()
 
 st.markdown(f"{L('Blinds','Blindes')} : {SB}/{BB} | {L('Starting stack','Tapis de départ')} : {INITIAL_STACK}")
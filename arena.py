@@ -0,0 +1,196 @@
+# arena.py
+"""
+Arène headless : matchs heads-up 25BB complets entre SpinGPT (siège « ai »)
+et des bots de référence (siège « player »), répartis sur un pool de processus.
+
+Chaque match terminé est écrit aussitôt dans un fichier JSONL ; le bilan final
+donne mains/s, décisions/s et bb/100 de SpinGPT avec un intervalle de confiance à 95 %.
+
+Les donnes viennent de Deck(deal_seed("arena-<seed>", ...)) : un même --seed rejoue
+les mêmes cartes, et --duplicate rejoue chaque donne sièges échangés (variance réduite).
+
+Usage : python arena.py --opponent pushfold --matches 200 --workers 4 --out arena.jsonl
+        python arena.py --opponent random --ai-bot always_call   # sans modèle (test du banc)
+"""
+import os, json, math, time, random, argparse
+import concurrent.futures
+
+from config import BB, HF_TOKEN
+from game_engine import MatchState
+from ia_bridge import build_prompt, translate_action_for_app
+
+# ──────────────────────────────────────────────────────────────
+#  Bots : act(state, seat) -> (action, montant) au sens de process_action
+# ──────────────────────────────────────────────────────────────
+def _to_call(m, seat):
+    return m.bet_to_match - m[f"{seat}_bet"]
+
+def _all_in(m, seat):
+    return m[f"{seat}_stack"] + m[f"{seat}_bet"]
+
+class AlwaysCallBot:
+    name = "always_call"
+    def __init__(self, rng): pass
+    def act(self, m, seat):
+        return ("call", 0) if _to_call(m, seat) > 0 else ("check", 0)
+
+class RandomBot:
+    """Action légale uniforme ; mise uniforme entre la relance minimale et le tapis."""
+    name = "random"
+    def __init__(self, rng): self.rng = rng
+    def act(self, m, seat):
+        action = self.rng.choice(m.legal_actions())
+        if action in ("bet", "raise"):
+            lo = (m.bet_to_match + m.last_raise) if m.bet_to_match else BB
+            hi = _all_in(m, seat)
+            return action, hi if lo >= hi else self.rng.randrange(lo, hi + 1, 50)
+        return action, 0
+
+def chen_score(hand) -> float:
+    """Formule de Chen (force préflop d'une main de deux cartes)."""
+    r1, r2 = sorted((c.rank_val for c in hand), reverse=True)
+    base = {14: 10, 13: 8, 12: 7, 11: 6}.get(r1, r1 / 2)
+    if r1 == r2:
+        return max(base * 2, 5)
+    score = base + (2 if hand[0].suit_name == hand[1].suit_name else 0)
+    gap = r1 - r2 - 1
+    score -= (0, 1, 2, 4)[gap] if gap < 4 else 5
+    if gap <= 1 and r1 < 12:
+        score += 1
+    return math.ceil(score)
+
+class PushFoldBot:
+    """
+    Tapis ou couché préflop selon la formule de Chen et le tapis effectif ;
+    check / couché après le flop.
+    """
+    name = "pushfold"
+    def __init__(self, rng): pass
+    def act(self, m, seat):
+        to_call = _to_call(m, seat)
+        if m.street_num > 0:
+            return ("check", 0) if to_call <= 0 else ("fold", 0)
+        opp = "ai" if seat == "player" else "player"
+        eff_bb = min(_all_in(m, seat), _all_in(m, opp)) / BB
+        score = chen_score(m[f"{seat}_hand"])
+        push_thr = 6 if eff_bb <= 10 else 8 if eff_bb <= 18 else 9
+        facing_raise = m.bet_to_match > BB
+        thr = push_thr + 2 if facing_raise else push_thr
+        if score >= thr:
+            if facing_raise or "raise" not in m.legal_actions():
+                return ("call", 0)
+            return ("raise", _all_in(m, seat))
+        return ("check", 0) if to_call <= 0 else ("fold", 0)
+
+BOTS = {b.name: b for b in (AlwaysCallBot, RandomBot, PushFoldBot)}
+
+class ModelAgent:
+    """SpinGPT via get_action_with_dists ; uniquement sur le siège « ai »."""
+    name = "spingpt"
+    def __init__(self, model): self.model = model
+    def act(self, m, seat):
+        chosen, _, _ = self.model.get_action_with_dists(build_prompt(m))
+        return translate_action_for_app(chosen, m)
+
+# ──────────────────────────────────────────────────────────────
+#  Worker
+# ──────────────────────────────────────────────────────────────
+_MODEL = None
+
+def _init_worker(load_model: bool):
+    global _MODEL
+    if load_model:
+        from ia_model import PokerModel
+        _MODEL = PokerModel(HF_TOKEN)
+
+def play_match(match_idx: int, seed: int, opponent: str, ai_bot: str | None = None,
+               max_hands: int = 1000, duplicate: bool = False):
+    """Joue un match jusqu'à élimination (ou max_hands) ; renvoie son enregistrement."""
+    rng = random.Random(seed + 1)
+    if ai_bot is None:
+        import torch
+        torch.manual_seed(seed)
+        ai = ModelAgent(_MODEL)
+    else:
+        ai = BOTS[ai_bot](random.Random(seed + 2))
+    bot = BOTS[opponent](rng)
+
+    m = MatchState(duplicate=duplicate)
+    m.initialize_game(hu_uid=f"arena-{seed}")
+    nets, decisions, hands = [], 0, 0
+    t0 = time.perf_counter()
+    while not m.game_over and hands < max_hands:
+        if m.winner is not None:
+            nets.append(m.ai_stack - m.hand_start_ai_stack)
+            hands += 1
+            m.start_new_hand()
+            continue
+        seat = m.turn
+        if seat == "ai":
+            decisions += 1
+            action, amount = ai.act(m, seat)
+        else:
+            action, amount = bot.act(m, seat)
+        m.process_action(seat, action, amount)
+    return {
+        "match": match_idx, "seed": seed, "ai": ai.name, "opponent": opponent, "duplicate": duplicate,
+        "hands": hands, "decisions": decisions, "nets": nets,
+        "ai_stack": m.ai_stack, "winner": ("ai" if m.player_stack <= 0 else "player" if m.ai_stack <= 0 else None),
+        "elapsed": time.perf_counter() - t0,
+    }
+
+# ──────────────────────────────────────────────────────────────
+#  Bilan
+# ──────────────────────────────────────────────────────────────
+def summarize(records, wall_time: float):
+    nets = [n / BB for r in records for n in r["nets"]]
+    hands = len(nets)
+    decisions = sum(r["decisions"] for r in records)
+    mean = sum(nets) / hands if hands else 0.0
+    var = sum((x - mean) ** 2 for x in nets) / (hands - 1) if hands > 1 else 0.0
+    half = 1.96 * math.sqrt(var / hands) if hands else 0.0
+    return {
+        "matches": len(records), "hands": hands, "decisions": decisions,
+        "match_wins": sum(r["winner"] == "ai" for r in records),
+        "match_losses": sum(r["winner"] == "player" for r in records),
+        "hands_per_s": hands / wall_time, "decisions_per_s": decisions / wall_time,
+        "bb100": 100 * mean, "bb100_ci95": (100 * (mean - half), 100 * (mean + half)),
+    }
+
+def run_arena(opponent: str, matches: int, out_path: str, workers: int | None = None,
+              seed: int = 0, ai_bot: str | None = None, max_hands: int = 1000, duplicate: bool = False):
+    workers = workers or os.cpu_count() or 1
+    records = []
+    t0 = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(ai_bot is None,)) as pool, \
+         open(out_path, "a", encoding="utf-8") as out:
+        futs = [pool.submit(play_match, i, seed + 1000 * i, opponent, ai_bot, max_hands, duplicate) for i in range(matches)]
+        for fut in concurrent.futures.as_completed(futs):
+            rec = fut.result()
+            out.write(json.dumps(rec, separators=(",", ":")) + "\n"); out.flush()
+            records.append(rec)
+    return summarize(records, time.perf_counter() - t0)
+
+def main():
+    ap = argparse.ArgumentParser(description="Arène SpinGPT contre bots de référence.")
+    ap.add_argument("--opponent", choices=sorted(BOTS), default="pushfold")
+    ap.add_argument("--ai-bot", choices=sorted(BOTS), default=None,
+                    help="remplace SpinGPT par un bot (sans charger le modèle)")
+    ap.add_argument("--matches", type=int, default=100)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--max-hands", type=int, default=1000)
+    ap.add_argument("--duplicate", action="store_true",
+                    help="mains par paires : la seconde rejoue la donne sièges échangés")
+    ap.add_argument("--out", default="arena_results.jsonl")
+    args = ap.parse_args()
+
+    s = run_arena(args.opponent, args.matches, args.out, args.workers, args.seed, args.ai_bot, args.max_hands, args.duplicate)
+    lo, hi = s["bb100_ci95"]
+    print(f"{s['matches']} matchs ({s['match_wins']}-{s['match_losses']}), {s['hands']} mains, {s['decisions']} décisions")
+    print(f"{s['hands_per_s']:,.0f} mains/s, {s['decisions_per_s']:,.1f} décisions/s")
+    print(f"bb/100 : {s['bb100']:+.1f}  (IC95 [{lo:+.1f}, {hi:+.1f}])")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Backends du modèle (MODEL_BACKEND) : débit, latence et fidélité des distributions.
+
+Pour chaque backend, charge le modèle, rejoue les mêmes prompts de jeu
+(répartis par street) et mesure décisions/s et latence p95 d'une décision
+complète (énumération + tirage). Les distributions énumérées (full_alts) sont
+comparées à celles du backend de référence : distance en variation totale
+(moyenne / max) et accord sur l'action la plus probable.
+
+Usage : python benchmarks/bench_backends.py --backends cpu cpu-int8 --reference cpu [--tolerance 0.05]
+Code de sortie 1 si un backend dépasse la tolérance (TV max) face à la référence.
+"""
+import argparse, gc, os, statistics, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import HF_TOKEN
+
+def tv_distance(a, b) -> float:
+    """Distance en variation totale entre deux full_alts (masse manquante comprise)."""
+    pa = {x["action"]: x["p"] for x in a}
+    pb = {x["action"]: x["p"] for x in b}
+    return 0.5 * sum(abs(pa.get(k, 0.0) - pb.get(k, 0.0)) for k in pa.keys() | pb.keys())
+
+def measure_backend(model, prompts, min_select_prob: float = 0.12, max_new_tokens: int = 6):
+    """{"rate", "p50_ms", "p95_ms", "alts"} : décisions successives, une par prompt."""
+    from bench_decode import time_call
+    model.act_over_threshold(prompts[0], min_select_prob, max_new_tokens)  # chauffe
+    lat, alts = [], []
+    for p in prompts:
+        (_, _, full), ms = time_call(model.act_over_threshold, p, min_select_prob, max_new_tokens)
+        lat.append(ms)
+        alts.append(full)
+    s = sorted(lat)
+    return {"rate": 1e3 * len(lat) / sum(lat), "p50_ms": statistics.median(lat),
+            "p95_ms": s[min(len(s) - 1, int(0.95 * len(s)))], "alts": alts}
+
+def compare(ref_alts, alts) -> dict:
+    tvs = [tv_distance(a, b) for a, b in zip(ref_alts, alts)]
+    top = [bool(a) and bool(b) and a[0]["action"] == b[0]["action"] for a, b in zip(ref_alts, alts)]
+    return {"tv_mean": statistics.fmean(tvs), "tv_max": max(tvs), "top_agree": sum(top) / len(top)}
+
+def main():
+    ap = argparse.ArgumentParser(description="Débit / latence / fidélité par backend du modèle.")
+    ap.add_argument("--backends", nargs="+", default=["cpu", "cpu-int8"])
+    ap.add_argument("--reference", default=None, help="backend de référence (défaut : le premier)")
+    ap.add_argument("--per-street", type=int, default=10)
+    ap.add_argument("--min-select-prob", type=float, default=0.12)
+    ap.add_argument("--max-new-tokens", type=int, default=6)
+    ap.add_argument("--tolerance", type=float, default=0.05, help="TV max tolérée face à la référence")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    from bench_decode import representative_prompts
+    from ia_model import PokerModel
+    ref_name = args.reference or args.backends[0]
+    order = [ref_name] + [b for b in args.backends if b != ref_name]
+    prompts = [p for ps in representative_prompts(args.per_street, args.seed).values() for p in ps]
+
+    results = {}
+    for backend in order:
+        model = PokerModel(HF_TOKEN, backend=backend)
+        model.decision_cache = None   # on mesure le modèle, pas le cache
+        results[backend] = measure_backend(model, prompts, args.min_select_prob, args.max_new_tokens)
+        del model
+        gc.collect()
+
+    failed = False
+    ref = results[ref_name]["alts"]
+    print(f"{len(prompts)} décisions, référence : {ref_name}")
+    print(f"{'backend':<10} {'décisions/s':>12} {'p50 ms':>8} {'p95 ms':>8} {'TV moy':>8} {'TV max':>8} {'top-1':>6}")
+    for backend in order:
+        r = results[backend]
+        c = compare(ref, r["alts"])
+        failed |= c["tv_max"] > args.tolerance
+        print(f"{backend:<10} {r['rate']:>12.2f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+              f"{c['tv_mean']:>8.4f} {c['tv_max']:>8.4f} {c['top_agree']:>6.0%}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Débit (mains/s) de l'évaluation de showdowns : chemin scalaire
+(get_best_hand, hand_rank) contre le chemin vectorisé hand_rank_batch.
+
+Usage : python benchmarks/bench_batch_eval.py --n 1000000
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from poker_engine import CARDS, get_best_hand, hand_rank, hand_rank_batch, hand_rank_to_tuple
+
+def random_deals(n, seed=0):
+    """(n, 7) index de cartes distinctes par ligne : 2 cartes privées puis 5 de board."""
+    rng = np.random.default_rng(seed)
+    return np.argsort(rng.random((n, 52)), axis=1)[:, :7]
+
+def _rate(fn, n):
+    t0 = time.perf_counter(); fn(); dt = time.perf_counter() - t0
+    return n / dt
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=1_000_000, help="mains pour le chemin vectorisé")
+    ap.add_argument("--n-scalar", type=int, default=20_000, help="mains pour les chemins scalaires")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    deals = random_deals(args.n, args.seed)
+    small = deals[:args.n_scalar]
+    objs = [[CARDS[i] for i in row] for row in small.tolist()]
+
+    hand_rank_batch(deals[:10, :2], deals[:10, 2:])  # chargement des tables hors mesure
+    ref = [hand_rank(c[:2], c[2:]) for c in objs]
+    got = hand_rank_batch(small[:, :2], small[:, 2:])
+    assert got.tolist() == ref, "hand_rank_batch diverge de hand_rank"
+    assert all(hand_rank_to_tuple(r) == get_best_hand(c[:2], c[2:]) for r, c in zip(ref[:2000], objs))
+
+    n_scan = min(args.n_scalar, 5_000)
+    rows = [
+        ("get_best_hand", _rate(lambda: [get_best_hand(c[:2], c[2:]) for c in objs[:n_scan]], n_scan)),
+        ("hand_rank", _rate(lambda: [hand_rank(c[:2], c[2:]) for c in objs], len(objs))),
+        ("hand_rank_batch", _rate(lambda: hand_rank_batch(deals[:, :2], deals[:, 2:]), args.n)),
+    ]
+    base = rows[0][1]
+    for name, rate in rows:
+        print(f"{name:<16} {rate:>14,.0f} mains/s   x{rate / base:,.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Latence de PokerModel._generate_action_and_prob : décodage avec cache KV
+contre recalcul complet du prompt à chaque pas (use_cache=False, ancien chemin).
+
+Les prompts sont ceux de vraies situations de jeu (matchs headless entre bots
+aléatoires), répartis par street : la longueur du prompt croît jusqu'à la river.
+Vérifie au passage que les deux chemins donnent la même action et la même
+probabilité (à la tolérance numérique près).
+
+Usage : python benchmarks/bench_decode.py --per-street 10 [--max-new-tokens 6]
+"""
+import argparse, os, random, statistics, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HF_TOKEN, STREET_MAP
+
+def representative_prompts(per_street: int = 10, seed: int = 0):
+    """{street: [prompts]} : décisions de l'IA relevées dans des matchs RandomBot contre RandomBot."""
+    from arena import RandomBot
+    from game_engine import MatchState
+    from ia_bridge import build_prompt
+    rng = random.Random(seed)
+    bot = RandomBot(rng)
+    by_street = {name: [] for name in STREET_MAP.values()}
+    m, k = None, 0
+    while any(len(v) < per_street for v in by_street.values()):
+        if m is None or m.game_over:
+            m = MatchState(); m.initialize_game(hu_uid=f"bench-{seed}-{k}"); k += 1
+        if m.winner is not None:
+            m.start_new_hand(); continue
+        if m.turn == "ai":
+            bucket = by_street[STREET_MAP[m.street_num]]
+            if len(bucket) < per_street:
+                bucket.append(build_prompt(m))
+        m.process_action(m.turn, *bot.act(m, m.turn))
+        if k > 10_000:
+            break
+    return by_street
+
+def _sync():
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+
+def time_call(fn, *args, **kwargs):
+    _sync(); t0 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    _sync()
+    return res, (time.perf_counter() - t0) * 1e3
+
+def main():
+    ap = argparse.ArgumentParser(description="Latence du décodage glouton avec / sans cache KV.")
+    ap.add_argument("--per-street", type=int, default=10)
+    ap.add_argument("--max-new-tokens", type=int, default=6)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--rtol", type=float, default=1e-2, help="écart relatif toléré sur la probabilité")
+    args = ap.parse_args()
+
+    from ia_model import PokerModel
+    model = PokerModel(HF_TOKEN)
+    prompts = representative_prompts(args.per_street, args.seed)
+    model._generate_action_and_prob(prompts["preflop"][0], args.max_new_tokens)  # chauffe
+
+    mismatches = 0
+    print(f"{'street':<8} {'tokens':>7} {'sans cache ms':>14} {'avec cache ms':>14} {'gain':>6}")
+    for street, ps in prompts.items():
+        full, cached, lens = [], [], []
+        for p in ps:
+            lens.append(model._encode_prompt(p).shape[-1])
+            (a0, p0), t_full = time_call(model._generate_action_and_prob, p, args.max_new_tokens, use_cache=False)
+            (a1, p1), t_kv = time_call(model._generate_action_and_prob, p, args.max_new_tokens)
+            full.append(t_full); cached.append(t_kv)
+            if a0 != a1 or abs(p0 - p1) > args.rtol * max(p0, p1, 1e-12):
+                mismatches += 1
+                print(f"  écart : {a0!r} p={p0:.5f}  /  {a1!r} p={p1:.5f}")
+        f, c = statistics.median(full), statistics.median(cached)
+        print(f"{street:<8} {statistics.median(lens):>7.0f} {f:>14.1f} {c:>14.1f} {f / c:>5.1f}x")
+    print(f"{mismatches} écart(s) action / probabilité")
+    if model.prefix_cache is not None:
+        st = model.prefix_cache.stats()
+        print(f"cache de préfixes : {st['hit_rate']:.0%} de requêtes servies, {st['token_hit_rate']:.0%} des tokens "
+              f"repris, {st['bytes_held'] / 2**20:.1f} Mo détenus, {st['evictions']} évictions")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
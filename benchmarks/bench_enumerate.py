@@ -0,0 +1,92 @@
+"""
+Latence de PokerModel.enumerate_actions_ge : expansion par paquets de nœuds
+(les plus probables d'abord, sur le cache KV partagé du prompt) contre l'ancien parcours en
+profondeur, un forward complet par nœud (reproduit ici comme référence).
+
+Vérifie que la distribution agrégée est la même (mêmes actions, probabilités
+à la tolérance près) et donne le nombre de forwards de chaque chemin.
+
+Usage : python benchmarks/bench_enumerate.py --per-street 10 [--min-prob 0.12]
+"""
+import argparse, math, os, statistics, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import HF_TOKEN
+from bench_decode import representative_prompts, time_call
+
+def enumerate_dfs_reference(model, prompt, min_prob=0.05, max_new_tokens=12, tok_topk=20):
+    """Ancienne énumération : pile, un forward du prompt complet par nœud. Renvoie (items, forwards)."""
+    import torch
+    import torch.nn.functional as F
+    ids0 = model._encode_prompt(prompt)
+    log_thr = math.log(min_prob)
+    agg, forwards = {}, 0
+    stack = [(ids0, 0.0, "", 0)]
+    with torch.no_grad():
+        while stack:
+            ids, logp, txt, depth = stack.pop()
+            if depth >= max_new_tokens:
+                continue
+            out = model.model(input_ids=ids, attention_mask=torch.ones_like(ids)); forwards += 1
+            probs = F.softmax(out.logits[:, -1, :].float(), dim=-1)[0]
+            if txt and model.re_final.match(txt):
+                p_term = float(probs[model.term_id])
+                if p_term > 0.0 and math.exp(logp) * p_term >= min_prob:
+                    key = model._norm_action(txt)
+                    agg[key] = agg.get(key, 0.0) + math.exp(logp) * p_term
+            must = {t for t in list(model.head_ids.values()) + list(model.digit_ids.values()) + [model.dot_id]
+                    if t is not None}
+            cand = must | set(torch.topk(probs, k=min(tok_topk, probs.numel()))[1].tolist())
+            cand -= {model.term_id, model.eos_id, model.space_id}
+            for tid in cand:
+                p_tok = float(probs[tid])
+                if p_tok <= 0.0:
+                    continue
+                new_txt = (txt + model.tokenizer.decode([tid])).replace(" ", "")
+                if not model.re_prefix.match(new_txt) or logp + math.log(p_tok) < log_thr:
+                    continue
+                stack.append((torch.cat([ids, torch.tensor([[tid]], device=ids.device)], dim=-1),
+                              logp + math.log(p_tok), new_txt, depth + 1))
+    items = sorted(({"action": k, "p": v} for k, v in agg.items() if v >= min_prob),
+                   key=lambda x: x["p"], reverse=True)
+    return items, forwards
+
+def same_distribution(a, b, rtol=1e-2):
+    pa = {x["action"]: x["p"] for x in a}
+    pb = {x["action"]: x["p"] for x in b}
+    return pa.keys() == pb.keys() and all(abs(pa[k] - pb[k]) <= rtol * max(pa[k], pb[k]) for k in pa)
+
+def main():
+    ap = argparse.ArgumentParser(description="Latence de l'énumération des actions (DFS contre batchs).")
+    ap.add_argument("--per-street", type=int, default=10)
+    ap.add_argument("--min-prob", type=float, default=0.12)
+    ap.add_argument("--max-new-tokens", type=int, default=6)
+    ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    from ia_model import PokerModel
+    model = PokerModel(HF_TOKEN)
+    prompts = representative_prompts(args.per_street, args.seed)
+    model.enumerate_actions_ge(prompts["preflop"][0], args.min_prob, args.max_new_tokens)  # chauffe
+
+    mismatches = 0
+    print(f"{'street':<8} {'forwards DFS':>13} {'DFS ms':>9} {'batch ms':>9} {'gain':>6}")
+    for street, ps in prompts.items():
+        t_ref, t_new, fwd = [], [], []
+        for p in ps:
+            (ref, n_fwd), dt_ref = time_call(enumerate_dfs_reference, model, p, args.min_prob, args.max_new_tokens)
+            new, dt_new = time_call(model.enumerate_actions_ge, p, args.min_prob, args.max_new_tokens,
+                                    batch_size=args.batch_size)
+            t_ref.append(dt_ref); t_new.append(dt_new); fwd.append(n_fwd)
+            if not same_distribution(ref, new):
+                mismatches += 1
+                print(f"  écart : {ref}  /  {new}")
+        r, n = statistics.median(t_ref), statistics.median(t_new)
+        print(f"{street:<8} {statistics.median(fwd):>13.0f} {r:>9.1f} {n:>9.1f} {r / n:>5.1f}x")
+    print(f"{mismatches} distribution(s) différente(s)")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
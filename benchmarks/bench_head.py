@@ -0,0 +1,83 @@
+"""
+Tête de sortie restreinte (HEAD_MODE=grammar) contre softmax sur tout le vocabulaire.
+
+Pour des prompts de jeu répartis par street, mesure :
+- le temps d'un pas de décodage (batch de suffixes d'un token sur le cache KV du
+  prompt) et d'une énumération complète, dans chaque mode ;
+- l'erreur de probabilité : écart max sur les probabilités des tokens retenus
+  (normaliseur en cache, cf. HEAD_NORM_REFRESH), écart constaté à chaque nouvelle
+  mesure du normaliseur (head_stats), distance en variation totale des full_alts, et
+  masse que la softmax complète place hors des lignes retenues (jamais
+  sélectionnable par la grammaire).
+
+Usage : python benchmarks/bench_head.py --per-street 10 [--min-prob 0.12]
+"""
+import argparse, os, statistics, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import HF_TOKEN
+
+def step_probs(model, prompt, width: int):
+    """Distribution du prompt et suffixes d'un token (au plus `width` candidats de la grammaire)."""
+    probs0, past, mask, lens = model._batch_prompt_probs([prompt])
+    from action_grammar import START
+    rows = [(0, (int(t),)) for t in model.grammar.candidates(START, probs0[0], topk=width)[:width]]
+    return probs0[0], rows, past, mask, lens
+
+def compare_mode(model, prompts, min_prob, max_new_tokens, width):
+    from bench_backends import tv_distance
+    from bench_decode import time_call
+    res = {m: {"step": [], "enum": [], "alts": [], "root": []} for m in ("full", "grammar")}
+    for p in prompts:
+        for mode in ("full", "grammar"):
+            model.head_mode = mode
+            root, rows, past, mask, lens = step_probs(model, p, width)
+            _, t_step = time_call(model._frontier_probs, past, mask, lens, rows, len(rows))
+            alts, t_enum = time_call(model.enumerate_actions_ge, p, min_prob, max_new_tokens)
+            r = res[mode]
+            r["step"].append(t_step); r["enum"].append(t_enum); r["alts"].append(alts); r["root"].append(root)
+    model.head_mode = "grammar"
+    rows = model.head_rows
+    outside = [1.0 - float(f[rows].sum()) for f in res["full"]["root"]]
+    err = [float((f[rows] - g[rows]).abs().max()) for f, g in zip(res["full"]["root"], res["grammar"]["root"])]
+    tv = [tv_distance(a, b) for a, b in zip(res["full"]["alts"], res["grammar"]["alts"])]
+    return res, outside, err, tv
+
+def main():
+    ap = argparse.ArgumentParser(description="Tête de sortie restreinte à la grammaire : vitesse et erreur.")
+    ap.add_argument("--per-street", type=int, default=10)
+    ap.add_argument("--min-prob", type=float, default=0.12)
+    ap.add_argument("--max-new-tokens", type=int, default=6)
+    ap.add_argument("--width", type=int, default=16, help="suffixes par pas de décodage mesuré")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    from bench_decode import representative_prompts
+    from ia_model import PokerModel
+    model = PokerModel(HF_TOKEN)
+    model.prefix_cache = None     # même coût de prompt dans les deux modes
+    if model.head_mode != "grammar":
+        model._init_head("grammar")
+    prompts = [p for ps in representative_prompts(args.per_street, args.seed).values() for p in ps]
+    compare_mode(model, prompts[:1], args.min_prob, args.max_new_tokens, args.width)  # chauffe
+
+    res, outside, err, tv = compare_mode(model, prompts, args.min_prob, args.max_new_tokens, args.width)
+    print(f"{len(prompts)} prompts, {model.head_rows.numel()} lignes retenues sur {model.head_vocab}")
+    print(f"{'mode':<8} {'pas ms':>8} {'énumération ms':>15}")
+    for mode in ("full", "grammar"):
+        r = res[mode]
+        print(f"{mode:<8} {statistics.median(r['step']):>8.2f} {statistics.median(r['enum']):>15.1f}")
+    f, g = res["full"], res["grammar"]
+    print(f"gain : pas {statistics.median(f['step']) / statistics.median(g['step']):.2f}x, "
+          f"énumération {statistics.median(f['enum']) / statistics.median(g['enum']):.2f}x")
+    print(f"masse hors tête restreinte : moy {statistics.fmean(outside):.2e}, max {max(outside):.2e}")
+    print(f"écart max des probabilités retenues : {max(err):.2e}")
+    hs = model.head_stats
+    print(f"normaliseur : {hs['refreshes']} mesures, écart max constaté {hs['max_err']:.2e}, "
+          f"décalage courant {hs['offset']:.2e}")
+    print(f"TV des full_alts : moy {statistics.fmean(tv):.4f}, max {max(tv):.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Écriture des logs : ouverture / écriture / fermeture synchrone par ligne (ancien
+chemin) contre LogWriter (file + commit groupé en arrière-plan), pour chaque
+politique fsync.
+
+Mesure la latence vue par l'appelant (p50 / p95 par ligne) et le débit jusqu'au
+disque (lignes/s, flush final compris). Les lignes imitent les enregistrements
+de décisions (prompt + distribution). Écrit dans un dossier temporaire.
+
+Usage : python benchmarks/bench_log_writer.py [--records 20000]
+"""
+import argparse, json, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_writer import LogWriter
+
+LINE = json.dumps({
+    "t": "2026-01-01T12:00:00", "pp": "Anonyme",
+    "p": "pos:H=SB stacks:H=24.5,BB=24.0 hand:AsKd | pre:r2,r6 | flop:Th7c2d x H:",
+    "a": "b3.5", "pd": [["b3.5", 0.61], ["x", 0.39]],
+}, separators=(",", ":"))
+
+def _summary(lat_us):
+    s = sorted(lat_us)
+    return s[len(s) // 2], s[min(len(s) - 1, int(0.95 * len(s)))]
+
+def bench_sync(path, n):
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(LINE + "\n")
+        lat.append((time.perf_counter() - t) * 1e6)
+    return n / (time.perf_counter() - t0), lat
+
+def bench_writer(path, n, fsync):
+    w = LogWriter(fsync=fsync)
+    lat = []
+    t0 = time.perf_counter()
+    for _ in range(n):
+        t = time.perf_counter()
+        w.write(path, LINE)
+        lat.append((time.perf_counter() - t) * 1e6)
+    w.close()
+    rate = n / (time.perf_counter() - t0)
+    return rate, lat, w.stats()
+
+def main():
+    ap = argparse.ArgumentParser(description="Débit et latence : écriture synchrone contre LogWriter.")
+    ap.add_argument("--records", type=int, default=20000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        print(f"{args.records} lignes de {len(LINE)} octets")
+        print(f"{'chemin':<16} {'lignes/s':>10} {'p50 µs':>8} {'p95 µs':>8} {'lot moyen':>10}")
+        rate, lat = bench_sync(os.path.join(d, "sync.jsonl"), args.records)
+        p50, p95 = _summary(lat)
+        print(f"{'synchrone':<16} {rate:>10.0f} {p50:>8.1f} {p95:>8.1f} {'-':>10}")
+        for fsync in ("none", "batch", "close"):
+            path = os.path.join(d, f"writer_{fsync}.jsonl")
+            rate, lat, st = bench_writer(path, args.records, fsync)
+            p50, p95 = _summary(lat)
+            with open(path, encoding="utf-8") as f:
+                assert sum(1 for _ in f) == args.records
+            print(f"{'writer ' + fsync:<16} {rate:>10.0f} {p50:>8.1f} {p95:>8.1f} {st['mean_batch']:>10.1f}")
+
+if __name__ == "__main__":
+    main()
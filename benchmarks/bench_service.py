@@ -0,0 +1,77 @@
+"""
+Débit et latence des décisions sous charge concurrente : N sessions (threads)
+appellent get_action_with_dists directement, puis via le service d'inférence
+partagé (micro-batchs). Affiche décisions/s, latence p50 / p95 par décision et
+taille moyenne des micro-batchs.
+
+Le cache de décisions est désactivé pendant la mesure (sinon on mesure le cache).
+
+Usage : python benchmarks/bench_service.py --sessions 8 --decisions 5 [--window-ms 5]
+"""
+import argparse, os, statistics, sys, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import HF_TOKEN, INFERENCE_MAX_BATCH
+
+def _percentile(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def run_load(decide, prompts, sessions: int, decisions: int):
+    """(décisions/s, latences ms) : `sessions` threads enchaînent chacun `decisions` appels."""
+    lat, lock = [], threading.Lock()
+
+    def worker(k):
+        for j in range(decisions):
+            p = prompts[(k * decisions + j) % len(prompts)]
+            t0 = time.perf_counter()
+            decide(p)
+            dt = (time.perf_counter() - t0) * 1e3
+            with lock:
+                lat.append(dt)
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(lat) / (time.perf_counter() - t0), lat
+
+def main():
+    ap = argparse.ArgumentParser(description="Décisions concurrentes : appels directs contre service micro-batché.")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--decisions", type=int, default=5, help="décisions par session")
+    ap.add_argument("--window-ms", type=float, default=5.0)
+    ap.add_argument("--max-batch", type=int, default=INFERENCE_MAX_BATCH)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    from bench_decode import representative_prompts
+    from ia_model import PokerModel
+    from inference_service import InferenceService
+    model = PokerModel(HF_TOKEN)
+    model.decision_cache = None
+    by_street = representative_prompts(max(1, args.sessions * args.decisions // 4), args.seed)
+    prompts = [p for ps in zip(*by_street.values()) for p in ps]
+    model.get_action_with_dists(prompts[0])  # chauffe
+
+    rows = []
+    rate, lat = run_load(model.get_action_with_dists, prompts, args.sessions, args.decisions)
+    rows.append(("direct", rate, lat, None))
+    svc = InferenceService(model, window_ms=args.window_ms, max_batch=args.max_batch)
+    rate, lat = run_load(svc.get_action_with_dists, prompts, args.sessions, args.decisions)
+    rows.append(("service", rate, lat, svc.stats()))
+    svc.close()
+
+    print(f"{args.sessions} sessions x {args.decisions} décisions")
+    print(f"{'mode':<8} {'décisions/s':>12} {'p50 ms':>8} {'p95 ms':>8} {'batch moyen':>12}")
+    for name, rate, lat, st in rows:
+        mb = f"{st['mean_batch']:.1f}" if st else "-"
+        print(f"{name:<8} {rate:>12.2f} {statistics.median(lat):>8.0f} {_percentile(lat, 0.95):>8.0f} {mb:>12}")
+    print(f"service : {rows[1][3]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Suite de benchmarks des chemins chauds du moteur, avec baselines JSON.
+
+Cas mesurés (temps médian par opération, en µs) :
+  evaluate_hand                             évaluation d'une main de 5 cartes
+  get_best_hand, hand_rank                  meilleure main de 5 parmi 7 cartes
+  deck_deal                                 Deck() + donne complète d'une main HU (9 cartes)
+  scripted_hand_engine                      main scriptée jusqu'au showdown sur MatchState
+  scripted_hand_session                     la même via app_state.process_action / next_street /
+                                            handle_showdown, sur un faux st.session_state
+  generate_prompt_for_ai                    prompt du modèle depuis le faux session_state
+
+Usage : python benchmarks/suite.py run [--out benchmarks/baselines/local.json] [--only deck_deal ...]
+        python benchmarks/suite.py compare benchmarks/baselines/reference.json [current.json] [--tolerance 0.15]
+
+`compare` sans second fichier relance la suite ; code de sortie 1 si un cas
+est plus lent que la baseline au-delà de la tolérance.
+
+Chaque exécution mesure aussi un noyau de calibration (Python pur, fixe)
+autour de chaque cas : `compare` divise les temps par le rapport des calibrations
+médianes (courante / baseline) avant de comparer, ce qui neutralise
+l'essentiel de l'écart de vitesse entre machines (reference.json a été mesuré
+ailleurs). Une baseline sans calibration est comparée en temps absolus.
+"""
+import argparse, json, os, platform, statistics, sys, time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+
+import app_state
+from game_engine import MatchState
+from ia_bridge import generate_prompt_for_ai
+from poker_engine import CARDS, Deck, evaluate_hand, get_best_hand, hand_rank
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+class FakeSessionState(dict):
+    """Remplaçant minimal de st.session_state : dict à accès par attribut."""
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key) from None
+    def __setattr__(self, key, value): self[key] = value
+    def __delattr__(self, key): del self[key]
+
+# Main jouée par le joueur au trait : limp / check, check / check, mise / paie, check / check
+HAND_SCRIPT = [("call", 0), ("check", 0), ("check", 0), ("check", 0),
+               ("bet", 200), ("call", 0), ("check", 0), ("check", 0)]
+
+def _deals(n, seed=0):
+    import random
+    rng = random.Random(seed)
+    return [rng.sample(CARDS, 7) for _ in range(n)]
+
+# ──────────────────────────────────────────────────────────────
+#  Cas : chacun renvoie (fonction sans argument, opérations par appel)
+# ──────────────────────────────────────────────────────────────
+def case_evaluate_hand():
+    deals = _deals(1000)
+    hands = [d[:5] for d in deals]   # évaluateur 5 cartes (poker_engine.evaluate_hand)
+    return (lambda: [evaluate_hand(h) for h in hands]), len(hands)
+
+def case_get_best_hand():
+    deals = _deals(200)
+    return (lambda: [get_best_hand(d[:2], d[2:]) for d in deals]), len(deals)
+
+def case_hand_rank():
+    deals = _deals(5000)
+    hand_rank(deals[0][:2], deals[0][2:])  # tables chargées hors mesure
+    return (lambda: [hand_rank(d[:2], d[2:]) for d in deals]), len(deals)
+
+def case_deck_deal():
+    def run():
+        for _ in range(1000):
+            d = Deck(); d.deal(2); d.deal(2); d.deal(3); d.deal(1); d.deal(1)
+    return run, 1000
+
+def _play_script(m_turn, act):
+    for action, amount in HAND_SCRIPT:
+        act(m_turn(), action, amount)
+
+def case_scripted_hand_engine():
+    def run():
+        for _ in range(200):
+            m = MatchState()
+            m.initialize_game(hu_uid="bench")
+            _play_script(lambda: m.turn, m.process_action)
+            assert m.winner is not None
+    return run, 200
+
+def case_scripted_hand_session():
+    s = FakeSessionState(lang="fr", pseudo="bench")
+    def run():
+        with mock.patch.object(st, "session_state", s), \
+             mock.patch.object(app_state, "log_complete_hand_history", lambda winner: None):
+            for _ in range(200):
+                app_state.initialize_game()
+                _play_script(lambda: s.turn, app_state.process_action)
+                assert s.winner is not None
+    return run, 200
+
+def case_generate_prompt_for_ai():
+    s = FakeSessionState(lang="fr", pseudo="bench")
+    with mock.patch.object(st, "session_state", s), \
+         mock.patch.object(app_state, "log_complete_hand_history", lambda winner: None):
+        app_state.initialize_game()
+        for action, amount in HAND_SCRIPT[:5]:   # river non atteinte : turn avec mise en cours
+            app_state.process_action(s.turn, action, amount)
+    def run():
+        with mock.patch.object(st, "session_state", s):
+            for _ in range(1000):
+                generate_prompt_for_ai()
+    return run, 1000
+
+def calibration_kernel():
+    """Noyau de référence : tri, dict et arithmétique entière, sans code du dépôt."""
+    import random
+    data = list(range(2000))
+    random.Random(0).shuffle(data)
+    def run():
+        counts = {}
+        for x in sorted(data):
+            k = (x * 2654435761) & 1023
+            counts[k] = counts.get(k, 0) + 1
+        return counts
+    return run, 1
+
+CASES = {name[5:]: fn for name, fn in globals().items() if name.startswith("case_")}
+
+# ──────────────────────────────────────────────────────────────
+#  Mesure / baselines
+# ──────────────────────────────────────────────────────────────
+def measure(fn, ops, repeats=7, min_time=0.2):
+    """Temps médian par opération (µs) sur `repeats` séries d'au moins `min_time` secondes."""
+    fn()  # chauffe
+    samples = []
+    for _ in range(repeats):
+        loops, t0 = 0, time.perf_counter()
+        while True:
+            fn(); loops += 1
+            dt = time.perf_counter() - t0
+            if dt >= min_time:
+                break
+        samples.append(dt / (loops * ops) * 1e6)
+    return {"us_per_op": statistics.median(samples), "min_us": min(samples), "repeats": repeats}
+
+def run_suite(only=None, repeats=7):
+    kernel = calibration_kernel()
+    results = {}
+    for name, case in CASES.items():
+        if only and name not in only:
+            continue
+        fn, ops = case()
+        # calibration autour de chaque cas ; la médiane sur la suite sert d'échelle
+        calib = measure(*kernel, repeats)["min_us"]
+        results[name] = measure(fn, ops, repeats)
+        results[name]["calibration_us"] = min(calib, measure(*kernel, repeats)["min_us"])
+        print(f"{name:<24} {results[name]['us_per_op']:>12.2f} µs/op", flush=True)
+    calibs = [r["calibration_us"] for r in results.values()]
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "calibration_us": statistics.median(calibs) if calibs else None},
+        "results": results,
+    }
+
+def compare(baseline, current, tolerance=0.15):
+    """
+    Lignes de comparaison et liste des cas en régression : meilleure série
+    plus lente que celle de la baseline au-delà de (1 + tolérance), après
+    normalisation par le noyau de calibration de chaque exécution.
+    """
+    lines, regressions = [], []
+    ref_cal = baseline.get("meta", {}).get("calibration_us")
+    cur_cal = current.get("meta", {}).get("calibration_us")
+    scale = cur_cal / ref_cal if ref_cal and cur_cal else 1.0
+    if scale != 1.0:
+        lines.append(f"calibration : machine courante x{scale:.2f} par rapport à la baseline")
+    for name, cur in current["results"].items():
+        ref = baseline["results"].get(name)
+        if ref is None:
+            lines.append(f"{name:<24} {cur['us_per_op']:>12.2f} µs/op   (nouveau)")
+            continue
+        ratio = cur["min_us"] / (ref["min_us"] * scale)   # le minimum est moins bruité que la médiane
+        flag = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        if flag != "ok":
+            regressions.append(name)
+        lines.append(f"{name:<24} {ref['us_per_op']:>12.2f} -> {cur['us_per_op']:>10.2f} µs/op   x{ratio:.2f}  {flag}")
+    return lines, regressions
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks du moteur (baselines JSON).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="lance la suite et écrit les résultats")
+    r.add_argument("--out", default=os.path.join(BASELINE_DIR, "local.json"))
+    r.add_argument("--only", nargs="*", choices=sorted(CASES))
+    r.add_argument("--repeats", type=int, default=7)
+    c = sub.add_parser("compare", help="compare à une baseline ; code 1 si régression")
+    c.add_argument("baseline")
+    c.add_argument("current", nargs="?", help="résultats déjà mesurés (sinon relance la suite)")
+    c.add_argument("--tolerance", type=float, default=0.15, help="ralentissement relatif toléré")
+    c.add_argument("--only", nargs="*", choices=sorted(CASES))
+    c.add_argument("--repeats", type=int, default=7)
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        res = run_suite(args.only, args.repeats)
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2)
+        print(f"-> {args.out}")
+        return 0
+
+    baseline = _load(args.baseline)
+    current = _load(args.current) if args.current else run_suite(args.only, args.repeats)
+    lines, regressions = compare(baseline, current, args.tolerance)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%} : {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
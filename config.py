@@ -23,10 +23,35 @@ except PermissionError:
     LOG_DIR = os.path.join(os.getcwd(), "logs", "25BB")
     os.makedirs(LOG_DIR, exist_ok=True)
 
-LOG_FILE = os.path.join(LOG_DIR, "hands_log.jsonl")
+LOG_FILE = os.path.join(LOG_DIR, "hands_log.jsonl")   # ancien log unique des mains (lu par hands_log.py)
 DECISIONS_LOG_FILE = os.path.join(LOG_DIR, "decisions_log.jsonl")
 DECISIONS_CHUNK_SIZE = 5000
 DECISIONS_META_FILE = os.path.join(LOG_DIR, "decisions_meta.json")
+# Log des mains en segments (hands_log.py) : rotation par taille ou par âge, index à côté de chaque segment
+HANDS_LOG_DIR = os.path.join(LOG_DIR, "hands")
+HANDS_SEGMENT_MB = float(os.getenv("HANDS_SEGMENT_MB", "64"))
+HANDS_SEGMENT_HOURS = float(os.getenv("HANDS_SEGMENT_HOURS", "24"))
+# index réécrit en entier toutes les N mains (entre deux : journal d'ajouts .idx.delta) et à la rotation
+HANDS_INDEX_SNAPSHOT_ROWS = int(os.getenv("HANDS_INDEX_SNAPSHOT_ROWS", "5000"))
+
+# Écriture des logs en arrière-plan (log_writer.py) : file bornée, lots par taille / délai,
+# fsync : none (système), batch (après chaque lot) ou close (à la fermeture des fichiers)
+LOG_WRITER_QUEUE = int(os.getenv("LOG_WRITER_QUEUE", "10000"))
+LOG_FLUSH_RECORDS = int(os.getenv("LOG_FLUSH_RECORDS", "256"))
+LOG_FLUSH_INTERVAL_MS = float(os.getenv("LOG_FLUSH_INTERVAL_MS", "200"))
+LOG_FSYNC = os.getenv("LOG_FSYNC", "none")
+
+# Tables précalculées (évaluateur de mains, etc.) : reconstruites si absentes
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(LOG_DIR)), "cache")
+HAND_EVAL_TABLES_FILE = os.path.join(CACHE_DIR, "hand_eval_tables.bin")
+# Équités préflop (construites hors-ligne par preflop_table.py, lues par mmap)
+PREFLOP_EQUITY_FILE = os.path.join(CACHE_DIR, "preflop_equity_169.bin")
+PREFLOP_COMBO_EQUITY_FILE = os.path.join(CACHE_DIR, "preflop_equity_1326.bin")
+DECISION_CACHE_FILE = os.path.join(CACHE_DIR, "decision_cache.sqlite")
+PREFLOP_POLICY_FILE = os.path.join(CACHE_DIR, "preflop_policy.npz")
+# Secret serveur des graines de donnes (HMAC) : DEAL_SECRET, sinon clé aléatoire créée une fois dans DEAL_SECRET_FILE
+DEAL_SECRET = os.getenv("DEAL_SECRET", "")
+DEAL_SECRET_FILE = os.path.join(CACHE_DIR, "deal_secret.key")
 SUITS = {
     's': 'spades',
     'c': 'clubs',
@@ -57,6 +82,36 @@ STREET_MAP = {0: "preflop", 1: "flop", 2: "turn", 3: "river"}
 # Mode UI-only : désactive le backend (Supabase + IA) pour travailler uniquement sur l'apparence
 UI_ONLY_MODE = os.getenv("UI_ONLY_MODE", "false").lower() in ("true", "1", "yes")
 
+# Mode duplicate : chaque donne est rejouée à la main suivante avec les cartes privées échangées
+DUPLICATE_MODE = os.getenv("DUPLICATE_MODE", "false").lower() in ("true", "1", "yes")
+
+# Backend du modèle : cuda-nf4 (GPU, 4 bits), cpu (float32) ou cpu-int8 (Linear quantifiés int8)
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "cuda-nf4")
+
+# Tête de sortie, appliquée à la dernière position seulement : full (softmax sur tout le vocabulaire)
+# ou grammar (projection sur les seules lignes des tokens de la grammaire ; normaliseur en cache,
+# remesuré sur tout le vocabulaire tous les HEAD_NORM_REFRESH forwards)
+HEAD_MODE = os.getenv("HEAD_MODE", "full")
+HEAD_NORM_REFRESH = int(os.getenv("HEAD_NORM_REFRESH", "64"))
+
+# Cache KV de préfixes des prompts (Mo, mémoire du device du modèle) ; 0 le désactive
+PREFIX_CACHE_MB = int(os.getenv("PREFIX_CACHE_MB", "1024"))
+
+# Cache des distributions énumérées (full_alts) par prompt : mémoire (LRU) + SQLite partagé
+DECISION_CACHE = os.getenv("DECISION_CACHE", "false").lower() in ("true", "1", "yes")
+DECISION_CACHE_MEM = int(os.getenv("DECISION_CACHE_MEM", "4096"))
+
+# Service d'inférence partagé : micro-batchs des décisions de toutes les sessions
+INFERENCE_SERVICE = os.getenv("INFERENCE_SERVICE", "false").lower() in ("true", "1", "yes")
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+# Énumération des actions : budget de temps par décision (s, 0 = sans limite) et masse
+# non explorée en dessous de laquelle on s'arrête (0 = exhaustive)
+AI_DECISION_DEADLINE_S = float(os.getenv("AI_DECISION_DEADLINE_S", "0")) or None
+ENUM_EPSILON = float(os.getenv("ENUM_EPSILON", "0"))
+# Échéance d'une décision servie par le service ; au-delà, calcul direct dans la session
+AI_DECISION_TIMEOUT_S = float(os.getenv("AI_DECISION_TIMEOUT_S", "30"))
+
 SUPABASE_URL = os.getenv("SUPABASE_URL") if not UI_ONLY_MODE else "mock://supabase"
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY") if not UI_ONLY_MODE else "mock-key"
 HF_TOKEN = os.getenv("HF_TOKEN") if not UI_ONLY_MODE else "mock-token"
\ No newline at end of file
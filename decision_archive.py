@@ -0,0 +1,235 @@
+# decision_archive.py
+"""
+Archive colonnaire compressée des chunks de décisions fermés.
+
+Un chunk plein (decisions_log_XXXXXX.jsonl) devient archive/decisions_log_XXXXXX.npz,
+un tableau NumPy par colonne (membres zip compressés séparés : np.load ne lit
+que les colonnes demandées) :
+- t        : datetime64[s] ;
+- pp, a    : codes dans les dictionnaires players / actions (stockés dans le pied) ;
+- pd_off, pd_act, pd_p : distributions aplaties (décalages, codes d'actions, probabilités) ;
+- p_off, p_blob : prompts UTF-8 concaténés ;
+- x_rows, x_json : champs facultatifs (src, tr, um…) des lignes qui en ont ;
+- meta     : pied JSON (version, nombre de lignes, dictionnaires, bornes de temps,
+             index par joueur {nom: [lignes, t_min, t_max]}, bornes de temps par bloc).
+
+    python decision_archive.py compact [--keep]      # archive les chunks fermés
+    python decision_archive.py query --player X [--since 2026-01-01T00:00:00] [--until ...]
+"""
+import os, json, argparse
+
+import numpy as np
+
+from config import DECISIONS_LOG_FILE, DECISIONS_META_FILE
+from decision_log import DecisionLogRotation, archive_path, archived_chunks
+
+ARCHIVE_VERSION = 1
+BLOCK_ROWS = 1024
+_CORE = ("t", "pp", "p", "a", "pd")
+
+def _read_chunk(path):
+    rows, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                skipped += 1      # ligne tronquée (arrêt brutal)
+                continue
+            if isinstance(rec, dict):
+                rows.append(rec)
+            else:
+                skipped += 1
+    return rows, skipped
+
+def _encode(values, vocab, index):
+    out = np.empty(len(values), dtype=np.uint32)
+    for i, v in enumerate(values):
+        code = index.get(v)
+        if code is None:
+            code = index[v] = len(vocab)
+            vocab.append(v)
+        out[i] = code
+    return out
+
+def _to_time(ts):
+    try:
+        return np.datetime64(ts, "s")
+    except (ValueError, TypeError):
+        return np.datetime64("NaT")
+
+def _offsets(lengths):
+    off = np.zeros(len(lengths) + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=off[1:])
+    return off
+
+def compact_chunk(src: str, dst: str) -> dict:
+    """Écrit l'archive de `src` dans `dst` (remplacement atomique) ; renvoie son pied."""
+    rows, skipped = _read_chunk(src)
+    n = len(rows)
+    t = np.array([_to_time(r.get("t")) for r in rows], dtype="datetime64[s]")
+    players, actions = [], []
+    p_index, a_index = {}, {}
+    pp = _encode([r.get("pp") or "" for r in rows], players, p_index)
+    a = _encode([r.get("a") or "" for r in rows], actions, a_index)
+
+    dists = [r.get("pd") or [] for r in rows]
+    pd_off = _offsets([len(d) for d in dists])
+    pd_act = _encode([str(x[0]) for d in dists for x in d], actions, a_index)
+    pd_p = np.array([x[1] for d in dists for x in d], dtype=np.float32)
+
+    prompts = [(r.get("p") or "").encode("utf-8") for r in rows]
+    p_off = _offsets([len(b) for b in prompts])
+    p_blob = np.frombuffer(b"".join(prompts), dtype=np.uint8)
+
+    extra = [(i, {k: v for k, v in r.items() if k not in _CORE}) for i, r in enumerate(rows)]
+    extra = [(i, x) for i, x in extra if x]
+    x_rows = np.array([i for i, _ in extra], dtype=np.uint32)
+    x_json = np.frombuffer(json.dumps([x for _, x in extra], ensure_ascii=False,
+                                      separators=(",", ":")).encode("utf-8"), dtype=np.uint8)
+
+    # pied : index par joueur et par bloc de lignes
+    valid = ~np.isnat(t)
+    by_player = {}
+    for code, name in enumerate(players):
+        sel = (pp == code) & valid
+        cnt = int((pp == code).sum())
+        by_player[name] = [cnt, str(t[sel].min()) if sel.any() else None, str(t[sel].max()) if sel.any() else None]
+    blocks = []
+    for b in range(0, n, BLOCK_ROWS):
+        tb = t[b:b + BLOCK_ROWS][valid[b:b + BLOCK_ROWS]]
+        blocks.append([str(tb.min()), str(tb.max())] if tb.size else [None, None])
+    meta = {
+        "version": ARCHIVE_VERSION, "source": os.path.basename(src), "source_bytes": os.path.getsize(src),
+        "rows": n, "skipped": skipped,
+        "t_min": str(t[valid].min()) if valid.any() else None,
+        "t_max": str(t[valid].max()) if valid.any() else None,
+        "players": players, "actions": actions, "by_player": by_player,
+        "block_rows": BLOCK_ROWS, "blocks": blocks,
+    }
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f, meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+            t=t, pp=pp, a=a, pd_off=pd_off, pd_act=pd_act, pd_p=pd_p,
+            p_off=p_off, p_blob=p_blob, x_rows=x_rows, x_json=x_json,
+        )
+    os.replace(tmp, dst)
+    return meta
+
+class DecisionArchive:
+    """Lecture d'une archive : colonnes chargées à la demande, lignes filtrées par joueur / temps."""
+    def __init__(self, path: str):
+        self.path = path
+        self.npz = np.load(path)
+        self.meta = json.loads(self.npz["meta"].tobytes().decode("utf-8"))
+        if self.meta.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"{path} : version d'archive {self.meta.get('version')} non prise en charge")
+        self._cols = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def column(self, name):
+        if name not in self._cols:
+            self._cols[name] = self.npz[name]
+        return self._cols[name]
+
+    def rows(self, player=None, since=None, until=None):
+        """Indices des lignes du joueur `player` dont t est dans [since, until] (bornes ISO facultatives)."""
+        if player is not None and player not in self.meta["by_player"]:
+            return np.empty(0, dtype=np.intp)
+        lo, hi = (np.datetime64(since, "s") if since else None), (np.datetime64(until, "s") if until else None)
+        if (lo is not None and self.meta["t_max"] and np.datetime64(self.meta["t_max"]) < lo) or \
+           (hi is not None and self.meta["t_min"] and np.datetime64(self.meta["t_min"]) > hi):
+            return np.empty(0, dtype=np.intp)
+        keep = np.ones(len(self), dtype=bool)
+        if player is not None:
+            keep &= self.column("pp") == self.meta["players"].index(player)
+        if lo is not None or hi is not None:
+            t = self.column("t")
+            # blocs entièrement hors de l'intervalle écartés sans comparer leurs lignes
+            for b, (b0, b1) in enumerate(self.meta["blocks"]):
+                sl = slice(b * self.meta["block_rows"], (b + 1) * self.meta["block_rows"])
+                if b0 is None or (lo is not None and np.datetime64(b1) < lo) or \
+                   (hi is not None and np.datetime64(b0) > hi):
+                    keep[sl] = False
+                    continue
+                tb = t[sl]
+                if lo is not None:
+                    keep[sl] &= tb >= lo
+                if hi is not None:
+                    keep[sl] &= tb <= hi
+        return np.nonzero(keep)[0]
+
+    def prompts(self, idx=None):
+        off, blob = self.column("p_off"), self.column("p_blob")
+        idx = range(len(self)) if idx is None else idx
+        return [blob[off[i]:off[i + 1]].tobytes().decode("utf-8") for i in idx]
+
+    def records(self, idx=None):
+        """Lignes au format des logs JSONL (dicts {t, pp, p, a, pd, …})."""
+        idx = range(len(self)) if idx is None else idx
+        players, actions = self.meta["players"], self.meta["actions"]
+        t, pp, a = self.column("t"), self.column("pp"), self.column("a")
+        pd_off, pd_act, pd_p = self.column("pd_off"), self.column("pd_act"), self.column("pd_p")
+        extra = dict(zip(self.column("x_rows").tolist(),
+                         json.loads(self.column("x_json").tobytes().decode("utf-8"))))
+        out = []
+        for i, prompt in zip(idx, self.prompts(idx)):
+            i = int(i)
+            rec = {
+                "t": None if np.isnat(t[i]) else str(t[i]),
+                "pp": players[pp[i]], "p": prompt, "a": actions[a[i]],
+                "pd": [[actions[c], round(float(p), 4)]
+                       for c, p in zip(pd_act[pd_off[i]:pd_off[i + 1]], pd_p[pd_off[i]:pd_off[i + 1]])],
+            }
+            rec.update(extra.get(i, {}))
+            out.append(rec)
+        return out
+
+def compact_closed(log_dir: str = None, keep: bool = False):
+    """Archive les chunks fermés pas encore archivés ; renvoie [(source, archive, pied)]."""
+    log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+    rotation = DecisionLogRotation(os.path.join(log_dir, os.path.basename(DECISIONS_META_FILE)), log_dir=log_dir)
+    done = []
+    for idx, src in rotation.closed_chunks():
+        dst = archive_path(idx, rotation.log_dir)
+        if os.path.exists(dst):
+            continue
+        meta = compact_chunk(src, dst)
+        # relecture avant de supprimer la source
+        if len(DecisionArchive(dst)) != meta["rows"]:
+            raise RuntimeError(f"{dst} : relecture incohérente")
+        if not keep:
+            os.remove(src)
+        done.append((src, dst, meta))
+    return done
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive colonnaire des logs de décisions.")
+    ap.add_argument("--log-dir", default=os.path.dirname(DECISIONS_LOG_FILE))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compact", help="archive les chunks fermés")
+    c.add_argument("--keep", action="store_true", help="conserve les .jsonl sources")
+    q = sub.add_parser("query", help="décisions archivées d'un joueur / d'une période")
+    q.add_argument("--player")
+    q.add_argument("--since")
+    q.add_argument("--until")
+    args = ap.parse_args()
+
+    if args.cmd == "compact":
+        for src, dst, meta in compact_closed(args.log_dir, args.keep):
+            ratio = meta["source_bytes"] / os.path.getsize(dst)
+            print(f"{os.path.basename(dst)} : {meta['rows']} lignes ({meta['skipped']} illisibles), "
+                  f"{ratio:.1f}x plus petit que {meta['source']}")
+        return
+    for _, path in archived_chunks(args.log_dir):
+        arc = DecisionArchive(path)
+        for rec in arc.records(arc.rows(args.player, args.since, args.until)):
+            print(json.dumps(rec, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
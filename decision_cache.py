@@ -0,0 +1,203 @@
+# decision_cache.py
+"""
+Cache des distributions d'actions énumérées (full_alts) par prompt.
+
+enumerate_actions_ge est déterministe pour un prompt et un modèle donnés ; seul
+le tirage final (torch.multinomial) est aléatoire et reste fait à chaque appel.
+La clé combine le prompt, les paramètres d'énumération et une empreinte du
+modèle : changer de poids ou de quantification invalide le cache.
+
+Deux niveaux :
+- mémoire : LRU par processus (DECISION_CACHE_MEM entrées) ;
+- disque : SQLite en mode WAL (DECISION_CACHE_FILE), partagé par tous les processus.
+
+Chaque entrée garde aussi l'état de l'énumération (truncated, reason,
+unexplored) : une distribution servie par le cache porte les mêmes indicateurs
+que celle calculée.
+
+Activation : DECISION_CACHE=true. Préchauffage depuis les logs de décisions :
+    python decision_cache.py warm [--limit 5000]
+    python decision_cache.py stats      # contenu du cache disque
+"""
+import os, json, glob, time, sqlite3, hashlib, argparse, threading
+from collections import Counter, OrderedDict
+
+from config import DECISION_CACHE_FILE, DECISION_CACHE_MEM, DECISIONS_LOG_FILE
+
+CACHE_VERSION = 2     # 2 : entrées {alts, meta}
+_META = ("truncated", "reason", "unexplored")
+
+def decision_key(fingerprint: str, prompt: str, **params) -> str:
+    blob = json.dumps([CACHE_VERSION, fingerprint, prompt, sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class DecisionCache:
+    def __init__(self, path: str = DECISION_CACHE_FILE, mem_size: int = DECISION_CACHE_MEM):
+        self.path = path
+        self.mem_size = mem_size
+        self.mem = OrderedDict()
+        self.lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self.mem_hits = self.disk_hits = self.misses = self.puts = 0
+
+    def _db(self):
+        # une connexion par processus (les connexions SQLite ne survivent pas à un fork)
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS alts (key TEXT PRIMARY KEY, alts TEXT NOT NULL, "
+                         "prompt TEXT, created REAL)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _remember(self, key, alts):
+        self.mem[key] = alts
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.mem_size:
+            self.mem.popitem(last=False)
+
+    def get(self, key):
+        """(full_alts, meta) en cache ou None ; meta : {truncated, reason, unexplored} de l'énumération."""
+        with self.lock:
+            entry = self.mem.get(key)
+            if entry is not None:
+                self.mem.move_to_end(key)
+                self.mem_hits += 1
+                return entry
+            try:
+                row = self._db().execute("SELECT alts FROM alts WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            doc = json.loads(row[0])
+            entry = (doc["alts"], doc.get("meta", {}))
+            self._remember(key, entry)
+            self.disk_hits += 1
+            return entry
+
+    def put(self, key, alts, prompt=None):
+        """Met en cache full_alts et ses indicateurs d'énumération (attributs truncated / reason / unexplored)."""
+        meta = {k: getattr(alts, k) for k in _META if getattr(alts, k, None) is not None}
+        entry = ([dict(a) for a in alts], meta)
+        with self.lock:
+            self._remember(key, entry)
+            self.puts += 1
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO alts VALUES (?, ?, ?, ?)",
+                           (key, json.dumps({"alts": entry[0], "meta": meta}, separators=(",", ":")),
+                            prompt, time.time()))
+                db.commit()
+            except sqlite3.Error:
+                pass  # disque indisponible : le niveau mémoire suffit
+
+    def contains(self, key) -> bool:
+        with self.lock:
+            if key in self.mem:
+                return True
+            try:
+                return self._db().execute("SELECT 1 FROM alts WHERE key = ?", (key,)).fetchone() is not None
+            except sqlite3.Error:
+                return False
+
+    def stats(self) -> dict:
+        """Compteurs de ce processus (depuis son démarrage) et taille des deux niveaux."""
+        with self.lock:
+            lookups = self.mem_hits + self.disk_hits + self.misses
+            try:
+                disk_entries = self._db().execute("SELECT COUNT(*) FROM alts").fetchone()[0]
+            except sqlite3.Error:
+                disk_entries = None
+            return {
+                "lookups": lookups, "mem_hits": self.mem_hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "puts": self.puts,
+                "hit_rate": (self.mem_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "mem_entries": len(self.mem), "disk_entries": disk_entries,
+            }
+
+    def disk_stats(self) -> dict:
+        """Contenu du cache disque, partagé par tous les processus."""
+        with self.lock:
+            try:
+                n, first, last = self._db().execute("SELECT COUNT(*), MIN(created), MAX(created) FROM alts").fetchone()
+            except sqlite3.Error:
+                return {"path": self.path, "disk_entries": None}
+        fmt = lambda t: time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t)) if t else None
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {"path": self.path, "disk_entries": n, "bytes": size, "oldest": fmt(first), "newest": fmt(last)}
+
+_CACHE = None
+
+def get_decision_cache() -> DecisionCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = DecisionCache()
+    return _CACHE
+
+# ──────────────────────────────────────────────────────────────
+#  Préchauffage depuis decisions_log_*.jsonl
+# ──────────────────────────────────────────────────────────────
+def logged_prompts(log_dir: str):
+    """Prompts des logs de décisions (chunks JSONL et archives), du plus fréquent au moins fréquent."""
+    from decision_archive import DecisionArchive
+    from decision_log import archived_chunks
+    counts = Counter()
+    for _, path in archived_chunks(log_dir):
+        counts.update(p for p in DecisionArchive(path).prompts() if p)
+    for path in sorted(glob.glob(os.path.join(log_dir, "decisions_log_*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    p = json.loads(line).get("p")
+                except ValueError:
+                    continue  # ligne tronquée
+                if p:
+                    counts[p] += 1
+    return [p for p, _ in counts.most_common()]
+
+def warm(model, prompts, min_select_prob: float = 0.12, max_new_tokens: int = 6):
+    """Énumère (via le cache du modèle) les prompts absents du cache ; renvoie le nombre calculé."""
+    cache = model.decision_cache
+    done = 0
+    for i, p in enumerate(prompts, 1):
+        key = model.enumeration_key(p, min_select_prob, max_new_tokens)
+        if not cache.contains(key):
+            model.cached_enumeration(p, min_select_prob, max_new_tokens)
+            done += 1
+        if i % 100 == 0:
+            print(f"  {i}/{len(prompts)} prompts, {done} calculés", flush=True)
+    return done
+
+def main():
+    ap = argparse.ArgumentParser(description="Cache des distributions d'actions du modèle.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("warm", help="préchauffe le cache depuis les logs de décisions")
+    w.add_argument("--log-dir", default=os.path.dirname(DECISIONS_LOG_FILE))
+    w.add_argument("--limit", type=int, default=None, help="n prompts les plus fréquents")
+    w.add_argument("--min-select-prob", type=float, default=0.12)
+    w.add_argument("--max-new-tokens", type=int, default=6)
+    sub.add_parser("stats", help="contenu du cache disque")
+    args = ap.parse_args()
+
+    if args.cmd == "stats":
+        # les compteurs de hits n'existent que dans le processus qui sert les décisions
+        print(get_decision_cache().disk_stats())
+        return
+    prompts = logged_prompts(args.log_dir)[:args.limit]
+    print(f"{len(prompts)} prompts distincts dans {args.log_dir}")
+    from config import HF_TOKEN
+    from ia_model import PokerModel
+    model = PokerModel(HF_TOKEN)
+    if model.decision_cache is None:
+        model.decision_cache = get_decision_cache()
+    t0 = time.perf_counter()
+    n = warm(model, prompts, args.min_select_prob, args.max_new_tokens)
+    print(f"{n} distributions calculées en {time.perf_counter() - t0:.0f}s ; {model.decision_cache.stats()}")
+
+if __name__ == "__main__":
+    main()
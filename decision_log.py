@@ -0,0 +1,217 @@
+# decision_log.py
+"""
+Rotation des logs de décisions (decisions_log_XXXXXX.jsonl), sûre entre sessions et processus.
+
+Chaque chunk n'est écrit que par le processus qui l'a réclamé : ses lignes ne se
+mélangent jamais à celles d'un autre processus et son compteur, tenu en
+mémoire sous verrou, garantit DECISIONS_CHUNK_SIZE lignes par chunk.
+
+Les réclamations passent par decisions_meta.json, modifié sous verrou de fichier
+(decisions_meta.lock) et remplacé atomiquement :
+    {"version": 2, "next_idx": N, "open": {"idx": {"pid": ..., "host": ...}}}
+Au démarrage, et à chaque réclamation, next_idx est recalé sur les chunks
+présents sur disque ou archivés ; un chunk ouvert dont le propriétaire (même machine) est
+mort est repris là où il s'est arrêté. L'ancien format {file_idx, count_in_file}
+est migré : son chunk courant est repris.
+"""
+import os, re, json, glob, atexit, socket, threading
+from contextlib import contextmanager
+
+from config import DECISIONS_LOG_FILE, DECISIONS_META_FILE, DECISIONS_CHUNK_SIZE
+from log_writer import get_log_writer
+
+META_VERSION = 2
+_CHUNK_RE = re.compile(r"decisions_log_(\d{6,})\.jsonl$")
+_ARCHIVE_RE = re.compile(r"decisions_log_(\d{6,})\.npz$")
+
+def chunk_path(idx: int, log_dir: str = None) -> str:
+    log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+    return os.path.join(log_dir, "decisions_log_{:06d}.jsonl".format(idx))
+
+def archive_path(idx: int, log_dir: str = None) -> str:
+    """Archive colonnaire d'un chunk fermé (decision_archive.py)."""
+    log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+    return os.path.join(log_dir, "archive", "decisions_log_{:06d}.npz".format(idx))
+
+def _scan(pattern, regex):
+    out = []
+    for path in glob.glob(pattern):
+        m = regex.search(os.path.basename(path))
+        if m:
+            out.append((int(m.group(1)), path))
+    return sorted(out)
+
+def existing_chunks(log_dir: str = None):
+    """[(idx, chemin)] des chunks présents, par indice croissant."""
+    log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+    return _scan(os.path.join(log_dir, "decisions_log_*.jsonl"), _CHUNK_RE)
+
+def archived_chunks(log_dir: str = None):
+    """[(idx, chemin)] des chunks archivés, par indice croissant."""
+    log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+    return _scan(os.path.join(log_dir, "archive", "decisions_log_*.npz"), _ARCHIVE_RE)
+
+def _recover_chunk(path) -> int:
+    """Lignes d'un chunk repris ; une dernière ligne tronquée (arrêt brutal) est terminée par « \n »."""
+    try:
+        with open(path, "rb") as f:
+            count, last = 0, b"\n"
+            for line in f:
+                count += 1
+                last = line
+        if not last.endswith(b"\n"):
+            with open(path, "ab") as f:
+                f.write(b"\n")
+        return count
+    except OSError:
+        return 0
+
+@contextmanager
+def file_lock(path):
+    """Verrou exclusif entre processus (fcntl, msvcrt sous Windows)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True   # existe, mais pas à nous
+    return True
+
+class DecisionLogRotation:
+    def __init__(self, meta_path: str = DECISIONS_META_FILE, chunk_size: int = DECISIONS_CHUNK_SIZE,
+                 log_dir: str = None, writer=None):
+        self.meta_path = meta_path
+        self.lock_path = os.path.splitext(meta_path)[0] + ".lock"
+        self.chunk_size = chunk_size
+        self.log_dir = log_dir or os.path.dirname(DECISIONS_LOG_FILE)
+        self.writer = writer
+        self.me = {"pid": os.getpid(), "host": socket.gethostname()}
+        self.lock = threading.Lock()
+        self.idx = None
+        self.count = 0
+
+    # ---------- métadonnées (sous verrou de fichier) ----------
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get("version") == META_VERSION:
+            return meta
+        if "file_idx" in meta:   # ancien format : chunk courant sans propriétaire, repris
+            return {"version": META_VERSION, "next_idx": meta["file_idx"] + 1,
+                    "open": {str(meta["file_idx"]): {"pid": None, "host": self.me["host"]}}}
+        return {"version": META_VERSION, "next_idx": 1, "open": {}}
+
+    def _write_meta(self, meta):
+        tmp = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)
+
+    def _orphaned(self, owner) -> bool:
+        # rendu par close() (pid None), ou propriétaire mort sur cette machine
+        if owner.get("pid") is None:
+            return True
+        return owner.get("host") == self.me["host"] and not _pid_alive(owner.get("pid"))
+
+    def _claim(self):
+        """Réclame un chunk : reprise d'un chunk orphelin non plein, sinon un nouvel indice."""
+        with file_lock(self.lock_path):
+            meta = self._read_meta()
+            # chunks présents ou déjà archivés (leur .jsonl a pu être supprimé)
+            on_disk = existing_chunks(self.log_dir) + archived_chunks(self.log_dir)
+            meta["next_idx"] = max([meta["next_idx"]] + [i + 1 for i, _ in on_disk])
+            opened = meta["open"]
+            for key in sorted(opened, key=int):
+                if self._orphaned(opened[key]):
+                    count = _recover_chunk(chunk_path(int(key), self.log_dir))
+                    if count < self.chunk_size:
+                        opened[key] = self.me
+                        self._write_meta(meta)
+                        return int(key), count
+                    del opened[key]
+            idx = meta["next_idx"]
+            meta["next_idx"] = idx + 1
+            opened[str(idx)] = self.me
+            self._write_meta(meta)
+            return idx, 0
+
+    def _release(self, idx):
+        with file_lock(self.lock_path):
+            meta = self._read_meta()
+            meta["open"].pop(str(idx), None)
+            self._write_meta(meta)
+
+    # ---------- écriture ----------
+    def append(self, line: str, owner=None) -> str:
+        """Ajoute une ligne (via le log writer, erreurs rangées sous `owner`) au chunk courant, tourne s'il est plein ; renvoie son chemin."""
+        with self.lock:
+            if self.idx is None:
+                self.idx, self.count = self._claim()
+            path = chunk_path(self.idx, self.log_dir)
+            self.writer.write(path, line, owner)   # sous le verrou : ordre des lignes = ordre des comptes
+            self.count += 1
+            if self.count >= self.chunk_size:
+                self.writer.flush()         # chunk complet sur disque avant d'être archivable
+                self._release(self.idx)
+                self.idx = None
+            return path
+
+    def close(self):
+        """Rend le chunk courant (il pourra être repris par un autre processus)."""
+        with self.lock:
+            if self.idx is not None:
+                self.writer.flush()         # ses lignes sur disque avant qu'un autre le reprenne
+                with file_lock(self.lock_path):
+                    meta = self._read_meta()
+                    owner = meta["open"].get(str(self.idx))
+                    if owner == self.me:
+                        owner["pid"] = None
+                        self._write_meta(meta)
+                self.idx = None
+
+    def closed_chunks(self):
+        """[(idx, chemin)] des chunks pleins ou abandonnés : ni ouverts, ni réclamables."""
+        with file_lock(self.lock_path):
+            meta = self._read_meta()
+        opened = {int(k) for k in meta["open"]}
+        return [(i, p) for i, p in existing_chunks(self.log_dir) if i not in opened]
+
+_ROTATION = None
+_ROTATION_LOCK = threading.Lock()
+
+def get_decision_log() -> DecisionLogRotation:
+    """Rotation unique du processus, partagée par toutes les sessions ; chunk rendu à la sortie."""
+    global _ROTATION
+    with _ROTATION_LOCK:
+        if _ROTATION is None:
+            _ROTATION = DecisionLogRotation(writer=get_log_writer())
+            # atexit en ordre inverse : close() passe avant l'arrêt du log writer, d'où son flush()
+            atexit.register(_ROTATION.close)
+        return _ROTATION
@@ -0,0 +1,143 @@
+# equity.py
+"""
+Équité heads-up (gain / égalité / perte) de deux mains sur un board partiel.
+
+- flop, turn, river : énumération exacte des tirages restants (990, 44 ou 1) ;
+- préflop : Monte Carlo par lots, réparti sur un pool de processus, avec des
+  flux aléatoires dérivés de (seed, index du lot) — le résultat ne dépend donc
+  ni du nombre de processus ni de l'ordre d'exécution — et arrêt dès que
+  l'erreur standard passe sous `target_se`.
+"""
+import os, math
+import concurrent.futures
+from functools import lru_cache
+from itertools import chain, combinations
+
+import numpy as np
+
+from poker_engine import card_features, rank_from_features, _load_np_eval_tables
+
+PREFLOP_RUNOUTS = math.comb(48, 5)  # 1 712 304 boards possibles préflop
+
+_POOL = None
+_POOL_WORKERS = 0
+
+def _ids(cards):
+    return [c.idx if hasattr(c, "idx") else int(c) for c in cards]
+
+def _tally(hole_a, hole_b, boards):
+    """
+    (victoires A, égalités) sur un tableau (N, 5) de boards complets.
+    hole_a / hole_b : une main (2,) commune à tous les boards, ou une par ligne (N, 2).
+    """
+    rk, sk, fb = card_features(boards)
+    ra = rank_from_features(*(x + y for x, y in zip((rk, sk, fb), card_features(np.atleast_2d(hole_a)))))
+    rb = rank_from_features(*(x + y for x, y in zip((rk, sk, fb), card_features(np.atleast_2d(hole_b)))))
+    return int(np.count_nonzero(ra > rb)), int(np.count_nonzero(ra == rb))
+
+@lru_cache(maxsize=8)
+def _runout_index(n_rest: int, need: int):
+    """Toutes les combinaisons de `need` positions parmi n_rest (tableau partagé, lecture seule)."""
+    if need == 0:
+        idx = np.empty((1, 0), dtype=np.int8)   # river : un seul runout, le board lui-même
+    else:
+        idx = np.fromiter(chain.from_iterable(combinations(range(n_rest), need)), dtype=np.int8)
+        idx = idx.reshape(-1, need)
+    idx.setflags(write=False)
+    return idx
+
+def _sample_boards(rng, deck, need, board, n):
+    """n boards complétés par `need` cartes tirées sans remise dans `deck`."""
+    idx = rng.integers(0, len(deck), size=(n, need))
+    if need > 1:
+        # rejet des lignes avec doublons (~20 % préflop), retirées jusqu'à épuisement
+        s = np.sort(idx, axis=1)
+        bad = np.flatnonzero((s[:, 1:] == s[:, :-1]).any(axis=1))
+        while bad.size:
+            idx[bad] = rng.integers(0, len(deck), size=(bad.size, need))
+            s = np.sort(idx[bad], axis=1)
+            bad = bad[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+    drawn = deck[idx]
+    if board:
+        drawn = np.concatenate([np.broadcast_to(np.asarray(board, dtype=deck.dtype), (n, len(board))), drawn], axis=1)
+    return drawn
+
+def _mc_batch(hole_a, hole_b, board, n, seed, batch_idx):
+    """Un lot Monte Carlo ; son flux aléatoire ne dépend que de (seed, batch_idx)."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch_idx,)))
+    dead = set(hole_a) | set(hole_b) | set(board)
+    deck = np.array([c for c in range(52) if c not in dead], dtype=np.intp)
+    wins, ties = _tally(hole_a, hole_b, _sample_boards(rng, deck, 5 - len(board), board, n))
+    return wins, ties, n
+
+def _get_pool(workers: int):
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        if _POOL is not None:
+            _POOL.shutdown(cancel_futures=True)
+        _load_np_eval_tables()  # chargées avant le fork : héritées par les workers
+        _POOL = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        _POOL_WORKERS = workers
+    return _POOL
+
+def _result(wins, ties, n, exact):
+    losses = n - wins - ties
+    eq = (wins + 0.5 * ties) / n
+    # écart-type de l'issue par runout (1 / 0.5 / 0) ; nul si énumération exacte
+    var = max((wins + 0.25 * ties) / n - eq * eq, 0.0)
+    return {
+        "win": wins / n, "tie": ties / n, "loss": losses / n,
+        "equity": eq, "n": n, "exact": exact,
+        "se": 0.0 if exact else math.sqrt(var / n),
+    }
+
+def enumerate_equity(hole_a, hole_b, board):
+    """
+    Équité exacte de hole_a contre hole_b sur un board de 3 à 5 cartes
+    (accepte aussi un board vide : 1,7 M boards, quelques secondes).
+    """
+    hole_a, hole_b, board = _ids(hole_a), _ids(hole_b), _ids(board)
+    dead = set(hole_a) | set(hole_b) | set(board)
+    rest = [c for c in range(52) if c not in dead]
+    need = 5 - len(board)
+    runouts = np.array(rest, dtype=np.intp)[_runout_index(len(rest), need)]
+    boards = np.concatenate([np.tile(np.array(board, dtype=np.intp), (len(runouts), 1)), runouts], axis=1)
+    wins, ties = _tally(hole_a, hole_b, boards)
+    return _result(wins, ties, len(boards), exact=True)
+
+def monte_carlo_equity(hole_a, hole_b, board=(), *, seed: int = 0, target_se: float = 5e-4,
+                       min_samples: int = 100_000, max_samples: int = PREFLOP_RUNOUTS,
+                       batch_size: int = 32_768, wave: int = 8, workers: int | None = None):
+    """
+    Équité Monte Carlo de hole_a contre hole_b.
+
+    Les lots sont soumis par vagues de `wave` lots ; on s'arrête à la fin d'une
+    vague dès que n >= min_samples et se <= target_se, ou que n >= max_samples.
+    La taille des vagues est fixe : le résultat est identique quel que soit
+    `workers` (workers=0 : tout dans le processus courant, sans pool).
+    """
+    hole_a, hole_b, board = _ids(hole_a), _ids(hole_b), _ids(board)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    pool = _get_pool(workers) if workers > 1 else None
+    wins = ties = n = 0
+    batch_idx = 0
+    while True:
+        sizes = [min(batch_size, max_samples - n - i * batch_size) for i in range(wave)]
+        sizes = [k for k in sizes if k > 0]
+        args = [(hole_a, hole_b, board, k, seed, batch_idx + i) for i, k in enumerate(sizes)]
+        batch_idx += len(sizes)
+        if pool is not None:
+            results = pool.map(_mc_batch, *zip(*args))
+        else:
+            results = (_mc_batch(*a) for a in args)
+        for w, t, k in results:
+            wins += w; ties += t; n += k
+        res = _result(wins, ties, n, exact=False)
+        if n >= max_samples or (n >= min_samples and res["se"] <= target_se):
+            return res
+
+def hand_equity(hole_a, hole_b, board=(), **mc_kwargs):
+    """Équité de hole_a : exacte dès le flop, Monte Carlo préflop (cf. monte_carlo_equity)."""
+    if len(board) >= 3:
+        return enumerate_equity(hole_a, hole_b, board)
+    return monte_carlo_equity(hole_a, hole_b, board, **mc_kwargs)
@@ -0,0 +1,288 @@
+# game_engine.py
+"""
+Moteur de jeu heads-up sans Streamlit.
+
+MatchState porte tout l'état d'un HU (stacks, positions, main en cours) et
+expose les transitions de app_state avec exactement la même sémantique
+d'enchères : initialize_game, start_new_hand, process_action, next_street,
+handle_showdown, run_out_board_and_showdown.
+app_state n'est plus qu'un adaptateur qui recopie cet état dans st.session_state.
+"""
+import uuid
+from config import BB, SB, INITIAL_STACK, STREET_MAP
+from poker_engine import Deck, deal_seed, hand_rank
+
+# Champs d'état de jeu, recopiés tels quels dans st.session_state par app_state
+STATE_FIELDS = (
+    "player_stack", "ai_stack", "player_pos", "ai_pos", "game_over",
+    "prompt_actions", "decision_logs", "hu_uid", "hu_hand_seq",
+    "current_hand_uid", "current_hand_logged", "consecutive_checks",
+    "hand_start_player_stack", "hand_start_ai_stack", "player_start_stack", "ai_start_stack",
+    "player_bet", "ai_bet", "pot", "bet_to_match", "last_raise", "last_aggressor",
+    "show_ai_hand", "allin_ai_equity", "deck", "player_hand", "ai_hand", "board",
+    "street_num", "winner", "turn", "action_log", "is_all_in",
+    "deal_seed", "deal_replay",
+)
+
+class MatchState:
+    """
+    Un match heads-up (« player » contre « ai »).
+
+    lang / player_name : langue et nom utilisés dans action_log (comme l'UI) ;
+    track_equity : calcule allin_ai_equity lors d'un tapis (coûteux préflop sans table) ;
+    on_hand_end(state, winner) : appelé une fois par main terminée ;
+    duplicate : les mains vont par paires, la seconde rejoue la donne de la
+    première avec les cartes privées échangées (les positions alternent déjà).
+
+    Chaque donne est tirée de Deck(deal_seed(hu_uid, clé)), clé = numéro de
+    la main (ou de la paire en mode duplicate) : la graine est loggée avec la main.
+    """
+    __slots__ = STATE_FIELDS + ("lang", "player_name", "track_equity", "on_hand_end", "duplicate")
+
+    def __init__(self, lang="en", player_name=None, track_equity=False, on_hand_end=None, duplicate=False):
+        for k in STATE_FIELDS:
+            setattr(self, k, None)
+        self.lang = lang
+        self.player_name = player_name
+        self.track_equity = track_equity
+        self.on_hand_end = on_hand_end
+        self.duplicate = duplicate
+
+    def L(self, en: str, fr: str) -> str:
+        return fr if self.lang == "fr" else en
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key): return getattr(self, key)
+    def __setitem__(self, key, value): setattr(self, key, value)
+
+    # ---------- cycle de vie ----------
+    def initialize_game(self, hu_uid=None):
+        self.player_stack = INITIAL_STACK; self.ai_stack = INITIAL_STACK
+        self.player_pos = "SB"; self.ai_pos = "BB"
+        self.game_over = False
+        self.prompt_actions = []
+        self.decision_logs = []
+        self.hu_uid = hu_uid or str(uuid.uuid4())
+        self.hu_hand_seq = 0
+        self.start_new_hand()
+
+    def start_new_hand(self):
+        self.current_hand_uid = str(uuid.uuid4())
+        self.current_hand_logged = False
+        self.consecutive_checks = 0
+        self.hand_start_player_stack = self.player_stack
+        self.hand_start_ai_stack = self.ai_stack
+        self.player_bet = self.ai_bet = 0
+        self.pot = 0
+        self.bet_to_match = self.last_raise = 0
+        self.last_aggressor = None
+        self.prompt_actions = []
+        self.decision_logs = []
+        self.show_ai_hand = False
+        self.allin_ai_equity = None
+        if self.player_stack <= 0 or self.ai_stack <= 0:
+            self.game_over = True; return
+        self.player_pos, self.ai_pos = self.ai_pos, self.player_pos
+        self.player_start_stack = self.player_stack; self.ai_start_stack = self.ai_stack
+        seq = int(self.hu_hand_seq or 0) + 1
+        self.deal_replay = self.duplicate and seq % 2 == 0
+        self.deal_seed = deal_seed(self.hu_uid, (seq + 1) // 2 if self.duplicate else seq)
+        deck = Deck(self.deal_seed); self.deck = deck
+        if self.deal_replay:
+            self.ai_hand = deck.deal(2); self.player_hand = deck.deal(2)
+        else:
+            self.player_hand = deck.deal(2); self.ai_hand = deck.deal(2)
+        self.board = []; self.pot = 0; self.street_num = 0; self.winner = None
+        self.action_log = {key: [] for key in list(STREET_MAP.values()) + ['showdown']}
+        self.is_all_in = False
+        if self.player_pos == "SB":
+            sb_p, bb_p = "player", "ai"
+            self.player_bet, self.ai_bet = SB, BB
+        else:
+            sb_p, bb_p = "ai", "player"
+            self.ai_bet, self.player_bet = SB, BB
+        self[f"{sb_p}_stack"] -= SB; self[f"{bb_p}_stack"] -= BB
+        self.pot = SB + BB; self.bet_to_match = BB
+        self.last_raise = BB; self.turn = sb_p
+        log = self.action_log["preflop"]
+        player_label = self.L("Player", "Le Joueur")
+        if sb_p == "player":
+            log.append(f"{player_label} mise {SB}."); log.append(f"L'IA mise {BB}.")
+        else:
+            log.append(f"L'IA mise {SB}."); log.append(f"{player_label} mise {BB}.")
+        if self.player_stack <= 0 or self.ai_stack <= 0:
+            log.append(self.L("A player is all-in with the blinds!", "Un joueur est à tapis avec les blindes !"))
+            effective_bet = min(self.player_bet, self.ai_bet)
+            if self.player_bet > effective_bet:
+                refund = self.player_bet - effective_bet
+                self.player_stack += refund; self.pot -= refund; self.player_bet -= refund
+            elif self.ai_bet > effective_bet:
+                refund = self.ai_bet - effective_bet
+                self.ai_stack += refund; self.pot -= refund; self.ai_bet -= refund
+            self.run_out_board_and_showdown()
+
+    def _finish_hand(self, winner):
+        if self.current_hand_logged:
+            return
+        self.current_hand_logged = True
+        self.hu_hand_seq = int(self.hu_hand_seq or 0) + 1
+        if self.on_hand_end is not None:
+            self.on_hand_end(self, winner)
+
+    # ---------- streets ----------
+    def next_street(self):
+        self.consecutive_checks = 0
+        self.last_aggressor = None
+        self.street_num += 1
+        if self.street_num == 1: self.board = self.deck.deal(3)
+        elif self.street_num in (2, 3): self.board.extend(self.deck.deal(1))
+
+        if self.street_num > 3:
+            self.handle_showdown()
+        else:
+            self.turn = "player" if self.player_pos == "BB" else "ai"
+            self.bet_to_match = 0; self.player_bet = 0; self.ai_bet = 0; self.last_raise = 0
+
+    def handle_showdown(self):
+        p_score = hand_rank(self.player_hand, self.board); a_score = hand_rank(self.ai_hand, self.board)
+        player_invested = self.player_start_stack - self.player_stack; ai_invested = self.ai_start_stack - self.ai_stack
+        common_pot = min(player_invested, ai_invested) * 2
+        if p_score > a_score: winner = "player"
+        elif a_score > p_score: winner = "ai"
+        else: winner = "tie"
+        self.winner = winner
+        self.show_ai_hand = True
+        if winner == "tie": self.player_stack += common_pot // 2; self.ai_stack += common_pot // 2
+        else: self[f"{winner}_stack"] += common_pot
+        if player_invested > ai_invested: self.player_stack += player_invested - ai_invested
+        elif ai_invested > player_invested: self.ai_stack += ai_invested - player_invested
+        log = self.action_log["showdown"]
+        log.append(self.L(f"Winner: {winner}.", f"Gagnant: {winner}."))
+        self.turn = None
+        gain = self.player_stack - self.hand_start_player_stack
+        if gain > 0:
+            who = self.player_name or self.L('the player', 'Le joueur')
+            log.append(self.L(f"Result: {who} wins {gain}.", f"Résultat : {who} gagne {gain}."))
+        elif gain < 0:
+            log.append(self.L(f"Result: spinGPT wins {-gain}.", f"Résultat : spinGPT gagne {-gain}."))
+        else:
+            log.append(self.L("Result: split pot.", "Résultat : partage du pot."))
+
+        self._finish_hand(winner)
+
+    def run_out_board_and_showdown(self):
+        self.turn = None
+        if self.track_equity:
+            # Équité de l'IA au moment du tapis (table préflop, sinon exacte dès le flop / Monte Carlo)
+            from equity import hand_equity
+            from preflop_table import preflop_equity
+            eq = preflop_equity(self.ai_hand, self.player_hand) if not self.board else None
+            if eq is None:
+                eq = hand_equity(self.ai_hand, self.player_hand, self.board,
+                                 workers=0, target_se=2e-3, min_samples=20_000, batch_size=8_192)["equity"]
+            self.allin_ai_equity = round(eq, 4)
+        cards_to_deal = 5 - len(self.board)
+        if cards_to_deal > 0: self.board.extend(self.deck.deal(cards_to_deal))
+        self.handle_showdown()
+
+    # ---------- actions ----------
+    def legal_actions(self):
+        """Actions possibles pour le joueur au trait, au sens de process_action."""
+        actor = self.turn
+        if actor is None:
+            return []
+        to_call = self.bet_to_match - self[f"{actor}_bet"]
+        acts = ["fold", "check"] if to_call <= 0 else ["fold", "call"]
+        opp = "ai" if actor == "player" else "player"
+        if self[f"{actor}_stack"] > max(to_call, 0) and self[f"{opp}_stack"] > 0:
+            acts.append("raise" if (self.street_num == 0 or to_call > 0) else "bet")
+        return acts
+
+    def process_action(self, actor: str, action: str, amount: int = 0):
+        opponent = "ai" if actor == "player" else "player"
+        name = self.player_name or self.L("Player", "Le Joueur")
+        actor_name = name if actor == "player" else "L'IA"
+        street_name = STREET_MAP[self.street_num]
+        stack = self[f"{actor}_stack"]
+        log = self.action_log[street_name]
+
+        def record_prompt_action():
+            actor_tag = "H" if actor == "ai" else self.player_pos
+            if action == "check": sym = "x"
+            elif action == "fold": sym = "f"
+            elif action == "call": sym = "c"
+            elif action in ("bet", "raise"): sym = ("r" if action == "raise" else "b") + f"{amount/BB:g}"
+            else: sym = "a"
+            self.prompt_actions.append((self.street_num, actor_tag, sym))
+
+        if action == "call" and self.bet_to_match == self[f"{actor}_bet"]:
+            action = "check"
+
+        if action == "fold":
+            record_prompt_action()
+            self.winner = opponent
+            self[f"{opponent}_stack"] += self.pot
+            log.append(f"{actor_name} se couche.")
+            self.turn = None
+            net = self.ai_stack - self.hand_start_ai_stack if opponent == "ai" else self.player_stack - self.hand_start_player_stack
+            who = self.player_name or self.L('The player', 'Le joueur')
+            self.action_log["showdown"].append(
+                self.L(f"Result: {who} wins {net}.", f"Résultat : {who} gagne {net}.")
+            )
+            self._finish_hand(opponent)
+
+        elif action == "check":
+            log.append(f"{actor_name} check.")
+
+        elif action == "call":
+            paid = min(self.bet_to_match - self[f"{actor}_bet"], stack)
+            self[f"{actor}_stack"] -= paid
+            self[f"{actor}_bet"] += paid
+            self.pot += paid
+            log.append(f"{actor_name} paie {paid}.")
+
+        elif action in ("bet", "raise"):
+            total_bet = min(amount, stack + self[f"{actor}_bet"])
+            to_pay = total_bet - self[f"{actor}_bet"]
+            self[f"{actor}_stack"] -= to_pay
+            self[f"{actor}_bet"] = total_bet
+            self.pot += to_pay
+            self.last_raise = total_bet - self.bet_to_match
+            self.bet_to_match = total_bet
+            self.last_aggressor = actor
+            verb = "relance à" if action == "raise" else "mise"
+            log.append(f"{actor_name} {verb} {total_bet}.")
+
+        else:
+            raise ValueError(f"Action inconnue : {action}")
+
+        self.consecutive_checks = (self.consecutive_checks + 1 if action == "check" else 0)
+
+        if self.player_stack <= 0 or self.ai_stack <= 0:
+            self.is_all_in = True
+        if self.is_all_in and action == "call":
+            record_prompt_action()
+            self.run_out_board_and_showdown()
+            return
+
+        def betting_round_closed() -> bool:
+            if self.street_num == 0:
+                mises_equal = self.player_bet == self.ai_bet
+                if action == "check" and self[f"{actor}_pos"] == "BB" and mises_equal: return True
+                if action == "call" and mises_equal and self.last_aggressor and actor != self.last_aggressor: return True
+                return False
+            if action == "call": return True
+            if action == "check" and self.consecutive_checks >= 2: return True
+            return False
+
+        if betting_round_closed():
+            record_prompt_action()
+            if self.street_num == 3:
+                self.handle_showdown()
+            else:
+                self.next_street()
+        else:
+            record_prompt_action()
+            self.turn = opponent
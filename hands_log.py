@@ -0,0 +1,375 @@
+# hands_log.py
+"""
+Log des mains en segments, avec un index à côté de chaque segment.
+
+Écriture : HANDS_LOG_DIR/hands_log_XXXXXX.jsonl, via le log writer. On passe au
+segment suivant dès que le courant dépasse HANDS_SEGMENT_MB ou a plus de
+HANDS_SEGMENT_HOURS. Le segment courant est partagé par tous les processus :
+hands_meta.json {"idx", "opened"}, modifié sous verrou de fichier et remplacé
+atomiquement. La taille est lue sur disque, donc un segment peut déborder des
+quelques lignes encore en file dans le log writer.
+
+Index : hands_log_XXXXXX.idx.json, un fichier par segment.
+    {"offset": octets indexés, "head": empreinte du début, "rows": n, "ts": [min, max],
+     "pp": {joueur: [décalages]}, "hu": {hu_uid: [décalages]}, "wl": {joueur: [w, l]}}
+Il est complété de façon incrémentale par refresh(), qui ne lit que les octets
+ajoutés depuis la dernière fois et s'arrête à la dernière ligne complète. Les
+mains nouvelles sont ajoutées à l'index en mémoire et, sur disque, à un journal
+hands_log_XXXXXX.idx.delta (une ligne {"start", "end", "head", "recs"} par
+refresh, sans fsync) ; l'index complet n'est réécrit que toutes les
+HANDS_INDEX_SNAPSHOT_ROWS mains et quand le segment n'est plus le courant, puis
+le journal est supprimé. Au chargement, seules les lignes du journal qui
+prolongent l'index (start = offset) sont rejouées ; le reste est relu dans le
+segment. L'index complet est protégé comme l'était le point de reprise du W–L :
+remplacement atomique, somme de contrôle, et recalcul complet si le segment a
+été tronqué ou remplacé. L'ancien hands_log.jsonl unique (LOG_FILE) est indexé de la même
+façon, en premier segment, sans être réécrit.
+
+Requêtes : les mains d'un joueur ou d'un HU se lisent par accès direct aux
+décalages de l'index. Les segments hors de la période demandée sont écartés
+d'après leurs bornes ts.
+
+    python hands_log.py index                      # met l'index à jour, résumé par segment
+    python hands_log.py query --player X [--since 2026-01-01] [--until 2026-02-01]
+    python hands_log.py query --hu <hu_uid>
+"""
+import os, re, json, glob, time, hashlib, argparse, threading
+
+from config import LOG_FILE, HANDS_LOG_DIR, HANDS_SEGMENT_MB, HANDS_SEGMENT_HOURS, HANDS_INDEX_SNAPSHOT_ROWS
+from decision_log import file_lock
+from hands_wl import wl_outcome
+from log_writer import get_log_writer
+
+INDEX_VERSION = 1
+_SEGMENT_RE = re.compile(r"hands_log_(\d{6,})\.jsonl$")
+_HEAD_BYTES = 4096
+_READ_BYTES = 1 << 20
+
+def segment_path(idx: int, log_dir: str = None) -> str:
+    return os.path.join(log_dir or HANDS_LOG_DIR, "hands_log_{:06d}.jsonl".format(idx))
+
+def index_path(seg_path: str) -> str:
+    return os.path.splitext(seg_path)[0] + ".idx.json"
+
+def delta_path(seg_path: str) -> str:
+    return os.path.splitext(seg_path)[0] + ".idx.delta"
+
+def segments(log_dir: str = None, legacy: str = LOG_FILE):
+    """Chemins des segments, du plus ancien au plus récent (l'ancien log unique en tête)."""
+    found = []
+    for path in glob.glob(os.path.join(log_dir or HANDS_LOG_DIR, "hands_log_*.jsonl")):
+        m = _SEGMENT_RE.search(os.path.basename(path))
+        if m:
+            found.append((int(m.group(1)), path))
+    out = [p for _, p in sorted(found)]
+    if legacy and os.path.exists(legacy):
+        out.insert(0, legacy)
+    return out
+
+def _write_json(path, doc):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _digest(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def _read_at(f, offsets):
+    for at in offsets:
+        f.seek(at)
+        yield f.readline()
+
+# ====================== ÉCRITURE ======================
+class HandsLog:
+    def __init__(self, log_dir: str = HANDS_LOG_DIR, segment_mb: float = HANDS_SEGMENT_MB,
+                 segment_hours: float = HANDS_SEGMENT_HOURS, writer=None):
+        self.log_dir = log_dir
+        self.meta_path = os.path.join(log_dir, "hands_meta.json")
+        self.lock_path = os.path.join(log_dir, "hands_meta.lock")
+        self.segment_bytes = int(segment_mb * 2 ** 20)
+        self.segment_seconds = segment_hours * 3600
+        self.writer = writer
+        self.lock = threading.Lock()
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            return int(meta["idx"]), float(meta["opened"])
+        except (OSError, ValueError, KeyError, TypeError):
+            # méta perdue : on repart après le dernier segment présent
+            last = segments(self.log_dir, legacy=None)
+            m = _SEGMENT_RE.search(os.path.basename(last[-1])) if last else None
+            return (int(m.group(1)) + 1 if m else 1), 0.0
+
+    def _current(self) -> str:
+        """Segment où écrire, après rotation éventuelle (sous verrou de fichier)."""
+        with file_lock(self.lock_path):
+            idx, opened = self._read_meta()
+            now = time.time()
+            if opened:
+                try:
+                    size = os.path.getsize(segment_path(idx, self.log_dir))
+                except OSError:
+                    size = 0
+                if size and (size >= self.segment_bytes or now - opened >= self.segment_seconds):
+                    idx, opened = idx + 1, 0.0
+            if not opened:
+                _write_json(self.meta_path, {"idx": idx, "opened": now})
+            return segment_path(idx, self.log_dir)
+
+    def append(self, row: dict, owner=None) -> str:
+        """Ajoute une main (ligne de hand_history_row) au segment courant ; renvoie son chemin."""
+        with self.lock:
+            path = self._current()
+            self.writer.write(path, json.dumps(row, ensure_ascii=False), owner)
+            return path
+
+# ====================== INDEX ======================
+class HandsIndex:
+    def __init__(self, log_dir: str = HANDS_LOG_DIR, legacy: str = LOG_FILE,
+                 snapshot_rows: int = HANDS_INDEX_SNAPSHOT_ROWS):
+        self.log_dir = log_dir
+        self.legacy = legacy
+        self.snapshot_rows = snapshot_rows
+        self.lock = threading.Lock()
+        self.entries = {}        # chemin du segment -> index chargé
+        self.pending = {}        # chemin du segment -> mains dans le journal (None : index complet à réécrire)
+        self.read_bytes = 0      # octets de segments lus par le dernier refresh()
+
+    @staticmethod
+    def _empty():
+        return {"offset": 0, "head": "", "rows": 0, "ts": [None, None], "pp": {}, "hu": {}, "wl": {}}
+
+    def _load(self, seg_path):
+        """Index complet du segment, prolongé par son journal d'ajouts."""
+        entry, pending = self._empty(), None
+        try:
+            with open(index_path(seg_path), encoding="utf-8") as f:
+                doc = json.load(f)
+            if doc.get("version") == INDEX_VERSION and doc.get("sha256") == _digest(doc["index"]):
+                entry, pending = doc["index"], 0
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        try:
+            with open(delta_path(seg_path), encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        continue        # ligne tronquée
+                    if not isinstance(delta, dict) or delta.get("start") != entry["offset"]:
+                        continue        # ne prolonge pas l'index : ces mains seront relues
+                    self._fold(entry, delta["recs"])
+                    entry["offset"], entry["head"] = delta["end"], delta["head"]
+                    if pending is not None:
+                        pending += len(delta["recs"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError):
+            entry, pending = self._empty(), None
+        self.pending[seg_path] = pending
+        return entry
+
+    def _save(self, seg_path, entry):
+        """Réécrit l'index complet et supprime le journal qu'il remplace."""
+        try:
+            _write_json(index_path(seg_path), {"version": INDEX_VERSION, "segment": os.path.basename(seg_path),
+                                               "index": entry, "sha256": _digest(entry)})
+        except OSError:
+            return      # index non écrit : le prochain processus relira ce segment
+        try:
+            os.remove(delta_path(seg_path))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return
+        self.pending[seg_path] = 0
+
+    def _log_delta(self, seg_path, delta):
+        try:
+            with open(delta_path(seg_path), "a", encoding="utf-8") as f:
+                f.write(json.dumps(delta, ensure_ascii=False, separators=(",", ":")) + "\n")
+        except OSError:
+            return      # journal non écrit : ces mains seront relues par le prochain processus
+        self.pending[seg_path] += len(delta["recs"])
+
+    @staticmethod
+    def _head(f, offset) -> str:
+        f.seek(0)
+        return hashlib.sha1(f.read(min(offset, _HEAD_BYTES))).hexdigest()
+
+    @staticmethod
+    def _parse(line):
+        """[décalage, joueur, hu_uid, ts, "w" | "l" | None] d'une ligne du segment, None si illisible."""
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(rec, dict):
+            return None
+        t = rec.get("ts")
+        try:
+            out = wl_outcome(rec)
+        except (ValueError, TypeError):
+            out = None
+        return [(rec.get("pp") or "").strip(), str(rec["hu"]) if rec.get("hu") else None,
+                t if isinstance(t, str) else None, out[1] if out else None]
+
+    @staticmethod
+    def _fold(entry, recs):
+        """Ajoute à l'index les mains [décalage, joueur, hu_uid, ts, w/l]."""
+        pp, hu, wl, ts = entry["pp"], entry["hu"], entry["wl"], entry["ts"]
+        for at, name, uid, t, out in recs:
+            entry["rows"] += 1
+            if name:
+                pp.setdefault(name, []).append(at)
+            if uid:
+                hu.setdefault(uid, []).append(at)
+            if t is not None:
+                ts[0] = t if ts[0] is None or t < ts[0] else ts[0]
+                ts[1] = t if ts[1] is None or t > ts[1] else ts[1]
+            if out:
+                wl.setdefault(name, [0, 0])[out == "l"] += 1
+
+    def _tail(self, seg_path, entry, sealed=False):
+        """Indexe les lignes complètes ajoutées au segment ; renvoie l'index à jour.
+
+        sealed : le segment n'est plus le courant, son index complet est réécrit une dernière fois.
+        """
+        try:
+            f = open(seg_path, "rb")
+        except FileNotFoundError:
+            return self._empty()
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if entry["offset"] > size or (entry["offset"] and self._head(f, entry["offset"]) != entry["head"]):
+                entry = self._empty()      # segment tronqué ou remplacé
+                self.pending[seg_path] = None
+            offset = start = entry["offset"]
+            recs = []        # lues d'abord : l'index en mémoire n'est modifié qu'après une lecture complète
+            f.seek(offset)
+            rest = b""
+            while True:
+                chunk = f.read(_READ_BYTES)
+                if not chunk:
+                    break
+                lines = (rest + chunk).split(b"\n")
+                rest = lines.pop()          # ligne incomplète : indexée au prochain refresh()
+                for line in lines:
+                    at, offset = offset, offset + len(line) + 1
+                    rec = self._parse(line)
+                    if rec is not None:
+                        recs.append([at] + rec)
+            self.read_bytes += offset - start + len(rest)
+            if offset != start:
+                entry["offset"], entry["head"] = offset, self._head(f, offset)
+                self._fold(entry, recs)
+            pending = self.pending.get(seg_path)
+            if pending is None:
+                if offset:
+                    self._save(seg_path, entry)     # pas d'index complet valide sur disque
+            elif (sealed and pending) or (offset != start and pending + len(recs) >= self.snapshot_rows):
+                self._save(seg_path, entry)
+            elif offset != start:
+                self._log_delta(seg_path, {"start": start, "end": offset, "head": entry["head"], "recs": recs})
+            return entry
+
+    def refresh(self):
+        """Met à jour l'index de chaque segment ; renvoie [(chemin, index)] du plus ancien au plus récent."""
+        with self.lock:
+            self.read_bytes = 0
+            out = []
+            paths = segments(self.log_dir, self.legacy)
+            for path in paths:
+                entry = self.entries.get(path)
+                if entry is None:
+                    entry = self._load(path)
+                entry = self.entries[path] = self._tail(path, entry, sealed=path != paths[-1])
+                out.append((path, entry))
+            return out
+
+    # ---------- requêtes ----------
+    def hands(self, player: str = None, hu_uid: str = None, since: str = None, until: str = None):
+        """Mains (dicts) d'un joueur et/ou d'un HU, avec since <= ts < until (chaînes ISO, bornes facultatives)."""
+        for path, entry in self.refresh():
+            lo, hi = entry["ts"]
+            if (since and hi is not None and hi < since) or (until and lo is not None and lo >= until):
+                continue
+            offsets = None           # période seule : segment entier
+            if player is not None:
+                offsets = set(entry["pp"].get(player, ()))
+            if hu_uid is not None:
+                sel = set(entry["hu"].get(str(hu_uid), ()))
+                offsets = sel if offsets is None else offsets & sel
+            if offsets is not None and not offsets:
+                continue
+            with open(path, "rb") as f:
+                lines = iter(f.readline, b"") if offsets is None else _read_at(f, sorted(offsets))
+                for line in lines:
+                    if not line.endswith(b"\n") or not line.strip():
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    t = rec.get("ts") or ""
+                    if (since and t < since) or (until and t >= until):
+                        continue
+                    yield rec
+
+    def wl(self) -> dict:
+        """{joueur: (w, l)} sur tous les segments."""
+        total = {}
+        for _, entry in self.refresh():
+            for name, (w, l) in entry["wl"].items():
+                w0, l0 = total.get(name, (0, 0))
+                total[name] = (w0 + w, l0 + l)
+        return total
+
+_HANDS_LOG = None
+_HANDS_INDEX = None
+_SINGLETON_LOCK = threading.Lock()
+
+def get_hands_log() -> HandsLog:
+    """Log des mains du processus (écrit via le log writer partagé)."""
+    global _HANDS_LOG
+    with _SINGLETON_LOCK:
+        if _HANDS_LOG is None:
+            _HANDS_LOG = HandsLog(writer=get_log_writer())
+        return _HANDS_LOG
+
+def get_hands_index() -> HandsIndex:
+    """Index du processus (index des segments gardés en mémoire entre deux requêtes)."""
+    global _HANDS_INDEX
+    with _SINGLETON_LOCK:
+        if _HANDS_INDEX is None:
+            _HANDS_INDEX = HandsIndex()
+        return _HANDS_INDEX
+
+def main():
+    ap = argparse.ArgumentParser(description="Index et requêtes sur le log des mains.")
+    ap.add_argument("--log-dir", default=HANDS_LOG_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("index", help="met à jour l'index des segments")
+    q = sub.add_parser("query", help="mains d'un joueur / d'un HU / d'une période")
+    q.add_argument("--player")
+    q.add_argument("--hu", help="hu_uid du match")
+    q.add_argument("--since")
+    q.add_argument("--until")
+    args = ap.parse_args()
+
+    index = HandsIndex(args.log_dir)
+    if args.cmd == "index":
+        for path, entry in index.refresh():
+            print(f"{os.path.basename(path)} : {entry['rows']} mains, {len(entry['pp'])} joueurs, "
+                  f"{len(entry['hu'])} HU, {entry['ts'][0]} -> {entry['ts'][1]}")
+        return
+    for rec in index.hands(args.player, args.hu, args.since, args.until):
+        print(json.dumps(rec, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
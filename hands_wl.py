@@ -0,0 +1,60 @@
+# hands_wl.py
+"""
+Bilan victoires–défaites (W–L) des joueurs pour le classement.
+
+wl_outcome() décide si une main termine le HU. Les totaux par joueur sont tenus
+par l'index des segments du log des mains (hands_log.py) : chaque segment garde
+son W–L à côté de ses décalages, mis à jour de façon incrémentale. Un
+rafraîchissement ne lit donc que les mains ajoutées depuis le précédent.
+"""
+import threading
+
+def wl_outcome(rec: dict):
+    """(joueur, "w" | "l") si la main termine le HU, sinon None (joueurs « Anonyme/Anonymous » ignorés)."""
+    name = (rec.get("pp") or "").strip()
+    if not name or name.lower().startswith(("anonyme", "anonymous")):
+        return None
+
+    w = rec.get("w"); ai = rec.get("ai")
+    if not isinstance(w, list) or len(w) < 2 or not isinstance(ai, list) or len(ai) < 2:
+        return None
+
+    winner, profit = w[0], int(w[1])
+    ai_start = int(ai[1])  # stack IA au début de la main
+
+    # variation IA sur la main
+    ai_profit = profit if winner == "ai" else -profit if winner == "player" else 0
+    ai_end = ai_start + ai_profit  # stack IA à la fin de la main
+
+    # Fin de HU: IA à 0 -> win humain ; IA à 5000 -> loss humain
+    if ai_end <= 0:
+        return name, "w"
+    if ai_end >= 2500 * 2:  # 5000 jetons = 25BB
+        return name, "l"
+    return None
+
+class WLAggregator:
+    def __init__(self, index=None):
+        self.index = index
+
+    @property
+    def read_bytes(self) -> int:
+        return self.index.read_bytes if self.index is not None else 0
+
+    def refresh(self) -> dict:
+        """Intègre les mains ajoutées depuis le dernier appel ; renvoie {joueur: (w, l)}."""
+        if self.index is None:
+            from hands_log import get_hands_index   # hands_log importe wl_outcome d'ici
+            self.index = get_hands_index()
+        return self.index.wl()
+
+_AGGREGATOR = None
+_AGGREGATOR_LOCK = threading.Lock()
+
+def get_wl_aggregator() -> WLAggregator:
+    """Agrégateur unique du processus (index des segments gardé en mémoire entre deux appels)."""
+    global _AGGREGATOR
+    with _AGGREGATOR_LOCK:
+        if _AGGREGATOR is None:
+            _AGGREGATOR = WLAggregator()
+        return _AGGREGATOR
@@ -1,27 +1,23 @@
 import streamlit as st
-import re, json, time, os
+import re, json, time
 from config import *
 from app_state import process_action
+from poker_engine import CARD_NAMES
+from preflop_policy import get_preflop_policy, sample_action
+from inference_service import get_inference_service
+from log_writer import get_log_writer, session_owner
+from decision_log import get_decision_log
 
 # ── 1. Helper pour formater une carte ───────────────────────────────
 def _card_to_str(c):
     """
-    Transforme un objet Card dont c.name vaut par ex. "6♥" ou "Kh"
-    en "6h" ou "kh" (rang majuscule, suit en minuscule parmi {c,d,h,s}).
+    Transforme un objet Card en "6h" ou "Kh"
+    (rang majuscule, suit en minuscule parmi {c,d,h,s}), via la table CARD_NAMES.
     """
-    nm = c.name
-    # le dernier caractère est toujours le symbole ou la lettre du suit
-    rank_part = nm[:-1]
-    suit_part = nm[-1]
-    # mapping Unicode → lettre
-    suit_map = {'♣':'c', '♠':'s', '♥':'h', '♦':'d',
-                'C':'c', 'S':'s','H':'h','D':'d'}
-    suit = suit_map.get(suit_part, suit_part.lower())
-    return f"{rank_part}{suit}"
+    return CARD_NAMES[c.idx]
 
 # ── 2. Prompt builder corrigé ────────────────────────────────────────
-def _board_tag(idx: int) -> str:
-    b = st.session_state.board
+def _board_tag(b, idx: int) -> str:
     if idx == 1 and len(b) >= 3:
         return "".join(_card_to_str(c) for c in b[:3])
     if idx == 2 and len(b) >= 4:
@@ -32,7 +28,10 @@ def _board_tag(idx: int) -> str:
 
 # ── 2. Prompt builder corrigé ───────────────────────────────────
 def generate_prompt_for_ai() -> str:
-    s = st.session_state
+    return build_prompt(st.session_state)
+
+def build_prompt(s) -> str:
+    """Prompt du modèle pour l'IA, à partir d'un état de jeu (MatchState ou st.session_state)."""
     hero_pos, vill_pos = s.ai_pos, s.player_pos
     hero_bb = s.ai_stack / BB
     vill_bb = s.player_stack / BB
@@ -70,7 +69,7 @@ def generate_prompt_for_ai() -> str:
                 history.append(part)
         # ---- CAS POSTFLOP ---------------------------------------------------
         else:
-            board = _board_tag(i)
+            board = _board_tag(s.board, i)
             actions = ",".join(grouped[i])
             part = f"{tag}:{board} {actions}".strip()
             history.append(part)
@@ -196,7 +195,7 @@ def make_instruction() -> str:
     hero_pos, vill_pos = s.ai_pos, s.player_pos
     hero_bb  = s.ai_stack   / BB
     vill_bb  = s.player_stack / BB
-    hand     = ''.join(c.name for c in s.ai_hand)
+    hand     = ''.join(CARD_NAMES[c.idx] for c in s.ai_hand)
 
     # Pour l’instant on renvoie position + stacks + hand :H:
     return (
@@ -208,8 +207,23 @@ def make_instruction() -> str:
 def get_ai_action(model):
     prompt = generate_prompt_for_ai()
 
-    # avec distribution
-    chosen, used_dist, _ = model.get_action_with_dists(prompt)
+    # préflop : servi par la table de politique si le spot y figure, sinon le modèle
+    policy = get_preflop_policy()
+    table_alts = policy.lookup(st.session_state, model) if policy is not None else None
+    full_alts = None
+    if table_alts is not None:
+        chosen, used_dist = sample_action(table_alts, policy.min_select_prob)
+    elif INFERENCE_SERVICE:
+        # micro-batch avec les décisions des autres sessions. Échéance dépassée : le service
+        # est surchargé, on ne relance pas l'énumération ; repli glouton (quelques forwards)
+        try:
+            chosen, used_dist, full_alts = get_inference_service(model).get_action_with_dists(
+                prompt, timeout=AI_DECISION_TIMEOUT_S)
+        except TimeoutError:
+            chosen, used_dist, full_alts = model.get_greedy_action(prompt)
+    else:
+        # avec distribution (énumération bornée par AI_DECISION_DEADLINE_S)
+        chosen, used_dist, full_alts = model.get_action_with_dists(prompt)
     pd = [[d["action"], round(float(d["p"]), 2)] for d in used_dist]
 
     #sans distribution
@@ -230,52 +244,27 @@ def get_ai_action(model):
         "a": chosen,
         "pd": pd
     }
+    if table_alts is not None:
+        rec_short["src"] = "table"
+    elif getattr(full_alts, "truncated", False):
+        # distribution partielle : raison de l'arrêt et masse non explorée
+        rec_short["tr"] = full_alts.reason
+        rec_short["um"] = round(float(full_alts.unexplored), 4)
     _append_decision_record_short(rec_short)
 
     action, amount = translate_action_for_app(chosen, st.session_state)
     process_action("ai", action, amount)
 
-def _load_decisions_meta():
-    s = st.session_state
-    if "decisions_meta_cache" in s:
-        return s["decisions_meta_cache"]
-    try:
-        with open(DECISIONS_META_FILE, "r", encoding="utf-8") as f:
-            meta = json.load(f)
-    except Exception:
-        meta = {"file_idx": 1, "count_in_file": 0}
-    s["decisions_meta_cache"] = meta
-    return meta
-
-def _save_decisions_meta(meta, force=False):
-    s = st.session_state
-    s["decisions_meta_cache"] = meta
-    if force:
-        try:
-            with open(DECISIONS_META_FILE, "w", encoding="utf-8") as f:
-                json.dump(meta, f, separators=(",", ":"))
-        except Exception:
-            pass
-
-def _current_decisions_path(meta):
-    base_dir = os.path.dirname(DECISIONS_LOG_FILE)
-    stem = "decisions_log_{:06d}.jsonl".format(meta["file_idx"])
-    return os.path.join(base_dir, stem)
-
 def _append_decision_record_short(rec_short):
-    os.makedirs(os.path.dirname(DECISIONS_LOG_FILE), exist_ok=True)
-    meta = _load_decisions_meta()
-    path = _current_decisions_path(meta)
+    # chunk courant et rotation partagés par tout le processus (decision_log.py),
+    # écriture en arrière-plan par le log writer ; les erreurs de cette session remontent au passage suivant
+    writer = get_log_writer()
+    owner = session_owner(st.session_state)
     try:
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(rec_short, ensure_ascii=False, separators=(",", ":")) + "\n")
-        meta["count_in_file"] = meta.get("count_in_file", 0) + 1
-        if meta["count_in_file"] >= DECISIONS_CHUNK_SIZE:
-            meta["file_idx"] += 1
-            meta["count_in_file"] = 0
-            _save_decisions_meta(meta, force=True)
-        else:
-            _save_decisions_meta(meta, force=False)
+        get_decision_log().append(json.dumps(rec_short, ensure_ascii=False, separators=(",", ":")), owner)
     except Exception as e:
         st.sidebar.error(f"Erreur log décision: {e}")
+    err = writer.pop_error(owner)
+    if err:
+        st.sidebar.error(f"Erreur log décision: {err}")
 
@@ -1,25 +1,91 @@
 # ia_model.py
-import math, re, torch, streamlit as st
+import hashlib, heapq, json, math, re, time, warnings, torch, streamlit as st
 import torch.nn.functional as F
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from config import MODEL_PATH
+from config import (MODEL_PATH, MODEL_BACKEND, PREFIX_CACHE_MB, DECISION_CACHE,
+                    ENUM_EPSILON, AI_DECISION_DEADLINE_S, HEAD_MODE, HEAD_NORM_REFRESH)
+from action_grammar import START, FINAL, load_action_grammar
+from prefix_cache import get_prefix_cache, select_rows
+from decision_cache import decision_key, get_decision_cache
 
 def L(en: str, fr: str) -> str:
     import streamlit as st
     return fr if st.session_state.get("lang","en") == "fr" else en
 
-class PokerModel:
-    def __init__(self, hf_token: str):
+class ActionDist(list):
+    """
+    full_alts : liste de {"action", "p"}. truncated : énumération arrêtée avant la fin
+    (reason "deadline" ou "epsilon"), unexplored : masse de probabilité laissée en attente.
+    """
+    truncated = False
+    reason = None
+    unexplored = 0.0
+
+    @classmethod
+    def from_cache(cls, entry):
+        """ActionDist d'une entrée (alts, meta) du cache de décisions ; None si absente."""
+        if entry is None:
+            return None
+        alts, meta = entry
+        out = cls(alts)
+        for k, v in meta.items():
+            setattr(out, k, v)
+        return out
+
+    @classmethod
+    def like(cls, src, items):
+        out = cls(items)
+        if getattr(src, "truncated", False):
+            out.truncated, out.reason, out.unexplored = True, src.reason, src.unexplored
+        return out
+
+class DecodeTree:
+    """
+    Arbre de décodage d'une décision : distribution du prochain token de chaque
+    préfixe généré déjà visité. L'énumération le remplit ; le glouton (repli de
+    select_action, infer) le relit et ne fait de forward que pour les préfixes absents.
+    """
+    def __init__(self, model, prompt: str):
+        self.model = model
+        self.prompt = prompt
+        self.probs = {}          # tokens générés -> distribution du prochain token
+        self.hits = self.misses = 0
+        self._kv = None          # (cache KV des prompts, mask, lens, ligne de ce prompt)
+
+    def attach(self, past, mask, lens, row):
+        self._kv = (past, mask, lens, row)
+
+    def next_probs(self, toks=()):
+        probs = self.probs.get(toks)
+        if probs is not None:
+            self.hits += 1
+            return probs
+        self.misses += 1
+        if self._kv is None:
+            probs0, past, mask, lens = self.model._batch_prompt_probs([self.prompt])
+            self.attach(past, mask, lens, 0)
+            self.probs[()] = probs0[0]
+            if not toks:
+                return probs0[0]
+        past, mask, lens, row = self._kv
+        probs = self.probs[toks] = self.model._frontier_probs(past, mask, lens, [(row, toks)], 1)[0]
+        return probs
+
+def _load_model(hf_token: str, backend: str):
+    """
+    Modèle selon le backend :
+    - "cuda-nf4" : 4 bits NF4 (bitsandbytes), placement automatique sur GPU ;
+    - "cpu"      : poids float32 sur CPU ;
+    - "cpu-int8" : comme "cpu", Linear quantifiés dynamiquement en int8
+                   (poids int8, activations quantifiées à la volée).
+    """
+    if backend == "cuda-nf4":
         q_conf = BitsAndBytesConfig(
             load_in_4bit=True,
             bnb_4bit_quant_type="nf4",
             bnb_4bit_compute_dtype=torch.bfloat16
         )
-
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            MODEL_PATH, token=hf_token, use_fast=True
-        )
-        self.model = AutoModelForCausalLM.from_pretrained(
+        return AutoModelForCausalLM.from_pretrained(
             MODEL_PATH,
             device_map="auto",
             quantization_config=q_conf,
@@ -27,8 +93,40 @@ class PokerModel:
             token=hf_token,
             trust_remote_code=True
         )
+    if backend not in ("cpu", "cpu-int8"):
+        raise ValueError(f"MODEL_BACKEND inconnu : {backend!r} (cuda-nf4, cpu, cpu-int8)")
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_PATH,
+        torch_dtype=torch.float32,
+        token=hf_token,
+        trust_remote_code=True
+    )
+    if backend == "cpu-int8":
+        model = quantize_int8(model)
+    return model
+
+def quantize_int8(model):
+    """Quantification dynamique int8 des couches Linear (CPU)."""
+    from torch.ao.quantization import quantize_dynamic
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")   # API torch.ao dépréciée, toujours fonctionnelle
+        return quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+class PokerModel:
+    def __init__(self, hf_token: str, backend: str = MODEL_BACKEND):
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            MODEL_PATH, token=hf_token, use_fast=True
+        )
+        self.model = _load_model(hf_token, backend)
         self.model.eval()
+        self._init_grammar()
+        self._init_head()
+        self.prefix_cache = get_prefix_cache(PREFIX_CACHE_MB << 20)
+        self.fingerprint = self._model_fingerprint()
+        self.decision_cache = get_decision_cache() if DECISION_CACHE else None
 
+    def _init_grammar(self):
         # ==== IDs & grammaire ====
         self.eos_id = self.tokenizer.eos_token_id
         self.space_id = self._tok_id(" ")
@@ -44,7 +142,26 @@ class PokerModel:
         self.re_prefix = re.compile(r"^(?:[xfc]|[abr](?:\d+)?(?:\.\d*)?)?$")
         self.re_final  = re.compile(r"^(?:[xfc]|a\d+(?:\.\d+)?|b\d+(?:\.\d+)?|r\d+(?:\.\d+)?)$")
 
+        # Automate précompilé (tokens autorisés / état suivant par état de grammaire)
+        self.grammar = load_action_grammar(
+            self.tokenizer, MODEL_PATH,
+            must=list(self.head_ids.values()) + list(self.digit_ids.values()) + [self.dot_id],
+            exclude=(self.term_id, self.eos_id, self.space_id),
+            device=self.model.device, re_prefix=self.re_prefix, re_final=self.re_final,
+        )
+
     # ---------- utils ----------
+    def _model_fingerprint(self) -> str:
+        """Empreinte des poids / de la quantification / du tokenizer (clé du cache de décisions)."""
+        cfg = self.model.config
+        parts = [MODEL_PATH, getattr(cfg, "_commit_hash", None), getattr(cfg, "_name_or_path", None),
+                 getattr(cfg, "quantization_config", None), len(self.tokenizer)]
+        if getattr(self, "backend", "cuda-nf4") != "cuda-nf4":
+            parts.append(self.backend)
+        if getattr(self, "head_mode", "full") != "full":
+            parts.append(self.head_mode)
+        return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
     def _tok_id(self, s: str):
         try:
             ids = self.tokenizer.encode(s, add_special_tokens=False)
@@ -55,7 +172,7 @@ class PokerModel:
     def _encode_prompt(self, prompt: str):
         tpl = [{"role": "user", "content": prompt}]
         return self.tokenizer.apply_chat_template(
-            tpl, add_generation_prompt=True, return_tensors="pt"
+            tpl, add_generation_prompt=True, return_tensors="pt", return_dict=False
         ).to(self.model.device)
 
     @staticmethod
@@ -63,118 +180,386 @@ class PokerModel:
         t = text.strip().replace(" ", "")
         return "a" if t.startswith("a") else t
 
-    # ---------- greedy + proba exacte (incl. terminator) ----------
     @torch.no_grad()
-    def _generate_action_and_prob(self, prompt: str, max_new_tokens: int = 16):
-        ids = self._encode_prompt(prompt)
-        txt = ""
-        logp_tokens = 0.0
-        for _ in range(max_new_tokens):
-            out = self.model(input_ids=ids, attention_mask=torch.ones_like(ids))
-            probs = F.softmax(out.logits[:, -1, :].float(), dim=-1)[0]
+    def _next_token_probs(self, ids, past=None, use_cache=True):
+        """
+        Distributions du prochain token (une ligne par séquence du batch) et cache KV mis à jour.
+        Avec `past`, `ids` ne contient que les tokens pas encore vus par le modèle.
+        """
+        return self._forward_probs(input_ids=ids, past_key_values=past, use_cache=use_cache)
 
-            cand = set(filter(lambda x: x is not None,
-                              list(self.head_ids.values()) +
-                              list(self.digit_ids.values()) + [self.dot_id]))
-            topv, topi = torch.topk(probs, k=min(50, probs.numel()))
-            cand |= set(topi.tolist())
+    @torch.no_grad()
+    def _forward_probs(self, **inputs):
+        """
+        Forward du modèle -> (distributions du prochain token (B, V), cache KV).
+        La tête de sortie n'est appliquée qu'à la dernière position. HEAD_MODE "grammar" :
+        l'état caché n'est projeté que sur les lignes retenues de la tête (head_rows), 0
+        ailleurs. Le normaliseur est leur logsumexp plus un décalage (masse hors de ces
+        lignes) mesuré sur tout le vocabulaire tous les HEAD_NORM_REFRESH forwards ; l'écart
+        de probabilité au mode "full" constaté à chaque mesure est tenu dans head_stats.
+        """
+        if getattr(self, "head_mode", "full") != "grammar":
+            out = self.model(**inputs, logits_to_keep=1)
+            return F.softmax(out.logits[:, -1, :].float(), dim=-1), out.past_key_values
+        out = self.model.base_model(**inputs)
+        h = out.last_hidden_state[:, -1, :]
+        logits = F.linear(h.to(self.head_weight.dtype), self.head_weight, self.head_bias).float()
+        lse = torch.logsumexp(logits, dim=-1, keepdim=True)
+        self.head_calls += 1
+        if self.head_offset is None or self.head_calls % HEAD_NORM_REFRESH == 0:
+            self._refresh_head_offset(h, logits, lse)
+        probs = torch.zeros((logits.shape[0], self.head_vocab), dtype=torch.float32, device=logits.device)
+        probs[:, self.head_rows] = torch.exp(logits - lse - self.head_offset)
+        return probs, out.past_key_values
+
+    def _refresh_head_offset(self, h, logits, lse):
+        """Normaliseur exact (tête complète) sur ce batch : mesure l'écart du décalage en cache puis le remplace."""
+        full = self.model.get_output_embeddings()(h).float()
+        exact = torch.logsumexp(full, dim=-1, keepdim=True)
+        offset = float((exact - lse).clamp(min=0.0).mean())
+        if self.head_offset is not None:
+            err = float((torch.exp(logits - lse - self.head_offset) - torch.exp(logits - exact)).abs().max())
+            stats = self.head_stats
+            stats["last_err"], stats["max_err"] = err, max(stats["max_err"], err)
+        self.head_stats["refreshes"] += 1
+        self.head_stats["offset"] = self.head_offset = offset
+
+    def _init_head(self, mode: str = HEAD_MODE):
+        """Tête restreinte : tokens de la grammaire d'actions, terminator et eos."""
+        self.head_mode = mode
+        if mode == "full":
+            return
+        if mode != "grammar":
+            raise ValueError(f"HEAD_MODE inconnu : {mode!r} (full, grammar)")
+        rows = set(torch.nonzero(self.grammar.allowed_mask.any(0)).flatten().tolist())
+        rows |= {t for t in (self.term_id, self.eos_id) if isinstance(t, int)}
+        self.set_head_rows(rows)
+
+    def set_head_rows(self, rows):
+        """Lignes de la tête de sortie gardées en mode "grammar" (probabilités des autres tokens : 0)."""
+        head = self.model.get_output_embeddings()
+        weight = head.weight() if callable(head.weight) else head.weight    # Linear quantifié : méthodes
+        bias = head.bias() if callable(head.bias) else head.bias
+        if weight.is_quantized:
+            weight = weight.dequantize()
+        self.head_vocab = head.out_features
+        self.head_rows = torch.tensor(sorted(rows), dtype=torch.long, device=weight.device)
+        self.head_weight = weight[self.head_rows].contiguous()
+        self.head_bias = None if bias is None else bias[self.head_rows].to(weight.dtype).contiguous()
+        self.head_offset = None       # mesuré au premier forward
+        self.head_calls = 0
+        self.head_stats = {"refreshes": 0, "offset": None, "last_err": None, "max_err": 0.0}
 
-            for tid in (self.term_id, self.eos_id, self.space_id):
-                if isinstance(tid, int) and tid in cand:
-                    cand.remove(tid)
+    @torch.no_grad()
+    def _prompt_probs(self, ids):
+        """
+        Comme _next_token_probs(ids) pour un prompt complet, mais en reprenant le
+        plus long préfixe déjà en cache : seuls les tokens nouveaux passent dans le
+        modèle (au moins le dernier, pour obtenir ses logits).
+        """
+        cache = getattr(self, "prefix_cache", None)
+        if cache is None:
+            return self._next_token_probs(ids)
+        tokens = ids[0].tolist()
+        n, past = cache.lookup(tokens, max_len=len(tokens) - 1)
+        probs, past = self._next_token_probs(ids[:, n:], past)
+        cache.insert(tokens, past)
+        return probs, past
 
+    # ---------- greedy + proba exacte (incl. terminator) ----------
+    @torch.no_grad()
+    def _generate_action_and_prob(self, prompt: str, max_new_tokens: int = 16, use_cache: bool = True,
+                                  tree=None):
+        """
+        Action gloutonne sous la grammaire et sa probabilité exacte (terminator compris).
+        Le prompt n'est passé qu'une fois dans le modèle : chaque pas ne fournit que le
+        nouveau token, avec le cache KV (use_cache=False : recalcul complet, référence).
+        Avec `tree` (DecodeTree de la décision), les distributions déjà calculées par
+        l'énumération sont relues au lieu d'être recalculées.
+        """
+        g = self.grammar
+        if tree is not None:
+            ids, past, toks = None, None, ()
+            probs = tree.next_probs(toks)
+        else:
+            ids = self._encode_prompt(prompt)
+            if use_cache:
+                probs, past = self._prompt_probs(ids)
+            else:
+                probs, past = self._next_token_probs(ids, use_cache=False)
+            probs = probs[0]
+        txt, state = "", START
+        logp_tokens = 0.0
+        for _ in range(max_new_tokens):
+            cand = g.candidates(state, probs, topk=50)
             best_tid, best_p = None, 0.0
-            for tid in cand:
-                p_tok = float(probs[tid])
-                if p_tok <= 0.0:
-                    continue
-                tstr = self.tokenizer.decode([tid])
-                new_txt = (txt + tstr).replace(" ", "")
-                if self.re_prefix.match(new_txt) and p_tok > best_p:
-                    best_tid, best_p = tid, p_tok
+            if cand.numel():
+                pc = probs[cand]
+                j = int(torch.argmax(pc))
+                if float(pc[j]) > 0.0:
+                    best_tid, best_p = int(cand[j]), float(pc[j])
 
-            p_term = float(probs[self.term_id]) if (txt and self.re_final.match(txt)) else 0.0
+            p_term = float(probs[self.term_id]) if FINAL[state] else 0.0
             if p_term >= best_p and p_term > 0.0 and txt:
                 return txt, math.exp(logp_tokens) * p_term
 
             if best_tid is None:
                 break
 
-            ids = torch.cat([ids, torch.tensor([[best_tid]], device=ids.device)], dim=-1)
             logp_tokens += math.log(best_p)
-            txt = (txt + self.tokenizer.decode([best_tid])).replace(" ", "")
-
-        if txt and self.re_final.match(txt):
-            out_last = self.model(input_ids=ids, attention_mask=torch.ones_like(ids))
-            probs_last = F.softmax(out_last.logits[:, -1, :].float(), dim=-1)[0]
-            p_term = float(probs_last[self.term_id]) if isinstance(self.term_id, int) else 0.0
+            txt += g.text[best_tid]
+            state = g.trans[state][best_tid]
+            if tree is not None:
+                toks += (best_tid,)
+                probs = tree.next_probs(toks)
+                continue
+            step = torch.tensor([[best_tid]], device=ids.device)
+            if use_cache:
+                probs, past = self._next_token_probs(step, past)
+            else:
+                ids = torch.cat([ids, step], dim=-1)
+                probs, _ = self._next_token_probs(ids, use_cache=False)
+            probs = probs[0]
+
+        # probs est déjà la distribution après le dernier token accepté
+        if FINAL[state]:
+            p_term = float(probs[self.term_id]) if isinstance(self.term_id, int) else 0.0
             if p_term > 0.0:
                 return txt, math.exp(logp_tokens) * p_term
         return "", 0.0
 
     # ---------- énumération disjointe ----------
     @torch.no_grad()
-    def enumerate_actions_ge(self, prompt: str, min_prob: float = 0.05, max_new_tokens: int = 12, tok_topk: int = 20):
-        ids0 = self._encode_prompt(prompt)
-        log_thr = math.log(min_prob)
-        agg = {}
-        stack = [(ids0, 0.0, "", 0)]
-        while stack:
-            ids, logp, txt, depth = stack.pop()
-            if depth >= max_new_tokens:
-                continue
-            out = self.model(input_ids=ids, attention_mask=torch.ones_like(ids))
-            probs = F.softmax(out.logits[:, -1, :].float(), dim=-1)[0]
+    def _batch_prompt_probs(self, prompts):
+        """
+        (probs, past, mask, lens) : distributions du prochain token de plusieurs prompts
+        en un seul forward, complétés à gauche (mask / position_ids explicites).
+        Un prompt seul passe par le cache de préfixes, sans padding (mask None).
+        """
+        if len(prompts) == 1:
+            ids = self._encode_prompt(prompts[0])
+            probs, past = self._prompt_probs(ids)
+            return probs, past, None, [ids.shape[-1]]
+        seqs = [self._encode_prompt(p)[0] for p in prompts]
+        lens = [len(s) for s in seqs]
+        width = max(lens)
+        pad = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else self.eos_id
+        ids = torch.full((len(seqs), width), pad, dtype=torch.long, device=self.model.device)
+        mask = torch.zeros_like(ids)
+        for i, s in enumerate(seqs):
+            ids[i, width - len(s):] = s
+            mask[i, width - len(s):] = 1
+        pos = (mask.cumsum(-1) - 1).clamp(min=0)
+        probs, past = self._forward_probs(input_ids=ids, attention_mask=mask, position_ids=pos, use_cache=True)
+        return probs, past, mask, lens
 
-            if txt and self.re_final.match(txt):
+    @torch.no_grad()
+    def _frontier_probs(self, prompt_past, mask, lens, rows, batch_size: int):
+        """
+        Distributions du prochain token pour des suffixes de même longueur, par paquets.
+        rows : [(indice du prompt, tokens du suffixe)] ; chaque paquet part des lignes
+        correspondantes du cache KV des prompts.
+        """
+        dev = self.model.device
+        out = []
+        for i in range(0, len(rows), batch_size):
+            chunk = rows[i:i + batch_size]
+            idx = torch.tensor([b for b, _ in chunk], device=dev)
+            toks = torch.tensor([t for _, t in chunk], device=dev)
+            past = select_rows(prompt_past, idx)
+            if mask is None:
+                probs, _ = self._next_token_probs(toks, past)
+            else:
+                d = toks.shape[1]
+                attn = torch.cat([mask[idx], torch.ones((len(chunk), d), dtype=mask.dtype, device=dev)], dim=1)
+                pos = torch.tensor([lens[b] for b, _ in chunk], device=dev)[:, None] + torch.arange(d, device=dev)
+                probs, _ = self._forward_probs(input_ids=toks, past_key_values=past, attention_mask=attn,
+                                               position_ids=pos, use_cache=True)
+            out.extend(probs.unbind(0))
+        return out
+
+    @torch.no_grad()
+    def enumerate_actions_batch(self, prompts, min_prob: float = 0.05, max_new_tokens: int = 12,
+                                tok_topk: int = 20, batch_size: int = 32, deadline=None,
+                                epsilon: float = ENUM_EPSILON, trees=None):
+        """
+        enumerate_actions_ge sur plusieurs prompts à la fois (une ActionDist par prompt).
+
+        Les prompts sont encodés en un seul forward, puis l'arbre des tokens est développé
+        du plus probable au moins probable : chaque pas prend les batch_size nœuds en
+        attente les plus probables, tous prompts confondus (un forward par longueur de
+        suffixe). Masse non explorée d'un prompt = somme des probabilités de ses nœuds
+        en attente ; le prompt s'arrête quand elle passe sous `epsilon`, ou à son échéance
+        (horloge time.monotonic) : `deadline` commune, ou liste d'une échéance par prompt
+        (None : sans échéance). La distribution trouvée est alors rendue, marquée
+        truncated. Sans deadline ni epsilon, l'énumération est exhaustive.
+        trees : un DecodeTree par prompt, où sont mémorisées les distributions calculées.
+        """
+        g = self.grammar
+        log_thr = math.log(min_prob)
+        n = len(prompts)
+        aggs = [{} for _ in prompts]
+        pending = [0.0] * n          # masse non explorée par prompt
+        open_nodes = [0] * n         # nœuds en attente par prompt (la masse seule garde un résidu d'arrondi)
+        ends = list(deadline) if isinstance(deadline, (list, tuple)) else [deadline] * n
+        timed = [b for b in range(n) if ends[b] is not None]
+        stopped = [None] * n         # raison de l'arrêt anticipé
+        heap, seq = [], 0
+        probs0, prompt_past, mask, lens = self._batch_prompt_probs(prompts)
+        if trees is not None:
+            for b, tree in enumerate(trees):
+                tree.attach(prompt_past, mask, lens, b)
+
+        def expand(b, toks, logp, txt, state, probs):
+            nonlocal seq
+            if trees is not None:
+                trees[b].probs[toks] = probs
+            if FINAL[state]:
                 p_term = float(probs[self.term_id]) if isinstance(self.term_id, int) else 0.0
                 if p_term > 0.0:
                     p_exact = math.exp(logp) * p_term
                     if p_exact >= min_prob:
                         key = self._norm_action(txt)
-                        agg[key] = agg.get(key, 0.0) + p_exact
-
-            must = set(filter(lambda x: x is not None,
-                            list(self.head_ids.values()) +
-                            list(self.digit_ids.values()) + [self.dot_id]))
-            topv, topi = torch.topk(probs, k=min(tok_topk, probs.numel()))
-            cand = must | set(topi.tolist())
-
-            for tid in (self.term_id, self.eos_id, self.space_id):
-                if isinstance(tid, int) and tid in cand:
-                    cand.remove(tid)
-
-            for tid in cand:
-                p_tok = float(probs[tid])
+                        aggs[b][key] = aggs[b].get(key, 0.0) + p_exact
+            if len(toks) + 1 >= max_new_tokens:
+                return
+            cand = g.candidates(state, probs, topk=tok_topk)
+            nxt = g.trans[state]
+            for tid, p_tok in zip(cand.tolist(), probs[cand].tolist()):
                 if p_tok <= 0.0:
                     continue
-                tstr = self.tokenizer.decode([tid])
-                new_txt = (txt + tstr).replace(" ", "")
-                if not self.re_prefix.match(new_txt):
-                    continue
                 new_logp = logp + math.log(p_tok)
                 if new_logp < log_thr:
                     continue
-                new_ids = torch.cat([ids, torch.tensor([[tid]], device=ids.device)], dim=-1)
-                stack.append((new_ids, new_logp, new_txt, depth + 1))
+                seq += 1
+                heapq.heappush(heap, (-new_logp, seq, b, toks + (tid,), txt + g.text[tid], nxt[tid]))
+                pending[b] += math.exp(new_logp)
+                open_nodes[b] += 1
+
+        for b, probs in enumerate(probs0.unbind(0)):
+            expand(b, (), 0.0, "", START, probs)
+
+        while heap:
+            if timed:
+                now = time.monotonic()
+                for b in timed:
+                    if stopped[b] is None and open_nodes[b] and now >= ends[b]:
+                        stopped[b] = "deadline"     # les autres prompts du lot continuent
+                timed = [b for b in timed if stopped[b] is None]
+                if all(stopped[b] is not None or not open_nodes[b] for b in range(n)):
+                    break
+            step = []
+            while heap and len(step) < batch_size:
+                node = heapq.heappop(heap)
+                b = node[2]
+                if stopped[b] is not None:
+                    continue
+                pending[b] -= math.exp(-node[0])
+                open_nodes[b] -= 1
+                if not open_nodes[b]:
+                    pending[b] = 0.0
+                step.append(node)
+            by_len = {}
+            for node in step:
+                by_len.setdefault(len(node[3]), []).append(node)
+            for nodes in by_len.values():
+                rows = self._frontier_probs(prompt_past, mask, lens, [(nd[2], nd[3]) for nd in nodes], batch_size)
+                for (neg, _, b, toks, txt, state), probs in zip(nodes, rows):
+                    expand(b, toks, -neg, txt, state, probs)
+            for b in range(n):
+                if stopped[b] is None and open_nodes[b] and pending[b] < epsilon:
+                    stopped[b] = "epsilon"
+
+        results = []
+        for b, agg in enumerate(aggs):
+            items = ActionDist({"action": k, "p": v} for k, v in agg.items() if v >= min_prob)
+            items.sort(key=lambda x: x["p"], reverse=True)
+            if stopped[b] is not None:
+                items.truncated, items.reason, items.unexplored = True, stopped[b], max(pending[b], 0.0)
+            results.append(items)
+        return results
 
-        items = [{"action": k, "p": v} for k, v in agg.items() if v >= min_prob]
-        items.sort(key=lambda x: x["p"], reverse=True)
-        return items
+    @torch.no_grad()
+    def enumerate_actions_ge(self, prompt: str, min_prob: float = 0.05, max_new_tokens: int = 12,
+                             tok_topk: int = 20, batch_size: int = 32, deadline: float | None = None,
+                             epsilon: float = ENUM_EPSILON, tree=None):
+        """
+        Actions de probabilité >= min_prob (terminator compris), agrégées par action normalisée.
+
+        Le prompt est encodé une seule fois, puis les nœuds de l'arbre des tokens passent
+        par paquets (batch_size), les plus probables d'abord, sur le cache KV partagé du
+        prompt. deadline / epsilon : voir enumerate_actions_batch.
+        """
+        return self.enumerate_actions_batch([prompt], min_prob, max_new_tokens, tok_topk, batch_size,
+                                            deadline, epsilon, None if tree is None else [tree])[0]
+
+    def decision_key(self, prompt: str, **params) -> str:
+        return decision_key(self.fingerprint, prompt, **params)
+
+    def enumeration_key(self, prompt: str, min_prob: float, max_new_tokens: int, tok_topk: int = 20) -> str:
+        """Clé du cache de décisions pour une énumération (epsilon seulement s'il est actif)."""
+        params = dict(min_prob=min_prob, max_new_tokens=max_new_tokens, tok_topk=tok_topk)
+        if ENUM_EPSILON:
+            params["epsilon"] = ENUM_EPSILON
+        return self.decision_key(prompt, **params)
+
+    def cached_enumeration(self, prompt: str, min_prob: float, max_new_tokens: int, tok_topk: int = 20,
+                           deadline: float | None = None, tree=None):
+        """enumerate_actions_ge, servi par le cache de décisions s'il est activé (DECISION_CACHE)."""
+        return self.cached_enumerations([prompt], min_prob, max_new_tokens, tok_topk, deadline,
+                                        None if tree is None else [tree])[0]
+
+    def cached_enumerations(self, prompts, min_prob: float, max_new_tokens: int, tok_topk: int = 20,
+                            deadline=None, trees=None):
+        """
+        Version par lot : seuls les prompts absents du cache passent dans enumerate_actions_batch.
+        deadline : commune ou une par prompt. Les distributions coupées par l'échéance ne sont pas mises en cache.
+        """
+        cache = getattr(self, "decision_cache", None)
+        if cache is None:
+            return self.enumerate_actions_batch(prompts, min_prob=min_prob, max_new_tokens=max_new_tokens,
+                                                tok_topk=tok_topk, deadline=deadline, trees=trees)
+        keys = [self.enumeration_key(p, min_prob, max_new_tokens, tok_topk) for p in prompts]
+        found = [ActionDist.from_cache(cache.get(k)) for k in keys]
+        missing = [i for i, alts in enumerate(found) if alts is None]
+        if missing:
+            fresh = self.enumerate_actions_batch([prompts[i] for i in missing], min_prob=min_prob,
+                                                 max_new_tokens=max_new_tokens, tok_topk=tok_topk,
+                                                 deadline=[deadline[i] for i in missing]
+                                                 if isinstance(deadline, (list, tuple)) else deadline,
+                                                 trees=None if trees is None else [trees[i] for i in missing])
+            for i, alts in zip(missing, fresh):
+                if alts.reason != "deadline":
+                    cache.put(keys[i], alts, prompts[i])
+                found[i] = alts
+        return [ActionDist.like(alts, (dict(a) for a in alts)) for alts in found]
 
     @torch.no_grad()
     def act_over_threshold(self, prompt: str, min_select_prob: float = 0.05,
-                       max_new_tokens: int = 12, allowed_actions=None, sample=True):
-        full_alts = self.enumerate_actions_ge(prompt, min_prob=min_select_prob,
-                                          max_new_tokens=max_new_tokens, tok_topk=20)
+                       max_new_tokens: int = 12, allowed_actions=None, sample=True, deadline_s=None):
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        tree = DecodeTree(self, prompt)
+        full_alts = self.cached_enumeration(prompt, min_select_prob, max_new_tokens, tok_topk=20,
+                                            deadline=deadline, tree=tree)
+        return self.select_action(prompt, full_alts, min_select_prob, max_new_tokens, allowed_actions, sample,
+                                  tree=tree)
+
+    @torch.no_grad()
+    def select_action(self, prompt: str, full_alts, min_select_prob: float = 0.05,
+                      max_new_tokens: int = 12, allowed_actions=None, sample=True, tree=None):
+        """
+        (chosen, used_dist, full_alts) à partir d'une distribution énumérée ; repli glouton
+        si rien ne passe le seuil, sur l'arbre de décodage de l'énumération (`tree`).
+        """
         if allowed_actions is not None:
             allowed = set(allowed_actions)
-            full_alts = [a for a in full_alts if a["action"] in allowed]
+            full_alts = ActionDist.like(full_alts, (a for a in full_alts if a["action"] in allowed))
 
         cand = [a for a in full_alts if a["p"] >= min_select_prob]
         if not cand:
-            greedy_text, _ = self._generate_action_and_prob(prompt, max_new_tokens=max_new_tokens)
-            return greedy_text, [{"action": greedy_text, "p": 1.0}], []
+            greedy_text, _ = self._generate_action_and_prob(prompt, max_new_tokens=max_new_tokens,
+                                                            tree=tree if tree is not None else DecodeTree(self, prompt))
+            return greedy_text, [{"action": greedy_text, "p": 1.0}], ActionDist.like(full_alts, ())
 
         s = sum(a["p"] for a in cand)
         used_dist = [{"action": a["action"], "p": (a["p"] / s)} for a in cand]
@@ -190,8 +575,10 @@ class PokerModel:
 
     @torch.no_grad()
     def infer(self, prompt: str, min_prob: float = 0.01, max_new_tokens: int = 16):
-        action_raw, p_raw = self._generate_action_and_prob(prompt, max_new_tokens=max_new_tokens)
-        alts = self.enumerate_actions_ge(prompt, min_prob=min_prob, max_new_tokens=max_new_tokens)
+        # une seule passe : le glouton relit les distributions mémorisées par l'énumération
+        tree = DecodeTree(self, prompt)
+        alts = self.enumerate_actions_ge(prompt, min_prob=min_prob, max_new_tokens=max_new_tokens, tree=tree)
+        action_raw, p_raw = self._generate_action_and_prob(prompt, max_new_tokens=max_new_tokens, tree=tree)
         key = self._norm_action(action_raw)
         p_from = next((a["p"] for a in alts if a["action"] == key), None)
         if p_from is not None:
@@ -226,21 +613,38 @@ class PokerModel:
 
 
     def get_action_with_dists(self, prompt: str,
-                          min_select_prob: float = 0.12, max_new_tokens: int = 6):
+                          min_select_prob: float = 0.12, max_new_tokens: int = 6,
+                          deadline_s: float | None = AI_DECISION_DEADLINE_S):
+        # deadline_s : budget de l'énumération en secondes (None / 0 : exhaustive) ;
+        # full_alts.truncated signale une distribution coupée par l'échéance
         return self.act_over_threshold(
             prompt,
             min_select_prob=min_select_prob,
             max_new_tokens=max_new_tokens,
             allowed_actions=None,
-            sample=True
+            sample=True,
+            deadline_s=deadline_s
         )
 
+    @torch.no_grad()
+    def get_greedy_action(self, prompt: str, max_new_tokens: int = 6):
+        """
+        Repli bon marché (quelques forwards, sans énumération) quand le service
+        d'inférence n'a pas répondu à temps : (chosen, used_dist, full_alts), full_alts
+        vide et marqué truncated (reason "timeout", toute la masse non explorée).
+        """
+        text, _ = self._generate_action_and_prob(prompt, max_new_tokens=max_new_tokens)
+        chosen = text or "f"
+        full_alts = ActionDist()
+        full_alts.truncated, full_alts.reason, full_alts.unexplored = True, "timeout", 1.0
+        return chosen, [{"action": chosen, "p": 1.0}], full_alts
+
 
 @st.cache_resource
-def load_poker_model(hf_token: str, cache_version: int = 2):
+def load_poker_model(hf_token: str, cache_version: int = 2, backend: str = MODEL_BACKEND):
     # cache_version permet de forcer un rechargement quand tu modifies ce fichier
     if not hf_token:
         st.error("Token HF non trouvé !"); st.stop()
     with st.spinner("Chargement du modèle spinGPT…"):
-        model = PokerModel(hf_token)
+        model = PokerModel(hf_token, backend=backend)
     return model
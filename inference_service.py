@@ -0,0 +1,175 @@
+# inference_service.py
+"""
+Service d'inférence partagé par toutes les sessions Streamlit du processus.
+
+Chaque session appelait get_action_with_dists de façon synchrone : N joueurs
+simultanés = N énumérations concurrentes, chacune avec ses petits forwards.
+Ici, un thread unique regroupe les demandes arrivées dans une courte fenêtre
+(INFERENCE_BATCH_WINDOW_MS, au plus INFERENCE_MAX_BATCH) en micro-batch :
+les prompts passent dans un seul forward, puis chaque profondeur de l'arbre
+d'actions, tous prompts confondus, dans un seul forward (enumerate_actions_batch).
+
+Chaque demande porte une échéance : expirée avant d'être servie, elle échoue en
+TimeoutError et l'appelant se replie (décodage glouton, sans nouvelle énumération).
+Dans un micro-batch, chaque prompt s'arrête au plus tôt de son budget (deadline_s,
+cf. get_action_with_dists) et de l'échéance de son appelant : une demande déjà en
+cours ne consomme pas de CPU au-delà de ce délai, sans couper les autres du lot.
+stats() expose la profondeur de file.
+
+Activation : INFERENCE_SERVICE=true.
+"""
+import time, queue, threading
+from collections import Counter, deque
+from concurrent.futures import Future
+
+from config import INFERENCE_BATCH_WINDOW_MS, INFERENCE_MAX_BATCH, AI_DECISION_DEADLINE_S
+
+class _Request:
+    __slots__ = ("prompt", "params", "deadline", "enum_deadline", "future", "t_submit")
+
+    def __init__(self, prompt, params, deadline, enum_deadline):
+        self.prompt = prompt
+        self.params = params
+        self.deadline = deadline
+        self.enum_deadline = enum_deadline
+        self.future = Future()
+        self.t_submit = time.monotonic()
+
+class InferenceService:
+    def __init__(self, model, window_ms: float = INFERENCE_BATCH_WINDOW_MS, max_batch: int = INFERENCE_MAX_BATCH):
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.submitted = self.completed = self.expired = self.failed = self.batches = 0
+        self.max_depth = 0
+        self.batch_sizes = Counter()
+        self.latencies = deque(maxlen=1000)   # ms, de la soumission au résultat
+        self.thread = threading.Thread(target=self._loop, name="inference-service", daemon=True)
+        self.thread.start()
+
+    # ---------- côté sessions ----------
+    def submit(self, prompt: str, timeout: float | None = None,
+               min_select_prob: float = 0.12, max_new_tokens: int = 6,
+               deadline_s: float | None = AI_DECISION_DEADLINE_S) -> Future:
+        """Future de (chosen, used_dist, full_alts) ; échoue en TimeoutError passé `timeout` secondes."""
+        now = time.monotonic()
+        deadline = None if timeout is None else now + timeout
+        enum_deadline = now + deadline_s if deadline_s else None
+        req = _Request(prompt, (min_select_prob, max_new_tokens), deadline, enum_deadline)
+        self.queue.put(req)
+        with self.lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        return req.future
+
+    def get_action_with_dists(self, prompt: str, timeout: float | None = None,
+                              min_select_prob: float = 0.12, max_new_tokens: int = 6,
+                              deadline_s: float | None = AI_DECISION_DEADLINE_S):
+        """Équivalent bloquant de PokerModel.get_action_with_dists, servi par micro-batch."""
+        fut = self.submit(prompt, timeout, min_select_prob, max_new_tokens, deadline_s)
+        try:
+            return fut.result(timeout=timeout)
+        except TimeoutError:
+            fut.cancel()
+            raise
+
+    # ---------- thread de service ----------
+    def _collect(self):
+        """Première demande (bloquant), puis celles arrivées dans la fenêtre."""
+        batch = [self.queue.get()]
+        end = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            left = end - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=left) if left > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            stop = None in batch   # close() : on sert ce qui est déjà collecté puis on s'arrête
+            batch = [r for r in batch if r is not None]
+            now = time.monotonic()
+            live = []
+            for r in batch:
+                if r.deadline is not None and now > r.deadline:
+                    if r.future.set_running_or_notify_cancel():
+                        r.future.set_exception(TimeoutError("échéance dépassée dans la file d'inférence"))
+                    with self.lock:
+                        self.expired += 1
+                elif r.future.set_running_or_notify_cancel():
+                    live.append(r)
+            # une énumération par lot et par jeu de paramètres (en pratique un seul)
+            groups = {}
+            for r in live:
+                groups.setdefault(r.params, []).append(r)
+            for (min_select_prob, max_new_tokens), reqs in groups.items():
+                self._run(reqs, min_select_prob, max_new_tokens)
+            if stop:
+                return
+
+    def _run(self, reqs, min_select_prob, max_new_tokens):
+        from ia_model import DecodeTree
+        model = self.model
+        # chaque prompt s'arrête au plus tard à l'échéance de son appelant : passé ce délai,
+        # il s'est replié et le résultat ne servirait plus
+        deadlines = [min((d for d in (r.enum_deadline, r.deadline) if d is not None), default=None)
+                     for r in reqs]
+        trees = [DecodeTree(model, r.prompt) for r in reqs]
+        try:
+            alts = model.cached_enumerations([r.prompt for r in reqs], min_select_prob, max_new_tokens,
+                                             deadline=deadlines, trees=trees)
+        except Exception as e:
+            for r in reqs:
+                r.future.set_exception(e)
+            with self.lock:
+                self.failed += len(reqs)
+            return
+        with self.lock:
+            self.batches += 1
+            self.batch_sizes[len(reqs)] += 1
+        for r, full_alts, tree in zip(reqs, alts, trees):
+            try:
+                r.future.set_result(model.select_action(r.prompt, full_alts, min_select_prob, max_new_tokens,
+                                                        tree=tree))
+                ok = True
+            except Exception as e:
+                r.future.set_exception(e)
+                ok = False
+            with self.lock:
+                self.completed += ok
+                self.failed += not ok
+                self.latencies.append((time.monotonic() - r.t_submit) * 1e3)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lat = sorted(self.latencies)
+            n = sum(self.batch_sizes.values())
+            return {
+                "queue_depth": self.queue.qsize(), "max_queue_depth": self.max_depth,
+                "submitted": self.submitted, "completed": self.completed,
+                "expired": self.expired, "failed": self.failed, "batches": self.batches,
+                "mean_batch": sum(k * v for k, v in self.batch_sizes.items()) / n if n else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "p50_ms": lat[len(lat) // 2] if lat else None,
+                "p95_ms": lat[min(len(lat) - 1, int(0.95 * len(lat)))] if lat else None,
+            }
+
+_SERVICES = {}
+_SERVICES_LOCK = threading.Lock()
+
+def get_inference_service(model) -> InferenceService:
+    """Service unique par modèle (le modèle est lui-même unique : st.cache_resource)."""
+    with _SERVICES_LOCK:
+        svc = _SERVICES.get(id(model))
+        if svc is None or svc.model is not model:
+            svc = _SERVICES[id(model)] = InferenceService(model)
+        return svc
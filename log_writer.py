@@ -0,0 +1,219 @@
+# log_writer.py
+"""
+Écrivain de logs partagé par tout le processus (commit groupé en arrière-plan).
+
+Les appelants (décisions de l'IA, historique des mains) ne font qu'enfiler une
+ligne ; un thread la range dans une file bornée, garde les fichiers ouverts et
+écrit par lots : dès LOG_FLUSH_RECORDS lignes en attente ou LOG_FLUSH_INTERVAL_MS
+après la première. Politique fsync (LOG_FSYNC) :
+- "none"  : le système décide (comportement d'avant) ;
+- "batch" : fsync de chaque fichier touché après chaque lot ;
+- "close" : fsync seulement à la fermeture des fichiers (rotation, arrêt).
+
+File pleine : l'appelant attend (pas de perte de lignes). Tout est vidé à
+l'arrêt du processus (atexit) ; une ligne écrite après close() l'est directement.
+Les erreurs d'écriture sont rangées par propriétaire (owner passé à write(),
+p. ex. session_owner(st.session_state)) : pop_error(owner) ne rend que celles
+des lignes de cet appelant, pour être affichées dans sa session.
+"""
+import os, time, uuid, queue, atexit, threading
+from collections import OrderedDict
+
+from config import LOG_WRITER_QUEUE, LOG_FLUSH_RECORDS, LOG_FLUSH_INTERVAL_MS, LOG_FSYNC
+
+_MAX_OPEN = 16   # descripteurs gardés ouverts (les chunks de décisions tournent)
+
+class LogWriter:
+    def __init__(self, max_queue: int = LOG_WRITER_QUEUE, batch_records: int = LOG_FLUSH_RECORDS,
+                 flush_interval_ms: float = LOG_FLUSH_INTERVAL_MS, fsync: str = LOG_FSYNC):
+        if fsync not in ("none", "batch", "close"):
+            raise ValueError(f"LOG_FSYNC inconnu : {fsync!r} (none, batch, close)")
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.batch_records = batch_records
+        self.interval = flush_interval_ms / 1000.0
+        self.fsync = fsync
+        self.files = OrderedDict()     # chemin -> fichier ouvert en ajout (LRU)
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)   # plus aucun put() en cours (close)
+        self.putting = 0
+        self.enqueued = self.written = self.batches = 0
+        self.max_depth = 0
+        self.errors = {}               # owner -> [messages]
+        self.closed = False
+        self.thread = threading.Thread(target=self._loop, name="log-writer", daemon=True)
+        self.thread.start()
+
+    # ---------- côté appelants ----------
+    def _enqueue(self, item) -> bool:
+        """Enfile `item` ; False si le writer est fermé (rien n'est enfilé)."""
+        with self.lock:
+            if self.closed:
+                return False
+            self.putting += 1
+        try:
+            self.queue.put(item)          # hors verrou : peut attendre si la file est pleine
+        finally:
+            with self.lock:
+                self.putting -= 1
+                self.idle.notify_all()
+        return True
+
+    def write(self, path: str, line: str, owner=None):
+        """Enfile une ligne (sans « \\n » final) à ajouter à `path` ; ses erreurs vont à `owner`."""
+        if not self._enqueue((path, line, owner)):
+            self.thread.join()            # fermé : la file est vidée avant d'écrire (ordre des lignes)
+            self._write_now(path, line, owner)
+            return
+        with self.lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Attend que tout ce qui a été enfilé avant l'appel soit écrit."""
+        done = threading.Event()
+        if not self._enqueue(done):
+            self.thread.join(timeout)     # fermé : tout est écrit une fois le thread arrêté
+            return not self.thread.is_alive()
+        return done.wait(timeout)
+
+    def close(self):
+        """Vide la file, ferme les fichiers et arrête le thread."""
+        with self.lock:
+            if self.closed:
+                return
+            # plus aucun nouvel enfilage ; ceux déjà commencés passent avant la sentinelle
+            self.closed = True
+            while self.putting:
+                self.idle.wait()
+        self.queue.put(None)
+        self.thread.join()
+
+    def pop_error(self, owner=None):
+        """Plus ancienne erreur non signalée sur les lignes de `owner` (None sinon)."""
+        with self.lock:
+            errs = self.errors.get(owner)
+            if not errs:
+                return None
+            err = errs.pop(0)
+            if not errs:
+                del self.errors[owner]
+            return err
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(), "max_queue_depth": self.max_depth,
+                "enqueued": self.enqueued, "written": self.written, "batches": self.batches,
+                "mean_batch": self.written / self.batches if self.batches else 0.0,
+                "open_files": len(self.files), "pending_errors": sum(map(len, self.errors.values())),
+            }
+
+    # ---------- thread d'écriture ----------
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            batch, events, stop = [], [], False
+            end = time.monotonic() + self.interval
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    events.append(item)
+                    break          # flush() demandé : on écrit sans attendre la fenêtre
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_records:
+                    break
+                left = end - time.monotonic()
+                try:
+                    item = self.queue.get(timeout=left) if left > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+            for ev in events:
+                ev.set()
+            if stop:
+                self._close_files()
+                return
+
+    def _commit(self, batch):
+        by_path = {}
+        for path, line, owner in batch:
+            lines, owners = by_path.setdefault(path, ([], set()))
+            lines.append(line)
+            owners.add(owner)
+        for path, (lines, owners) in by_path.items():
+            try:
+                f = self._handle(path)
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                if self.fsync == "batch":
+                    os.fsync(f.fileno())
+            except Exception as e:
+                self._error(path, e, owners)
+        with self.lock:
+            self.written += len(batch)
+            self.batches += 1
+
+    def _handle(self, path):
+        f = self.files.get(path)
+        if f is not None:
+            self.files.move_to_end(path)
+            return f
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        f = self.files[path] = open(path, "a", encoding="utf-8")
+        while len(self.files) > _MAX_OPEN:
+            _, old = self.files.popitem(last=False)
+            self._close(old)
+        return f
+
+    def _close(self, f):
+        try:
+            if self.fsync != "none":
+                f.flush()
+                os.fsync(f.fileno())
+            f.close()
+        except Exception as e:
+            self._error(f.name, e, (None,))   # fermeture : plus de propriétaire identifiable
+
+    def _close_files(self):
+        while self.files:
+            _, f = self.files.popitem(last=False)
+            self._close(f)
+
+    def _write_now(self, path, line, owner):
+        # après close() (fin de processus) : écriture directe
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            self._error(path, e, (owner,))
+
+    def _error(self, path, e, owners):
+        msg = f"{os.path.basename(path)}: {e}"
+        with self.lock:
+            for owner in owners:
+                errs = self.errors.setdefault(owner, [])
+                errs.append(msg)
+                del errs[:-20]
+
+def session_owner(state) -> str:
+    """Propriétaire des lignes d'une session (st.session_state) : identifiant stable, créé au besoin."""
+    owner = state.get("log_owner")
+    if owner is None:
+        owner = state["log_owner"] = uuid.uuid4().hex
+    return owner
+
+_WRITER = None
+_WRITER_LOCK = threading.Lock()
+
+def get_log_writer() -> LogWriter:
+    """Écrivain unique du processus, vidé à la sortie."""
+    global _WRITER
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = LogWriter()
+            atexit.register(_WRITER.close)
+        return _WRITER
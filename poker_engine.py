@@ -1,22 +1,105 @@
-import random, json, streamlit as st, time
-import os
+import random, time
+import os, hmac, hashlib
+import numpy as np
+from array import array
 from collections import Counter
 from itertools import combinations
 from config import *
-from supabase import create_client
-from supabase_utils import insert_hand_minimal
 
 def L(en: str, fr: str) -> str:
     import streamlit as st
     return fr if st.session_state.get("lang","en") == "fr" else en
 
+# ──────────────────────────────────────────────────────────────
+#  Cartes : entiers 0..51 = (rang - 2) * 4 + couleur (ordre de SUITS).
+#  Les 52 objets Card sont des singletons ; Card("A", "s") renvoie toujours le même.
+# ──────────────────────────────────────────────────────────────
+_SUIT_LETTERS = list(SUITS)
+
 class Card:
-    def __init__(self, rank, suit): self.rank_val = RANKS[rank]; self.suit_name = SUITS[suit]; self.name = f"{rank}{suit[0].lower()}"
-    def __str__(self): return f"{RANK_NAMES[self.rank_val]}{SUIT_ICONS[self.suit_name]}"
+    __slots__ = ("idx", "rank_val", "suit_name", "name")
+
+    def __new__(cls, rank, suit=None):
+        if suit is None:
+            return CARDS[rank]
+        return CARDS[(RANKS[rank] - 2) * 4 + _SUIT_LETTERS.index(suit[0].lower())]
+
+    def __reduce__(self): return (Card, (self.idx,))
+    def __str__(self): return CARD_STRS[self.idx]
+    def __repr__(self): return f"Card({self.name!r})"
+
+def _make_card(idx):
+    c = object.__new__(Card)
+    c.idx = idx; c.rank_val = idx // 4 + 2; c.suit_name = SUITS[_SUIT_LETTERS[idx % 4]]
+    c.name = f"{RANK_NAMES[c.rank_val]}{_SUIT_LETTERS[idx % 4]}"
+    return c
+
+CARDS = tuple(_make_card(i) for i in range(52))
+CARD_NAMES = tuple(c.name for c in CARDS)                                           # "As"
+CARD_INDEX = {name: i for i, name in enumerate(CARD_NAMES)}
+CARD_STRS = tuple(f"{RANK_NAMES[c.rank_val]}{SUIT_ICONS[c.suit_name]}" for c in CARDS)  # "A♠"
+
+_DECK_TEMPLATE = array("b", range(52))
 
 class Deck:
-    def __init__(self): self.cards = [Card(r, s) for r in RANKS for s in SUITS]; random.shuffle(self.cards)
-    def deal(self, num_cards=1): return [self.cards.pop() for _ in range(num_cards)]
+    """
+    Paquet mélangé dans un tampon d'index préalloué ; la donne avance un curseur.
+    Avec `seed`, l'ordre des cartes est entièrement déterminé (donnes rejouables).
+    """
+    __slots__ = ("order", "pos")
+
+    def __init__(self, seed=None):
+        self.order = _DECK_TEMPLATE[:]; self.pos = 0
+        (random if seed is None else random.Random(seed)).shuffle(self.order)
+
+    def deal_ids(self, num_cards=1):
+        ids = self.order[self.pos:self.pos + num_cards]
+        if len(ids) < num_cards:
+            raise IndexError("deal from an exhausted deck")
+        self.pos += num_cards
+        return ids
+
+    def deal(self, num_cards=1): return [CARDS[i] for i in self.deal_ids(num_cards)]
+
+    @property
+    def cards(self): return [CARDS[i] for i in self.order[self.pos:]]
+
+_DEAL_KEY = None
+
+def _deal_key() -> bytes:
+    """Secret serveur des graines : DEAL_SECRET, sinon DEAL_SECRET_FILE (créé au premier appel)."""
+    global _DEAL_KEY
+    if _DEAL_KEY is None:
+        if DEAL_SECRET:
+            _DEAL_KEY = DEAL_SECRET.encode()
+        else:
+            try:
+                with open(DEAL_SECRET_FILE, "rb") as f:
+                    _DEAL_KEY = f.read()
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(DEAL_SECRET_FILE), exist_ok=True)
+                tmp = f"{DEAL_SECRET_FILE}.{os.getpid()}.tmp"
+                fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(os.urandom(32))
+                try:
+                    os.link(tmp, DEAL_SECRET_FILE)   # création atomique, jamais écrasée
+                except FileExistsError:
+                    pass       # créé en même temps par un autre processus : sa clé fait foi
+                finally:
+                    os.remove(tmp)
+                with open(DEAL_SECRET_FILE, "rb") as f:
+                    _DEAL_KEY = f.read()
+    return _DEAL_KEY
+
+def deal_seed(hu_uid: str, key: int) -> int:
+    """
+    Graine 64 bits stable (indépendante du processus) d'une donne du HU hu_uid.
+    HMAC-SHA256 sous le secret serveur : hu_uid est public (logs, Supabase), les
+    donnes à venir ne s'en déduisent pas ; la graine loggée (sd) rejoue la donne.
+    """
+    msg = f"{hu_uid}:{key}".encode()
+    return int.from_bytes(hmac.new(_deal_key(), msg, hashlib.sha256).digest()[:8], "little")
 
 def evaluate_hand(hand):
     ranks = sorted([c.rank_val for c in hand], reverse=True); suits = {c.suit_name for c in hand}
@@ -36,29 +119,220 @@ def evaluate_hand(hand):
 def get_best_hand(hole, board):
     return max([evaluate_hand(list(c)) for c in combinations(hole + board, 5)]) if len(hole + board) >= 5 else (0, [])
 
-def _card_to_str_simple(c):
-    """Helper pour convertir un objet Card en chaîne simple comme 'As' ou 'Th'."""
-    rank = RANK_NAMES[c.rank_val]
-    suit = c.suit_name[0]
-    return f"{rank}{suit}"
+# ──────────────────────────────────────────────────────────────
+#  Évaluateur 5-7 cartes par tables précalculées
+#  Une carte est un entier 0..51 = (rang - 2) * 4 + couleur.
+#  Le rang renvoyé est un entier comparable : catégorie sur les bits 20+,
+#  puis les kickers de evaluate_hand sur 4 bits chacun (alignés à gauche),
+#  donc l'ordre des entiers est exactement celui des tuples (catégorie, kickers).
+# ──────────────────────────────────────────────────────────────
+_KICKERS_LEN = {8: 5, 7: 2, 6: 2, 5: 5, 4: 5, 3: 3, 2: 3, 1: 4, 0: 5}
 
-def log_complete_hand_history(winner):
-    s = st.session_state
+# Clés par carte : comptes par rang en base 5 (max 4 par rang), comptes par
+# couleur sur 3 bits (max 7), et masque de rangs par couleur sur 16 bits.
+_RANK_KEY = [5 ** (i // 4) for i in range(52)]
+_SUIT_KEY = [1 << (3 * (i % 4)) for i in range(52)]
+_FLUSH_BIT = [1 << ((i // 4) + 16 * (i % 4)) for i in range(52)]
 
-    if s.get("current_hand_logged"):
-        return
-    s.current_hand_logged = True
+_EVAL_TABLES = None
+_EVAL_TABLES_MAGIC = b"SGEV0001"
 
-    s.hu_hand_seq = int(s.get("hu_hand_seq") or 0) + 1
+def pack_hand_value(category: int, kickers) -> int:
+    v = 0
+    for k in kickers:
+        v = (v << 4) | k
+    return (category << 20) | (v << (4 * (5 - len(kickers))))
 
-    played_at_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ")
+def hand_rank_to_tuple(rank: int):
+    """Inverse de pack_hand_value : renvoie le (catégorie, kickers) de evaluate_hand."""
+    cat = rank >> 20
+    return (cat, [(rank >> (4 * (4 - i))) & 0xF for i in range(_KICKERS_LEN[cat])])
+
+def _straight_high(present) -> int:
+    # present : ensemble des rangs 2..14 ; 0 si pas de quinte, 5 pour la roue
+    for hi in range(14, 5, -1):
+        if all(r in present for r in range(hi - 4, hi + 1)):
+            return hi
+    return 5 if all(r in present for r in (14, 2, 3, 4, 5)) else 0
+
+def _straight_kickers(hi: int):
+    return [5, 4, 3, 2, 1] if hi == 5 else list(range(hi, hi - 5, -1))
+
+def _best_flush_value(mask: int) -> int:
+    ranks = [r for r in range(14, 1, -1) if mask >> (r - 2) & 1]
+    hi = _straight_high(set(ranks))
+    if hi:
+        return pack_hand_value(8, _straight_kickers(hi))
+    return pack_hand_value(5, ranks[:5])
+
+def _best_nonflush_value(counts) -> int:
+    # counts[r - 2] = nombre de cartes de rang r, total entre 5 et 7
+    desc = [r for r in range(14, 1, -1) if counts[r - 2]]
+    quads = [r for r in desc if counts[r - 2] == 4]
+    trips = [r for r in desc if counts[r - 2] == 3]
+    pairs = [r for r in desc if counts[r - 2] == 2]
+    if quads:
+        q = quads[0]
+        return pack_hand_value(7, [q, next(r for r in desc if r != q)])
+    if trips and (len(trips) > 1 or pairs):
+        return pack_hand_value(6, [trips[0], max(trips[1:] + pairs)])
+    hi = _straight_high(set(desc))
+    if hi:
+        return pack_hand_value(4, _straight_kickers(hi))
+    if trips:
+        t = trips[0]
+        return pack_hand_value(3, [t] + [r for r in desc if r != t][:2])
+    if len(pairs) >= 2:
+        p1, p2 = pairs[:2]
+        return pack_hand_value(2, [p1, p2, next(r for r in desc if r not in (p1, p2))])
+    if pairs:
+        p = pairs[0]
+        return pack_hand_value(1, [p] + [r for r in desc if r != p][:3])
+    return pack_hand_value(0, desc[:5])
+
+def _build_eval_tables():
+    flush = [0] * 8192
+    for mask in range(8192):
+        if bin(mask).count("1") >= 5:
+            flush[mask] = _best_flush_value(mask)
 
+    flush_suit = [-1] * 4096
+    for key in range(4096):
+        for suit in range(4):
+            if (key >> (3 * suit)) & 7 >= 5:
+                flush_suit[key] = suit
+
+    noflush = {}
+    def rec(r, counts, n):
+        if r == 13:
+            if n >= 5:
+                noflush[sum(c * 5 ** i for i, c in enumerate(counts))] = _best_nonflush_value(counts)
+            return
+        for c in range(min(4, 7 - n) + 1):
+            counts.append(c); rec(r + 1, counts, n + c); counts.pop()
+    rec(0, [], 0)
+    return noflush, flush, flush_suit
+
+def _save_eval_tables(tables, path):
+    noflush, flush, flush_suit = tables
+    keys = array("Q", noflush.keys()); vals = array("I", noflush.values())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_EVAL_TABLES_MAGIC)
+        f.write(len(keys).to_bytes(4, "little"))
+        array("I", flush).tofile(f); array("b", flush_suit).tofile(f)
+        keys.tofile(f); vals.tofile(f)
+    os.replace(tmp, path)
+
+def _read_eval_tables(path):
+    with open(path, "rb") as f:
+        if f.read(len(_EVAL_TABLES_MAGIC)) != _EVAL_TABLES_MAGIC:
+            raise ValueError("bad magic")
+        n = int.from_bytes(f.read(4), "little")
+        flush = array("I"); flush.fromfile(f, 8192)
+        flush_suit = array("b"); flush_suit.fromfile(f, 4096)
+        keys = array("Q"); keys.fromfile(f, n)
+        vals = array("I"); vals.fromfile(f, n)
+    return dict(zip(keys, vals)), flush.tolist(), flush_suit.tolist()
+
+def _load_eval_tables():
+    """Charge les tables depuis HAND_EVAL_TABLES_FILE, ou les construit et les y écrit."""
+    global _EVAL_TABLES
+    if _EVAL_TABLES is None:
+        try:
+            _EVAL_TABLES = _read_eval_tables(HAND_EVAL_TABLES_FILE)
+        except Exception:
+            _EVAL_TABLES = _build_eval_tables()
+            try:
+                _save_eval_tables(_EVAL_TABLES, HAND_EVAL_TABLES_FILE)
+            except Exception:
+                pass  # cache disque facultatif : on garde les tables en mémoire
+    return _EVAL_TABLES
+
+def hand_rank_ids(ids) -> int:
+    """Rang entier de la meilleure main de 5 à 7 cartes données par index 0..51."""
+    noflush, flush, flush_suit = _EVAL_TABLES or _load_eval_tables()
+    rk = sk = fb = 0
+    for i in ids:
+        rk += _RANK_KEY[i]; sk += _SUIT_KEY[i]; fb |= _FLUSH_BIT[i]
+    suit = flush_suit[sk]
+    if suit >= 0:
+        return flush[(fb >> (16 * suit)) & 0x1FFF]
+    return noflush[rk]
+
+def hand_rank(hole, board) -> int:
+    """Équivalent entier de get_best_hand : même ordre, sans parcourir les 21 combinaisons."""
+    cards = hole + board
+    if len(cards) < 5:
+        return 0
+    return hand_rank_ids([c.idx for c in cards])
+
+# ──────────────────────────────────────────────────────────────
+#  Évaluation vectorisée (NumPy) : mêmes tables, aucune boucle par main
+# ──────────────────────────────────────────────────────────────
+_NP_EVAL_TABLES = None
+_NP_RANK_KEY = np.array(_RANK_KEY, dtype=np.int64)
+_NP_SUIT_KEY = np.array(_SUIT_KEY, dtype=np.int64)
+_NP_FLUSH_BIT = np.array(_FLUSH_BIT, dtype=np.uint64)
+
+def _load_np_eval_tables():
+    global _NP_EVAL_TABLES
+    if _NP_EVAL_TABLES is None:
+        noflush, flush, flush_suit = _load_eval_tables()
+        keys = np.fromiter(noflush.keys(), dtype=np.int64, count=len(noflush))
+        vals = np.fromiter(noflush.values(), dtype=np.int32, count=len(noflush))
+        order = np.argsort(keys)
+        _NP_EVAL_TABLES = (keys[order], vals[order],
+                           np.array(flush, dtype=np.int32), np.array(flush_suit, dtype=np.int8))
+    return _NP_EVAL_TABLES
+
+def hand_rank_batch(holes, boards):
+    """
+    Version vectorisée de hand_rank sur des index de cartes 0..51.
+    holes : (N, 2), boards : (N, k) avec 3 <= k <= 5 ; renvoie un tableau (N,) int32.
+    """
+    cards = np.concatenate([np.asarray(holes, dtype=np.intp), np.asarray(boards, dtype=np.intp)], axis=1)
+    return rank_from_features(*card_features(cards))
+
+def card_features(cards):
+    """
+    Clés additives d'un tableau (N, k) d'index distincts : (somme base 5 des
+    rangs, somme des comptes par couleur, masques de rangs par couleur — les
+    bits sont propres à chaque carte, donc la somme vaut le OU).
+    Pour deux ensembles disjoints, features(A + B) = features(A) + features(B).
+    """
+    cards = np.asarray(cards, dtype=np.intp)
+    return (_NP_RANK_KEY[cards].sum(axis=1), _NP_SUIT_KEY[cards].sum(axis=1),
+            _NP_FLUSH_BIT[cards].sum(axis=1, dtype=np.uint64))
+
+def rank_from_features(rk, sk, fb):
+    """Rangs (N,) int32 à partir des clés de card_features sur 5 à 7 cartes."""
+    keys, vals, flush, flush_suit = _load_np_eval_tables()
+    suit = flush_suit[sk]
+    out = vals[np.searchsorted(keys, rk)]
+    is_flush = suit >= 0
+    if is_flush.any():
+        mask = (fb[is_flush] >> (np.uint64(16) * suit[is_flush].astype(np.uint64))) & np.uint64(0x1FFF)
+        out[is_flush] = flush[mask.astype(np.intp)]
+    return out
+
+def parse_cards(s: str):
+    """'AsKd' -> [48, 45] (index Card.idx), format des logs de mains."""
+    return [CARD_INDEX[s[i:i + 2]] for i in range(0, len(s), 2)]
+
+def _card_to_str_simple(c):
+    """Helper pour convertir un objet Card en chaîne simple comme 'As' ou 'Th'."""
+    return CARD_NAMES[c.idx]
+
+def hand_history_row(s, winner, player_name=None, played_at_iso=None):
+    """Ligne de hands_log.jsonl pour la main terminée décrite par l'état `s`."""
     player_profit = s.player_stack - s.hand_start_player_stack
     ai_profit     = s.ai_stack     - s.hand_start_ai_stack
 
     row = {
-        "ts": played_at_iso,
-        "pp": s.get("display_name") or s.get("pseudo") or ("Anonyme" if s.get("anonymous", True) else "Anonyme"),
+        "ts": played_at_iso or time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "pp": player_name or "Anonyme",
         "w": (winner, max(int(player_profit if winner == "player" else ai_profit), 0)),
         "ai": (s.ai_pos, s.ai_start_stack),
         "h": {
@@ -68,9 +342,35 @@ def log_complete_hand_history(winner):
         "b": "".join(_card_to_str_simple(c) for c in s.board),
         "ph": s.prompt_actions
     }
+    if s.get("hu_uid"):
+        row["hu"] = s.hu_uid              # match HU (index du log des mains)
+        row["n"] = s.get("hu_hand_seq")
+    if s.get("allin_ai_equity") is not None:
+        row["eq"] = s.allin_ai_equity
+    if s.get("deal_seed") is not None:
+        row["sd"] = s.deal_seed           # Deck(seed=sd) rejoue la donne
+        if s.get("deal_replay"):
+            row["dr"] = 1                 # donne dupliquée : cartes privées échangées
+    return row
+
+def log_complete_hand_history(winner):
+    """Écrit la main terminée (hu_hand_seq déjà incrémenté par le moteur) dans le log des mains et Supabase."""
+    import streamlit as st
+    from supabase_utils import insert_hand_minimal
+    from log_writer import get_log_writer, session_owner
+    from hands_log import get_hands_log
+    s = st.session_state
+
+    played_at_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    row = hand_history_row(s, winner, s.get("display_name") or s.get("pseudo"), played_at_iso)
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        # écrit en arrière-plan ; une erreur d'écriture antérieure de cette session remonte ici
+        writer = get_log_writer()
+        owner = session_owner(s)
+        get_hands_log().append(row, owner)
+        err = writer.pop_error(owner)
+        if err:
+            raise OSError(err)
     except Exception as e:
         st.sidebar.error(L(f"Error while saving hand log: {e}", f"Erreur lors de la sauvegarde du log: {e}"))
 
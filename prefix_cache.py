@@ -0,0 +1,188 @@
+# prefix_cache.py
+"""
+Cache KV de préfixes partagé par tout le processus (arbre radix sur les ids de tokens).
+
+Les prompts de SpinGPT ont de longs préfixes communs (template de chat,
+`pos:` / `stacks:`, puis tout l'historique de la main, qui ne fait que
+s'allonger d'une décision à l'autre). Chaque arête de l'arbre porte ses tokens
+et le segment de cache KV correspondant (une paire clés / valeurs par couche) :
+un token n'est stocké qu'une fois, et le cache d'un préfixe se reconstitue en
+concaténant les segments du chemin.
+
+Budget mémoire en octets ; au-delà, les feuilles les moins récemment utilisées
+sont évincées. stats() expose taux de réussite, octets détenus et évictions.
+"""
+import threading
+
+import torch
+from transformers import DynamicCache
+
+def _layers(past):
+    """[(clés, valeurs)] par couche d'un cache KV, tenseurs (batch, têtes, séquence, dim)."""
+    if hasattr(past, "layers"):
+        return [(l.keys, l.values) for l in past.layers]
+    if hasattr(past, "key_cache"):
+        return list(zip(past.key_cache, past.value_cache))
+    return [tuple(kv[:2]) for kv in past]
+
+def _nbytes(kv) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in kv)
+
+def _slice(kv, a, b=None):
+    return [(k[:, :, a:b].clone(), v[:, :, a:b].clone()) for k, v in kv]
+
+def select_rows(past, idx) -> DynamicCache:
+    """Nouveau DynamicCache formé des lignes `idx` (tenseur d'indices, répétitions permises) de `past`."""
+    out = DynamicCache()
+    for layer, (k, v) in enumerate(_layers(past)):
+        out.update(k.index_select(0, idx), v.index_select(0, idx), layer)
+    return out
+
+class _Node:
+    __slots__ = ("tokens", "kv", "children", "parent", "last", "nbytes")
+
+    def __init__(self, tokens=(), kv=None, parent=None, last=0):
+        self.tokens = tokens
+        self.kv = kv
+        self.children = {}
+        self.parent = parent
+        self.last = last
+        self.nbytes = _nbytes(kv) if kv else 0
+
+class PrefixKVCache:
+    def __init__(self, budget_bytes: int):
+        self.budget = budget_bytes
+        self.root = _Node()
+        self.lock = threading.Lock()
+        self.clock = 0
+        self.bytes_held = 0
+        self.lookups = self.hits = 0
+        self.tokens_seen = self.tokens_reused = 0
+        self.evictions = 0
+        self.nodes = 0
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def lookup(self, tokens, max_len=None):
+        """
+        (n, cache) : plus long préfixe de `tokens` en cache (au plus max_len tokens)
+        et un DynamicCache neuf couvrant ces n tokens (None si n == 0).
+        """
+        max_len = len(tokens) if max_len is None else min(max_len, len(tokens))
+        segments, n = [], 0
+        with self.lock:
+            now = self._tick()
+            node = self.root
+            while n < max_len:
+                child = node.children.get(tokens[n])
+                if child is None:
+                    break
+                edge = child.tokens
+                m = 0
+                while m < len(edge) and n + m < max_len and edge[m] == tokens[n + m]:
+                    m += 1
+                child.last = now
+                segments.append(child.kv if m == len(edge) else [(k[:, :, :m], v[:, :, :m]) for k, v in child.kv])
+                n += m
+                if m < len(edge):
+                    break
+                node = child
+            self.lookups += 1
+            self.hits += n > 0
+            self.tokens_seen += len(tokens)
+            self.tokens_reused += n
+            if not n:
+                return 0, None
+            past = DynamicCache()
+            for layer, parts in enumerate(zip(*segments)):
+                past.update(torch.cat([k for k, _ in parts], dim=2), torch.cat([v for _, v in parts], dim=2), layer)
+        return n, past
+
+    def insert(self, tokens, past):
+        """Enregistre le cache KV `past` couvrant exactement `tokens` (batch de 1)."""
+        kv = _layers(past)
+        with self.lock:
+            now = self._tick()
+            node, n = self.root, 0
+            while n < len(tokens):
+                child = node.children.get(tokens[n])
+                if child is None:
+                    leaf = _Node(tuple(tokens[n:]), _slice(kv, n, len(tokens)), node, now)
+                    node.children[tokens[n]] = leaf
+                    self.bytes_held += leaf.nbytes; self.nodes += 1
+                    break
+                edge = child.tokens
+                m = 0
+                while m < len(edge) and n + m < len(tokens) and edge[m] == tokens[n + m]:
+                    m += 1
+                child.last = now
+                if m < len(edge):
+                    if n + m == len(tokens):
+                        break           # déjà couvert par le début de l'arête
+                    self._split(child, m)
+                node = node.children[tokens[n]]
+                n += m
+            self._evict()
+
+    def _split(self, child, m):
+        """Coupe l'arête de `child` après m tokens : un nœud intermédiaire porte le début."""
+        parent = child.parent
+        head = _Node(child.tokens[:m], _slice(child.kv, 0, m), parent, child.last)
+        tail_kv = _slice(child.kv, m)
+        self.bytes_held += head.nbytes + _nbytes(tail_kv) - child.nbytes
+        child.tokens, child.kv, child.nbytes = child.tokens[m:], tail_kv, _nbytes(tail_kv)
+        child.parent = head
+        head.children[child.tokens[0]] = child
+        parent.children[head.tokens[0]] = head
+        self.nodes += 1
+
+    def _evict(self):
+        if self.bytes_held <= self.budget:
+            return
+        leaves, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            stack.extend(node.children.values())
+            if not node.children and node is not self.root:
+                leaves.append(node)
+        leaves.sort(key=lambda nd: nd.last, reverse=True)
+        while self.bytes_held > self.budget and leaves:
+            leaf = leaves.pop()
+            parent = leaf.parent
+            del parent.children[leaf.tokens[0]]
+            self.bytes_held -= leaf.nbytes; self.nodes -= 1; self.evictions += 1
+            if not parent.children and parent is not self.root:
+                # le parent devient une feuille : réinséré à sa place dans l'ordre LRU
+                i = len(leaves)
+                while i > 0 and leaves[i - 1].last < parent.last:
+                    i -= 1
+                leaves.insert(i, parent)
+
+    def clear(self):
+        with self.lock:
+            self.root = _Node(); self.bytes_held = 0; self.nodes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "lookups": self.lookups, "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "token_hit_rate": self.tokens_reused / self.tokens_seen if self.tokens_seen else 0.0,
+                "bytes_held": self.bytes_held, "budget_bytes": self.budget,
+                "evictions": self.evictions, "nodes": self.nodes,
+            }
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+def get_prefix_cache(budget_bytes: int) -> PrefixKVCache | None:
+    """Cache unique du processus (None si budget nul)."""
+    global _CACHE
+    if budget_bytes <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = PrefixKVCache(budget_bytes)
+        return _CACHE
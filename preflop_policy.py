@@ -0,0 +1,304 @@
+# preflop_policy.py
+"""
+Table de politique préflop de SpinGPT, calculée hors-ligne.
+
+En heads-up 25BB les spots préflop sont peu nombreux : 169 classes de mains,
+la position (SB / BB), quelques historiques d'actions (menu de tailles fixe) et le
+tapis du héros au début de la main (le total en jeu est fixe, 2 × INITIAL_STACK,
+donc il détermine aussi celui de l'adversaire), regroupé par pas de `stack_step` BB.
+
+Le générateur joue chaque spot dans un MatchState, construit le prompt exactement
+comme en jeu (build_prompt), et enregistre la distribution de
+enumerate_actions_ge (les full_alts de get_action_with_dists). get_ai_action sert
+ensuite ces spots en quelques microsecondes ; tout spot hors table (taille de
+relance hors menu, tapis hors bornes, autre modèle...) retombe sur le modèle.
+
+Usage : python preflop_policy.py build [--stack-step 1]
+        python preflop_policy.py check --samples 200
+"""
+import os, json, math, time, random, argparse
+
+import numpy as np
+
+from config import BB, INITIAL_STACK, PREFLOP_POLICY_FILE
+from poker_engine import CARD_INDEX
+from preflop_table import class_index, class_name
+
+TOTAL_BB = 2 * INITIAL_STACK / BB
+MAX_ALTS = 8          # au plus 1 / min_select_prob actions retenues
+_EMPTY = 0xFFFF
+
+# Menu des tailles (relance totale en BB) ; "A" = tapis
+OPENS = ("r2", "r2.5", "r3")
+ISOS = ("r3", "r4")          # relance de la BB après un limp
+
+def _size(sym: str) -> float:
+    return float(sym[1:])
+
+def decision_histories():
+    """Historiques préflop (symboles séparés par des virgules) où le héros doit décider."""
+    out = [""]
+    for first in ("c",) + OPENS + ("A",):
+        out.append(first)
+    for iso in ISOS + ("A",):
+        out.append(f"c,{iso}")
+    for o in OPENS:
+        out.append(f"{o},r{3 * _size(o):g}")
+        out.append(f"{o},A")
+    for iso in ISOS:
+        out.append(f"c,{iso},A")
+    for o in OPENS:
+        out.append(f"{o},r{3 * _size(o):g},A")
+    return out
+
+HISTORIES = decision_histories()
+
+def hero_position(history: str) -> str:
+    """SB parle en premier : un nombre pair d'actions déjà jouées => le héros est SB."""
+    n = len(history.split(",")) if history else 0
+    return "SB" if n % 2 == 0 else "BB"
+
+def history_valid(history: str, hero_bb: float) -> bool:
+    """Toutes les relances du menu restent strictement sous le tapis de leur auteur."""
+    if not history:
+        return True
+    pos = hero_position(history)
+    vill_bb = TOTAL_BB - hero_bb
+    stacks = {"SB": hero_bb if pos == "SB" else vill_bb, "BB": vill_bb if pos == "SB" else hero_bb}
+    last = 1.0
+    for i, sym in enumerate(history.split(",")):
+        actor = "SB" if i % 2 == 0 else "BB"
+        if sym.startswith("r"):
+            x = _size(sym)
+            if x >= stacks[actor] or x <= last:
+                return False
+            last = x
+        elif sym == "A":
+            if stacks[actor] <= last:     # tapis qui ne relance pas : simple call
+                return False
+            last = stacks[actor]
+    return True
+
+def class_cards(ci: int):
+    """Main représentative d'une classe : pique / cœur (paire, offsuit), pique / pique (suited)."""
+    name = class_name(ci)
+    hi, lo = name[0], name[1]
+    if len(name) == 2:
+        return hi + "s", lo + "h"
+    return (hi + "s", lo + "s") if name[2] == "s" else (hi + "s", lo + "h")
+
+# ──────────────────────────────────────────────────────────────
+#  Spot <-> état de jeu
+# ──────────────────────────────────────────────────────────────
+def spot_state(hero_bb: float, history: str, cards):
+    """MatchState au moment de la décision du héros (« ai ») ; cards : deux noms ("As", "Kh")."""
+    from game_engine import MatchState
+    from poker_engine import CARDS
+    pos = hero_position(history)
+    m = MatchState()
+    m.hu_uid = "preflop-policy"; m.hu_hand_seq = 0; m.game_over = False
+    m.ai_stack = round(hero_bb * BB); m.player_stack = 2 * INITIAL_STACK - m.ai_stack
+    # start_new_hand échange les positions
+    m.ai_pos, m.player_pos = ("BB", "SB") if pos == "SB" else ("SB", "BB")
+    m.start_new_hand()
+    m.ai_hand = [CARDS[CARD_INDEX[c]] for c in cards]
+    for sym in history.split(",") if history else ():
+        actor = m.turn
+        if sym == "c":
+            m.process_action(actor, "call")
+        elif sym == "A":
+            m.process_action(actor, "raise", m[f"{actor}_stack"] + m[f"{actor}_bet"])
+        else:
+            m.process_action(actor, "raise", round(_size(sym) * BB))
+    assert m.turn == "ai" and m.street_num == 0, history
+    return m
+
+def spot_key(s):
+    """(historique, tapis du héros en BB, classe) d'un état de jeu préflop, ou None."""
+    if s.street_num != 0 or s.turn not in (None, "ai"):
+        return None
+    start = {"ai": s.hand_start_ai_stack, "player": s.hand_start_player_stack}
+    if start["ai"] is None or start["ai"] + start["player"] != 2 * INITIAL_STACK:
+        return None
+    syms = []
+    for st_num, tag, sym in s.prompt_actions:
+        if st_num != 0:
+            continue
+        if sym.startswith(("r", "b")):
+            actor = "ai" if tag == "H" else "player"
+            x = float(sym[1:])
+            sym = "A" if x * BB >= start[actor] else f"r{x:g}"
+        syms.append(sym)
+    c1, c2 = (c.idx for c in s.ai_hand)
+    return ",".join(syms), start["ai"] / BB, class_index(c1, c2)
+
+# ──────────────────────────────────────────────────────────────
+#  Table
+# ──────────────────────────────────────────────────────────────
+class PreflopPolicy:
+    def __init__(self, meta, actions, probs):
+        self.meta = meta
+        self.vocab = meta["vocab"]
+        self.hist_index = {h: i for i, h in enumerate(meta["histories"])}
+        self.stack_lo, self.stack_step = meta["stack_lo"], meta["stack_step"]
+        self.n_buckets = actions.shape[1]
+        self.actions, self.probs = actions, probs
+        self.min_select_prob = meta["min_select_prob"]
+        self.max_new_tokens = meta["max_new_tokens"]
+
+    def bucket(self, hero_bb: float):
+        b = round((hero_bb - self.stack_lo) / self.stack_step)
+        return b if 0 <= b < self.n_buckets else None
+
+    def lookup(self, s, model=None):
+        """full_alts du spot préflop de `s` (liste de {"action", "p"}), ou None hors table."""
+        if model is not None and getattr(model, "fingerprint", None) != self.meta["fingerprint"]:
+            return None
+        key = spot_key(s)
+        if key is None:
+            return None
+        history, hero_bb, ci = key
+        h, b = self.hist_index.get(history), self.bucket(hero_bb)
+        if h is None or b is None:
+            return None
+        ids, ps = self.actions[h, b, ci], self.probs[h, b, ci]
+        alts = [{"action": self.vocab[a], "p": float(p)} for a, p in zip(ids.tolist(), ps.tolist()) if a != _EMPTY]
+        return alts or None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, meta=np.frombuffer(json.dumps(self.meta).encode(), dtype=np.uint8),
+                            actions=self.actions, probs=self.probs)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            meta = json.loads(z["meta"].tobytes().decode())
+            return cls(meta, z["actions"], z["probs"])
+
+_POLICY = {}   # chemin -> (mtime_ns, table)
+
+def get_preflop_policy(path: str = PREFLOP_POLICY_FILE):
+    """Table chargée une fois par version du fichier ; None s'il n'existe pas ou est illisible."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _POLICY.pop(path, None)
+        return None            # pas de cache de l'absence : une table construite plus tard sera lue
+    cached = _POLICY.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            policy = PreflopPolicy.load(path)
+        except (OSError, ValueError, KeyError):
+            policy = None      # illisible : relu dès que le fichier change
+        cached = _POLICY[path] = (mtime, policy)
+    return cached[1]
+
+def sample_action(full_alts, min_select_prob: float, rng=random):
+    """Même sélection que PokerModel.act_over_threshold : seuil, renormalisation, tirage."""
+    cand = [a for a in full_alts if a["p"] >= min_select_prob]
+    s = sum(a["p"] for a in cand)
+    used_dist = [{"action": a["action"], "p": a["p"] / s} for a in cand]
+    chosen = rng.choices([d["action"] for d in used_dist], weights=[d["p"] for d in used_dist])[0]
+    return chosen, used_dist
+
+# ──────────────────────────────────────────────────────────────
+#  Construction (hors-ligne) et contrôle
+# ──────────────────────────────────────────────────────────────
+def build_policy(model, stack_step: float = 1.0, stack_lo: float = 2.0, stack_hi: float = TOTAL_BB - 2,
+                 min_select_prob: float = 0.12, max_new_tokens: int = 6):
+    buckets = [stack_lo + i * stack_step for i in range(int(math.floor((stack_hi - stack_lo) / stack_step)) + 1)]
+    actions = np.full((len(HISTORIES), len(buckets), 169, MAX_ALTS), _EMPTY, dtype=np.uint16)
+    probs = np.zeros(actions.shape, dtype=np.float32)
+    vocab, vocab_index = [], {}
+    spots = [(h, b) for h, hist in enumerate(HISTORIES) for b, bb in enumerate(buckets) if history_valid(hist, bb)]
+    from ia_bridge import build_prompt
+    t0, total = time.perf_counter(), len(spots) * 169
+    for k, (h, b) in enumerate(spots):
+        for ci in range(169):
+            m = spot_state(buckets[b], HISTORIES[h], class_cards(ci))
+            alts = model.enumerate_actions_ge(build_prompt(m), min_prob=min_select_prob,
+                                              max_new_tokens=max_new_tokens, tok_topk=20)
+            for j, a in enumerate(alts[:MAX_ALTS]):
+                if a["action"] not in vocab_index:
+                    vocab_index[a["action"]] = len(vocab); vocab.append(a["action"])
+                actions[h, b, ci, j] = vocab_index[a["action"]]
+                probs[h, b, ci, j] = a["p"]
+        done = (k + 1) * 169
+        if (k + 1) % 10 == 0 or done == total:
+            eta = (time.perf_counter() - t0) / done * (total - done)
+            print(f"  {done}/{total} spots, reste ~{eta / 60:.0f} min", flush=True)
+    meta = {
+        "fingerprint": getattr(model, "fingerprint", None), "histories": HISTORIES, "vocab": vocab,
+        "stack_lo": stack_lo, "stack_step": stack_step,
+        "min_select_prob": min_select_prob, "max_new_tokens": max_new_tokens,
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return PreflopPolicy(meta, actions, probs)
+
+def _normalized(alts, min_select_prob):
+    cand = [a for a in alts if a["p"] >= min_select_prob]
+    s = sum(a["p"] for a in cand)
+    return {a["action"]: a["p"] / s for a in cand} if s else {}
+
+def check_policy(model, policy, samples: int = 200, seed: int = 0):
+    """
+    Compare la table au modèle sur des spots réels tirés au hasard (tapis hors centre
+    de bucket, couleurs quelconques) : distance en variation totale des distributions
+    servies et accord sur l'action la plus probable.
+    """
+    from ia_bridge import build_prompt
+    from poker_engine import CARD_NAMES
+    rng = random.Random(seed)
+    tvs, agree, n = [], 0, 0
+    while n < samples:
+        hist = rng.choice(HISTORIES)
+        hero_bb = round(rng.uniform(policy.stack_lo, policy.stack_lo + (policy.n_buckets - 1) * policy.stack_step), 1)
+        if not history_valid(hist, hero_bb):
+            continue
+        cards = [CARD_NAMES[i] for i in rng.sample(range(52), 2)]
+        m = spot_state(hero_bb, hist, cards)
+        table = policy.lookup(m)
+        if table is None:
+            continue
+        live = model.enumerate_actions_ge(build_prompt(m), min_prob=policy.min_select_prob,
+                                          max_new_tokens=policy.max_new_tokens, tok_topk=20)
+        pt, pl = _normalized(table, policy.min_select_prob), _normalized(live, policy.min_select_prob)
+        tvs.append(0.5 * sum(abs(pt.get(a, 0.0) - pl.get(a, 0.0)) for a in set(pt) | set(pl)))
+        agree += bool(pl) and max(pt, key=pt.get) == max(pl, key=pl.get)
+        n += 1
+    tvs.sort()
+    return {"samples": n, "tv_mean": sum(tvs) / n, "tv_p95": tvs[int(0.95 * (n - 1))],
+            "top_action_agreement": agree / n}
+
+def main():
+    ap = argparse.ArgumentParser(description="Table de politique préflop de SpinGPT.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="énumère tous les spots préflop avec le modèle")
+    b.add_argument("--stack-step", type=float, default=1.0, help="largeur des buckets de tapis (BB)")
+    b.add_argument("--min-select-prob", type=float, default=0.12)
+    b.add_argument("--max-new-tokens", type=int, default=6)
+    b.add_argument("--out", default=PREFLOP_POLICY_FILE)
+    c = sub.add_parser("check", help="compare la table au modèle sur des spots aléatoires")
+    c.add_argument("--samples", type=int, default=200)
+    c.add_argument("--seed", type=int, default=0)
+    c.add_argument("--table", default=PREFLOP_POLICY_FILE)
+    args = ap.parse_args()
+
+    from config import HF_TOKEN
+    from ia_model import PokerModel
+    model = PokerModel(HF_TOKEN)
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        policy = build_policy(model, args.stack_step, min_select_prob=args.min_select_prob,
+                              max_new_tokens=args.max_new_tokens)
+        policy.save(args.out)
+        print(f"{args.out} ({time.perf_counter() - t0:.0f}s, {len(policy.vocab)} actions distinctes)")
+    else:
+        policy = PreflopPolicy.load(args.table)
+        print(check_policy(model, policy, args.samples, args.seed))
+
+if __name__ == "__main__":
+    main()
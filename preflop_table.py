@@ -0,0 +1,198 @@
+# preflop_table.py
+"""
+Table d'équités préflop heads-up, précalculée hors-ligne et lue par mmap.
+
+- niveau "classes" : 169 x 169 classes de mains (AA, AKs, AKo, ...), équité
+  moyenne sur toutes les combinaisons compatibles (Monte Carlo) ;
+- niveau "combos" (optionnel) : 1326 x 1326 mains exactes, une équité par
+  classe d'isomorphie de couleurs (énumération exacte ou Monte Carlo).
+
+Les fichiers sont des float32 bruts précédés d'un en-tête de 16 octets,
+ouverts en np.memmap : tous les processus Streamlit partagent les mêmes pages.
+Case [a, b] = équité de a contre b (gain + égalité / 2) ; NaN si a et b se chevauchent.
+
+Construction : python preflop_table.py --samples 200000 [--combos [--exact]] [--workers N]
+"""
+import os, argparse, time
+import concurrent.futures
+from itertools import combinations, permutations
+
+import numpy as np
+
+from config import PREFLOP_EQUITY_FILE, PREFLOP_COMBO_EQUITY_FILE
+from equity import _tally, enumerate_equity, monte_carlo_equity
+
+_MAGIC = b"SGPE"
+_HEADER = 16
+
+# Index de classe : grille 13 x 13, A en 0 ; paires sur la diagonale,
+# suited au-dessus (ligne = rang haut), offsuit en dessous (ligne = rang bas).
+def class_index(c1: int, c2: int) -> int:
+    r1, r2 = 12 - c1 // 4, 12 - c2 // 4
+    hi, lo = min(r1, r2), max(r1, r2)
+    return hi * 13 + lo if (c1 % 4 == c2 % 4 or hi == lo) else lo * 13 + hi
+
+def class_name(i: int) -> str:
+    row, col = divmod(i, 13)
+    ranks = "AKQJT98765432"
+    if row == col:
+        return ranks[row] * 2
+    return ranks[min(row, col)] + ranks[max(row, col)] + ("s" if row < col else "o")
+
+COMBOS = list(combinations(range(52), 2))          # 1326 mains, cartes triées
+_COMBO_INDEX = np.full((52, 52), -1, dtype=np.int16)
+for _i, (_a, _b) in enumerate(COMBOS):
+    _COMBO_INDEX[_a, _b] = _COMBO_INDEX[_b, _a] = _i
+CLASS_COMBOS = [[] for _ in range(169)]
+for _a, _b in COMBOS:
+    CLASS_COMBOS[class_index(_a, _b)].append((_a, _b))
+
+def combo_index(c1: int, c2: int) -> int:
+    return int(_COMBO_INDEX[c1, c2])
+
+# ──────────────────────────────────────────────────────────────
+#  Lecture (runtime)
+# ──────────────────────────────────────────────────────────────
+_TABLES = {}   # chemin -> (mtime_ns, table)
+
+def _open_table(path):
+    """Table mmap de `path` ; rouverte si le fichier apparaît ou est reconstruit après le démarrage."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _TABLES.pop(path, None)
+        return None            # pas de cache de l'absence : une table construite plus tard sera lue
+    cached = _TABLES.get(path)
+    if cached is None or cached[0] != mtime:
+        table = None
+        try:
+            with open(path, "rb") as f:
+                head = f.read(_HEADER)
+            if head[:4] == _MAGIC:
+                n = int.from_bytes(head[4:8], "little")
+                table = np.memmap(path, dtype=np.float32, mode="r", offset=_HEADER, shape=(n, n))
+        except FileNotFoundError:
+            pass
+        cached = _TABLES[path] = (mtime, table)
+    return cached[1]
+
+def preflop_equity(hole_a, hole_b):
+    """
+    Équité préflop de hole_a contre hole_b (objets Card ou index), en O(1).
+    Table des combos si elle existe, sinon table des classes ; None si aucune table.
+    """
+    a1, a2 = (c.idx if hasattr(c, "idx") else int(c) for c in hole_a)
+    b1, b2 = (c.idx if hasattr(c, "idx") else int(c) for c in hole_b)
+    combos = _open_table(PREFLOP_COMBO_EQUITY_FILE)
+    if combos is not None:
+        v = float(combos[_COMBO_INDEX[a1, a2], _COMBO_INDEX[b1, b2]])
+        if v == v:
+            return v
+    classes = _open_table(PREFLOP_EQUITY_FILE)
+    if classes is not None:
+        return float(classes[class_index(a1, a2), class_index(b1, b2)])
+    return None
+
+# ──────────────────────────────────────────────────────────────
+#  Construction (hors-ligne)
+# ──────────────────────────────────────────────────────────────
+def _write_table(path, table):
+    n = table.shape[0]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_MAGIC + n.to_bytes(4, "little") + bytes(_HEADER - 8))
+        f.write(np.ascontiguousarray(table, dtype=np.float32).tobytes())
+    os.replace(tmp, path)
+
+def _class_pair_equity(i, j, samples, seed):
+    """Équité Monte Carlo de la classe i contre la classe j, combos tirés uniformément."""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i, j)))
+    pairs = np.array([a + b for a in CLASS_COMBOS[i] for b in CLASS_COMBOS[j]
+                      if not set(a) & set(b)], dtype=np.intp)
+    holes = pairs[rng.integers(0, len(pairs), size=samples)]
+    boards = rng.integers(0, 52, size=(samples, 5))
+    bad = np.arange(samples)
+    while bad.size:
+        boards[bad] = rng.integers(0, 52, size=(bad.size, 5))
+        b, h = boards[bad], holes[bad]
+        s = np.sort(b, axis=1)
+        clash = (s[:, 1:] == s[:, :-1]).any(axis=1) | (b[:, :, None] == h[:, None, :]).any(axis=(1, 2))
+        bad = bad[clash]
+    wins, ties = _tally(holes[:, :2], holes[:, 2:], boards)
+    return i, j, (wins + 0.5 * ties) / samples
+
+def build_class_table(samples: int = 200_000, seed: int = 0, workers: int | None = None):
+    # une classe contre elle-même vaut 0,5 par symétrie
+    tasks = [(i, j) for i in range(169) for j in range(i + 1, 169)]
+    table = np.full((169, 169), np.nan, dtype=np.float32)
+    np.fill_diagonal(table, 0.5)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(_class_pair_equity, i, j, samples, seed) for i, j in tasks]
+        for k, fut in enumerate(concurrent.futures.as_completed(futs), 1):
+            i, j, eq = fut.result()
+            table[i, j] = eq; table[j, i] = 1.0 - eq
+            if k % 1000 == 0:
+                print(f"  classes : {k}/{len(tasks)}", flush=True)
+    return table
+
+_SUIT_PERMS = list(permutations(range(4)))
+
+def _canonical(a, b):
+    """Représentant de (a, b) sous permutation des couleurs ; le booléen indique un échange a/b."""
+    best = None
+    for p in _SUIT_PERMS:
+        ra = tuple(sorted(c - c % 4 + p[c % 4] for c in a))
+        rb = tuple(sorted(c - c % 4 + p[c % 4] for c in b))
+        for key in ((ra, rb, False), (rb, ra, True)):
+            if best is None or key[:2] < best[:2]:
+                best = key
+    return best
+
+def _combo_pair_equity(a, b, exact, samples, seed):
+    if exact:
+        return a, b, enumerate_equity(a, b, [])["equity"]
+    res = monte_carlo_equity(a, b, seed=seed, workers=0, min_samples=samples, max_samples=samples)
+    return a, b, res["equity"]
+
+def build_combo_table(exact: bool = False, samples: int = 200_000, seed: int = 0, workers: int | None = None):
+    groups = {}
+    for ia, a in enumerate(COMBOS):
+        for b in COMBOS[ia + 1:]:
+            if not set(a) & set(b):
+                ra, rb, swapped = _canonical(a, b)
+                groups.setdefault((ra, rb), []).append((a, b, swapped))
+    print(f"  combos : {len(groups)} paires canoniques", flush=True)
+    table = np.full((1326, 1326), np.nan, dtype=np.float32)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futs = [pool.submit(_combo_pair_equity, ra, rb, exact, samples, seed) for ra, rb in groups]
+        for k, fut in enumerate(concurrent.futures.as_completed(futs), 1):
+            ra, rb, eq = fut.result()
+            for a, b, swapped in groups[(ra, rb)]:
+                e = 1.0 - eq if swapped else eq
+                table[combo_index(*a), combo_index(*b)] = e
+                table[combo_index(*b), combo_index(*a)] = 1.0 - e
+            if k % 1000 == 0:
+                print(f"  combos : {k}/{len(groups)}", flush=True)
+    return table
+
+def main():
+    ap = argparse.ArgumentParser(description="Construit les tables d'équité préflop.")
+    ap.add_argument("--samples", type=int, default=200_000, help="runouts Monte Carlo par paire")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--combos", action="store_true", help="construit aussi la table 1326 x 1326")
+    ap.add_argument("--exact", action="store_true", help="combos : énumération exacte des 1,7 M boards")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    _write_table(PREFLOP_EQUITY_FILE, build_class_table(args.samples, args.seed, args.workers))
+    print(f"{PREFLOP_EQUITY_FILE} ({time.perf_counter() - t0:.0f}s)")
+    if args.combos:
+        t0 = time.perf_counter()
+        table = build_combo_table(args.exact, args.samples, args.seed, args.workers)
+        _write_table(PREFLOP_COMBO_EQUITY_FILE, table)
+        print(f"{PREFLOP_COMBO_EQUITY_FILE} ({time.perf_counter() - t0:.0f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Contrôle de l'équité sur un board complet (river) : enumerate_equity doit
+donner 1 / 0,5 / 0 selon la comparaison directe des deux mains, et un tapis
+payé à la river avec track_equity=True doit aller au showdown sans erreur.
+
+Usage : python tools/check_equity.py --deals 2000 --seed 0
+"""
+import argparse, os, random, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from equity import enumerate_equity, hand_equity
+from game_engine import MatchState
+from poker_engine import hand_rank_ids
+
+def check_river_deals(n: int, rng: random.Random):
+    """Équité river contre la comparaison directe des rangs."""
+    for _ in range(n):
+        cards = rng.sample(range(52), 9)
+        a, b, board = cards[:2], cards[2:4], cards[4:]
+        ra, rb = hand_rank_ids(a + board), hand_rank_ids(b + board)
+        expected = 1.0 if ra > rb else 0.5 if ra == rb else 0.0
+        for res in (enumerate_equity(a, b, board), hand_equity(a, b, board)):
+            if res["n"] != 1 or res["equity"] != expected:
+                sys.exit(f"MISMATCH river {a} {b} {board}: {res} attendu {expected}")
+
+def check_river_all_in(n: int, seed: int):
+    """Mains jouées check / call jusqu'à la river, puis tapis et paiement."""
+    m = MatchState(track_equity=True)
+    m.initialize_game(hu_uid=f"check-equity-{seed}")
+    for _ in range(n):
+        if m.game_over:
+            m.initialize_game(hu_uid=f"check-equity-{seed}-{m.hu_hand_seq}")
+        while m.street_num < 3 and m.winner is None:
+            seat = m.turn
+            m.process_action(seat, "call" if m.bet_to_match > m[f"{seat}_bet"] else "check")
+        if m.winner is not None:
+            m.start_new_hand()
+            continue
+        seat = m.turn
+        opp = "ai" if seat == "player" else "player"
+        m.process_action(seat, "bet", m[f"{seat}_stack"] + m[f"{seat}_bet"])
+        m.process_action(opp, "call")
+        if m.winner is None or m.allin_ai_equity not in (0.0, 0.5, 1.0):
+            sys.exit(f"river all-in : winner={m.winner} equity={m.allin_ai_equity}")
+        m.start_new_hand()
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--deals", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    check_river_deals(args.deals, random.Random(args.seed))
+    check_river_all_in(min(args.deals, 200), args.seed)
+    print(f"OK : {args.deals} boards river, tapis river avec track_equity")
+
+if __name__ == "__main__":
+    main()
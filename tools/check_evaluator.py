@@ -0,0 +1,41 @@
+"""
+Contrôle croisé de l'évaluateur par tables (poker_engine.hand_rank) contre
+l'évaluateur de référence (max de evaluate_hand sur les 21 combinaisons).
+
+Usage : python tools/check_evaluator.py --hands 2000000 --seed 0
+"""
+import argparse, os, random, sys, time
+from itertools import combinations
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RANKS, SUITS
+from poker_engine import Card, evaluate_hand, hand_rank, hand_rank_to_tuple
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--hands", type=int, default=2_000_000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    deck = [Card(r, s) for r in RANKS for s in SUITS]
+    t0 = time.perf_counter()
+    prev = None
+    for n in range(1, args.hands + 1):
+        k = 7 if n % 8 else rng.choice((5, 6))   # quelques mains de 5/6 cartes (flop, turn)
+        cards = rng.sample(deck, k)
+        ref = max(evaluate_hand(list(c)) for c in combinations(cards, 5))
+        got = hand_rank(cards[:2], cards[2:])
+        if hand_rank_to_tuple(got) != ref:
+            sys.exit(f"MISMATCH {[c.name for c in cards]}: table={hand_rank_to_tuple(got)} ref={ref}")
+        # l'ordre entre deux mains consécutives doit suivre celui des tuples
+        if prev is not None and (got > prev[0]) != (ref > prev[1]):
+            sys.exit(f"ORDER MISMATCH {[c.name for c in cards]}")
+        prev = (got, ref)
+        if n % 250_000 == 0:
+            print(f"{n:>10} mains OK ({time.perf_counter() - t0:.0f}s)", flush=True)
+    print(f"OK : {args.hands} mains identiques")
+
+if __name__ == "__main__":
+    main()
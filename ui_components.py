@@ -2,6 +2,7 @@ import re
 import streamlit as st
 from config import *
 from app_state import process_action, start_new_hand, initialize_game
+from poker_engine import CARD_NAMES
 import time
 
 # Import conditionnel de get_ai_action (défini dans app.py en mode UI-only)
@@ -107,13 +108,17 @@ STREET_ICON = {"preflop":"🂡","flop":"🂡","turn":"🂡","river":"🂡","show
 # UTILITIES
 # =============================================================
 
-def card_to_html(card):
-    s = str(card)
-    rank, suit = s[:-1], s[-1]
-    suit_code = {'♠':'s','♣':'c','♦':'d','♥':'h','s':'s','c':'c','d':'d','h':'h'}.get(suit.lower(), '?')
+def _card_html(name: str) -> str:
+    rank, suit_code = name[:-1], name[-1]
     glyph, color = SUIT_DISPLAY.get(suit_code, ('?', '#000'))
     return f"<span class='playing-card' style='color:{color};'>{rank}{glyph}</span>"
 
+# HTML précalculé pour les 52 cartes (index Card.idx)
+_CARD_HTML = tuple(_card_html(name) for name in CARD_NAMES)
+
+def card_to_html(card):
+    return _CARD_HTML[card.idx]
+
 
 def _contribution(side: str) -> int:
     """Amount committed this street by side."""